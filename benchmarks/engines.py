@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from perceval.errors import RepositoryError
+
+from graal._version import __version__
+from graal.graal import GraalRepository
+
+ENGINE_WORKTREE = 'worktree'
+ENGINE_ARCHIVE = 'archive'
+ENGINE_BLOBS = 'blobs'
+
+ENGINES = [ENGINE_WORKTREE, ENGINE_ARCHIVE, ENGINE_BLOBS]
+
+logger = logging.getLogger(__name__)
+
+
+class EngineBenchmark:
+    """Time spent preparing the snapshots of a repository.
+
+    For each commit sampled from the history of a local repository,
+    the snapshot is prepared with three engines:
+
+        - `worktree`: `GraalRepository.checkout` in a working tree,
+          which rewrites only the files changed since the previous
+          commit (the first one is a full checkout)
+        - `archive`: `GraalRepository.archive` and the extraction of
+          the tar object to a new directory
+        - `blobs`: the contents of all the files of the tree read from
+          the object store with `git cat-file --batch`, kept in memory
+
+    The order of the engines is rotated from a commit to the next one,
+    thus the ones which run later, with the objects already in the page
+    cache, are not always the same.
+
+    :param repo_path: path of a bare repository (e.g., the mirror cloned by Graal)
+    :param branch: branch whose history is sampled, HEAD if None
+    :param max_commits: max number of commits, evenly spaced in the history
+    """
+    def __init__(self, repo_path, branch=None, max_commits=50):
+        self.repo_path = repo_path
+        self.branch = branch
+        self.max_commits = max_commits
+        self.repo = GraalRepository(repo_path, repo_path)
+
+    def commits(self):
+        """Return the hashes of the commits sampled, from the oldest one"""
+
+        cmd = ['git', 'rev-list', '--reverse', '--topo-order', self.branch or 'HEAD']
+        hashes = subprocess.check_output(cmd, cwd=self.repo_path, env=self.repo.gitenv).decode('utf-8').split()
+
+        if len(hashes) > self.max_commits:
+            step = len(hashes) / self.max_commits
+            hashes = [hashes[int(i * step)] for i in range(self.max_commits - 1)] + [hashes[-1]]
+
+        return hashes
+
+    def run(self, workdir):
+        """Prepare the snapshots of the commits sampled with each engine
+
+        :param workdir: directory where to store the working tree and
+            the extracted archives
+
+        :returns: a list of dicts, one for each commit, with the number of
+            `files` and the `bytes` of its tree, the files `changed` since
+            the previous commit, and the seconds spent by each engine
+        """
+        worktree_path = os.path.join(workdir, 'worktree')
+        archive_path = os.path.join(workdir, 'archive')
+
+        reader = _BlobReader(self.repo)
+        rows = []
+        previous = None
+        try:
+            for i, commit in enumerate(self.commits()):
+                size, nfiles = self.repo.tree_size(commit)
+                changed = nfiles if previous is None else len(self.repo.changed_files(previous, commit))
+
+                row = {
+                    'commit': commit,
+                    'files': nfiles,
+                    'bytes': size,
+                    'changed': changed
+                }
+
+                engines = ENGINES[i % len(ENGINES):] + ENGINES[:i % len(ENGINES)]
+                for engine in engines:
+                    start = time.perf_counter()
+                    if engine == ENGINE_WORKTREE:
+                        self.__checkout(worktree_path, commit, first=previous is None)
+                    elif engine == ENGINE_ARCHIVE:
+                        self.__extract(archive_path, commit)
+                    else:
+                        reader.read_tree(commit)
+                    row[engine] = time.perf_counter() - start
+
+                    if engine == ENGINE_ARCHIVE:
+                        GraalRepository.delete(archive_path)
+
+                logger.debug("Commit %s prepared: %s", commit, row)
+                rows.append(row)
+                previous = commit
+        finally:
+            reader.close()
+            if self.repo.worktreepath:
+                self.repo.prune()
+
+        return rows
+
+    def __checkout(self, worktree_path, commit, first):
+        if first:
+            self.repo.worktree(worktree_path, branch=commit)
+        else:
+            self.repo.checkout(commit)
+
+    def __extract(self, archive_path, commit):
+        file_obj = self.repo.archive(commit)
+        tar_obj = GraalRepository.tar_obj(file_obj) if file_obj else None
+        if tar_obj:
+            GraalRepository.untar(tar_obj, archive_path)
+        else:
+            os.mkdir(archive_path)
+
+
+class _BlobReader:
+    """Process of `git cat-file --batch` which reads the contents
+    of the blobs of the trees, kept open across the commits"""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.proc = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=repo.dirpath, env=repo.gitenv,
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read_tree(self, commit):
+        """Read the contents of all the files of the tree of `commit`
+
+        :returns: a dict with the contents of each file, keyed by path
+        """
+        blobs = list(self.repo.file_blobs(commit).items())
+
+        # requests are written by another thread, thus the
+        # pipes never fill up while the contents are read
+        writer = threading.Thread(target=self.__request, args=([obj for _, obj in blobs],))
+        writer.start()
+
+        contents = {}
+        stdout = self.proc.stdout
+        for path, _ in blobs:
+            header = stdout.readline().split()
+            size = int(header[2])
+            contents[path] = stdout.read(size)
+            stdout.read(1)
+
+        writer.join()
+
+        return contents
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+        self.proc.stdout.close()
+
+    def __request(self, objs):
+        self.proc.stdin.write(''.join(obj + '\n' for obj in objs).encode('ascii'))
+        self.proc.stdin.flush()
+
+
+def size_class(n):
+    """Return the power-of-ten range of `n` (e.g., `10-99`)"""
+
+    if n <= 0:
+        return '0'
+
+    low = 10 ** (len(str(n)) - 1)
+    return '%d-%d' % (low, low * 10 - 1)
+
+
+def summarize(rows, key):
+    """Group the commits by the size class of `key` (i.e., `files`
+    or `changed`) and summarize the time spent by each engine
+
+    :returns: a dict with, for each size class, the number of `commits`,
+        the `mean` and `median` seconds of each engine and the `fastest` one
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(size_class(row[key]), []).append(row)
+
+    summary = {}
+    for group, members in sorted(groups.items(), key=lambda g: int(g[0].split('-')[0])):
+        summary[group] = {'commits': len(members)}
+        for engine in ENGINES:
+            seconds = [row[engine] for row in members]
+            summary[group][engine] = {
+                'mean': statistics.mean(seconds),
+                'median': statistics.median(seconds)
+            }
+        summary[group]['fastest'] = min(ENGINES, key=lambda e: summary[group][e]['median'])
+
+    return summary
+
+
+def report(benchmark):
+    """Return tables with the median milliseconds of each engine
+    by tree size and by change size"""
+
+    lines = []
+    for title, key in [('Files in the tree', 'by_tree_size'), ('Files changed', 'by_change_size')]:
+        lines.append("%-18s %8s %10s %10s %10s  %s" % ((title, 'commits') + tuple(ENGINES) + ('fastest',)))
+        for group, summary in benchmark[key].items():
+            medians = tuple(summary[engine]['median'] * 1000 for engine in ENGINES)
+            lines.append("%-18s %8d %8.1fms %8.1fms %8.1fms  %s" %
+                         ((group, summary['commits']) + medians + (summary['fastest'],)))
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+def run(repo_path, branch=None, max_commits=50, workdir=None):
+    """Compare the engines on a repository.
+
+    :param repo_path: path of a bare repository
+    :param branch: branch whose history is sampled, HEAD if None
+    :param max_commits: max number of commits sampled
+    :param workdir: directory where to prepare the snapshots; a
+        temporary one, removed at the end, if None
+
+    :returns: a dict with the versions of Graal and Python, the
+        measurements of each commit and their summaries by tree size
+        and by change size
+    """
+    tmp = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix='graal_engines_')
+
+    try:
+        rows = EngineBenchmark(repo_path, branch=branch, max_commits=max_commits).run(workdir)
+    finally:
+        if tmp:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'graal_version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'repository': os.path.abspath(repo_path),
+        'branch': branch,
+        'commits': rows,
+        'by_tree_size': summarize(rows, 'files'),
+        'by_change_size': summarize(rows, 'changed')
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.engines',
+                                     description="Compare the time spent preparing the snapshots of a "
+                                                 "repository with working trees, archives and blob reads")
+    parser.add_argument('repository',
+                        help="path of a bare repository, such as the mirror cloned by Graal (see --git-path)")
+    parser.add_argument('--branch',
+                        help="branch whose history is sampled, HEAD by default")
+    parser.add_argument('--max-commits', type=int, default=50,
+                        help="max number of commits sampled")
+    parser.add_argument('--workdir',
+                        help="directory where to prepare the snapshots")
+    parser.add_argument('-o', '--output',
+                        help="path of the JSON file where the results are saved")
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.WARNING, format='[%(asctime)s] %(message)s')
+
+    try:
+        benchmark = run(args.repository, branch=args.branch, max_commits=args.max_commits, workdir=args.workdir)
+    except RepositoryError as e:
+        parser.error(str(e))
+
+    print(report(benchmark))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(benchmark, f, indent=4, sort_keys=True)
+        print("Results saved to %s" % args.output, file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import bisect
+import itertools
+import math
+import os
+import random
+import subprocess
+
+PYTHON_PACKAGE = 'pkg'
+
+DEFAULT_LANGUAGES = {'py': 0.4, 'java': 0.3, 'c': 0.2, 'js': 0.1}
+
+AUTHOR = b'Graal Benchmark <benchmark@example.com>'
+FIRST_TIMESTAMP = 1514764800
+
+GIT_ENV = {
+    'LANG': 'C',
+    'HOME': '',
+    'GIT_CONFIG_NOSYSTEM': '1'
+}
+
+# Sizes of the repositories generated by default; `files` is the
+# number of files in the first commit
+PROFILES = {
+    'small': {'commits': 20, 'files': 50},
+    'medium': {'commits': 100, 'files': 300},
+    'large': {'commits': 500, 'files': 2000}
+}
+
+
+class RepositoryGenerator:
+    """Generator of synthetic Git repositories.
+
+    The repositories are written with `git fast-import`, thus no network
+    and no working tree are needed, and they are the same for the same
+    parameters: authors, dates and contents only depend on `seed`.
+
+    The first commit adds `files` source files, written in the
+    `languages` given with their share of the files (e.g., `{'py': 0.5,
+    'java': 0.5}`). The Python files are modules of the package `pkg`,
+    which can be used as entrypoint by CoQua, CoVuln and CoDep, while
+    the others are under `src/<language>`. The number of lines of each
+    file follows a log-normal distribution with median `median_lines`
+    and shape `size_sigma`.
+
+    Each following commit modifies `changes` files, on average; a
+    modified file is also renamed with probability `rename_rate`. With
+    probability `merge_rate`, a commit is done on a side branch and
+    merged back by the next one, thus `commits` includes the merges.
+
+    :param commits: number of commits
+    :param files: number of files added by the first commit
+    :param languages: dict with the share of files of each language
+    :param median_lines: median number of lines of the files
+    :param size_sigma: standard deviation of the logarithm of the number of lines
+    :param changes: average number of files modified by a commit
+    :param rename_rate: probability that a modified file is also renamed
+    :param merge_rate: probability that a commit is merged from a side branch
+    :param seed: seed of the random generator
+    """
+    def __init__(self, commits=100, files=100, languages=None, median_lines=100, size_sigma=1.0,
+                 changes=5, rename_rate=0.05, merge_rate=0.05, seed=0):
+        if commits < 1 or files < 1:
+            raise ValueError("at least one commit and one file are needed")
+
+        languages = languages or DEFAULT_LANGUAGES
+        unknown = set(languages) - set(_TEMPLATES)
+        if unknown:
+            raise ValueError("unknown languages %s, use %s" % (sorted(unknown), sorted(_TEMPLATES)))
+
+        self.commits = commits
+        self.files = files
+        self.languages = languages
+        self.median_lines = median_lines
+        self.size_sigma = size_sigma
+        self.changes = changes
+        self.rename_rate = rename_rate
+        self.merge_rate = merge_rate
+        self.seed = seed
+
+    def parameters(self):
+        """Return the parameters of the generator"""
+
+        return {
+            'commits': self.commits,
+            'files': self.files,
+            'languages': dict(self.languages),
+            'median_lines': self.median_lines,
+            'size_sigma': self.size_sigma,
+            'changes': self.changes,
+            'rename_rate': self.rename_rate,
+            'merge_rate': self.merge_rate,
+            'seed': self.seed
+        }
+
+    def generate(self, path):
+        """Generate a bare repository at `path`
+
+        :param path: path of the repository, which must not exist
+
+        :returns: the manifest of the repository, a dict with the number
+            of `commits`, `merges` and `renames`, the number of `files`
+            and `lines` of the last commit, and the sum of the files of
+            the trees of all the commits (`analyses`), both for all the
+            files (`*`) and for the Python ones (`py`)
+        """
+        self._rng = random.Random(self.seed)
+        self._counter = 0
+        self._manifest = {
+            'path': path,
+            'commits': 0,
+            'merges': 0,
+            'renames': 0,
+            'analyses': {'*': 0, 'py': 0}
+        }
+
+        os.makedirs(path)
+        env = dict(GIT_ENV)
+        subprocess.check_call(['git', 'init', '-q', '--bare'], cwd=path, env=env)
+        subprocess.check_call(['git', 'symbolic-ref', 'HEAD', 'refs/heads/master'], cwd=path, env=env)
+
+        proc = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=path, env=env,
+                                stdin=subprocess.PIPE)
+        try:
+            tree = self.__write_history(proc.stdin)
+        finally:
+            proc.stdin.close()
+            if proc.wait() != 0:
+                raise RuntimeError("git fast-import failed with exit code %s" % proc.returncode)
+
+        self._manifest['files'] = len(tree)
+        self._manifest['lines'] = sum(f.lines for f in tree.values())
+
+        return self._manifest
+
+    def __write_history(self, stream):
+        tree = {}
+        ops = [('M', path, f) for path, f in self.__add_files(tree, self.files)]
+        ops.insert(0, ('M', PYTHON_PACKAGE + '/__init__.py', _File('py', [])))
+        tree[PYTHON_PACKAGE + '/__init__.py'] = ops[0][2]
+
+        mark = self.__commit(stream, 'refs/heads/master', tree, ops)
+
+        while self._manifest['commits'] < self.commits:
+            merge = self._manifest['commits'] + 2 <= self.commits and self._rng.random() < self.merge_rate
+
+            if not merge:
+                ops = self.__change_files(tree)
+                mark = self.__commit(stream, 'refs/heads/master', tree, ops, parent=mark)
+                continue
+
+            side = dict(tree)
+            side_ops = self.__change_files(side)
+            side_mark = self.__commit(stream, 'refs/heads/side', side, side_ops, parent=mark)
+
+            # the merge keeps the changes of the side branch
+            # and adds its own, on files not changed there
+            changed = set(op[1] for op in side_ops) | set(op[2] for op in side_ops if op[0] == 'R')
+            tree = side
+            ops = side_ops + self.__change_files(tree, exclude=changed)
+            mark = self.__commit(stream, 'refs/heads/master', tree, ops, parent=mark, merge=side_mark)
+            self._manifest['merges'] += 1
+
+        return tree
+
+    def __commit(self, stream, ref, tree, ops, parent=None, merge=None):
+        """Write a commit with the operations `ops`, whose tree is `tree`"""
+
+        self._manifest['commits'] += 1
+        mark = self._manifest['commits']
+        timestamp = FIRST_TIMESTAMP + mark * 3600
+        message = b'Commit %d' % mark
+
+        stream.write(b'commit %s\nmark :%d\n' % (ref.encode('utf-8'), mark))
+        stream.write(b'author %s %d +0000\n' % (AUTHOR, timestamp))
+        stream.write(b'committer %s %d +0000\n' % (AUTHOR, timestamp))
+        stream.write(b'data %d\n%s\n' % (len(message), message))
+        if parent is not None:
+            stream.write(b'from :%d\n' % parent)
+        if merge is not None:
+            stream.write(b'merge :%d\n' % merge)
+
+        for op in ops:
+            if op[0] == 'R':
+                stream.write(b'R %s %s\n' % (op[1].encode('utf-8'), op[2].encode('utf-8')))
+            else:
+                content = op[2].render(op[1]).encode('utf-8')
+                stream.write(b'M 100644 inline %s\ndata %d\n' % (op[1].encode('utf-8'), len(content)))
+                stream.write(content)
+                stream.write(b'\n')
+        stream.write(b'\n')
+
+        self._manifest['analyses']['*'] += len(tree)
+        self._manifest['analyses']['py'] += sum(1 for f in tree.values() if f.language == 'py')
+
+        return mark
+
+    def __add_files(self, tree, count):
+        """Add `count` files to `tree`, and return them as (path, file) pairs"""
+
+        languages = sorted(self.languages)
+        weights = list(itertools.accumulate(self.languages[language] for language in languages))
+
+        # same draws as `random.choices`, which is not available before Python 3.6
+        drawn = [languages[bisect.bisect(weights, self._rng.random() * weights[-1])] for _ in range(count)]
+
+        added = []
+        for language in drawn:
+            lines = self._rng.lognormvariate(math.log(self.median_lines), self.size_sigma)
+            functions = max(1, int(lines) // _FUNCTION_LINES)
+            f = _File(language, [self._rng.getrandbits(32) for _ in range(functions)])
+            path = self.__path(language)
+            tree[path] = f
+            added.append((path, f))
+
+        return added
+
+    def __change_files(self, tree, exclude=()):
+        """Modify and rename some files of `tree`, and return the operations done"""
+
+        candidates = sorted(path for path, f in tree.items() if f.functions and path not in exclude)
+        count = min(len(candidates), max(1, int(self._rng.expovariate(1 / self.changes) + 0.5)))
+
+        ops = []
+        for path in self._rng.sample(candidates, count):
+            f = tree.pop(path)
+            f = _File(f.language, list(f.functions))
+
+            # rewrite a function, and sometimes add a new one
+            f.functions[self._rng.randrange(len(f.functions))] = self._rng.getrandbits(32)
+            if self._rng.random() < 0.3:
+                f.functions.append(self._rng.getrandbits(32))
+
+            if self._rng.random() < self.rename_rate:
+                new_path = self.__path(f.language)
+                ops.append(('R', path, new_path))
+                self._manifest['renames'] += 1
+                path = new_path
+
+            tree[path] = f
+            ops.append(('M', path, f))
+
+        return ops
+
+    def __path(self, language):
+        self._counter += 1
+        n = self._counter
+
+        if language == 'py':
+            return '%s/module_%d.py' % (PYTHON_PACKAGE, n)
+        if language == 'java':
+            return 'src/java/d%d/File%d.java' % (n % 10, n)
+
+        return 'src/%s/d%d/file_%d.%s' % (language, n % 10, n, language)
+
+
+class _File:
+    """Source file, made of functions generated from their seeds"""
+
+    def __init__(self, language, functions):
+        self.language = language
+        self.functions = functions
+
+    @property
+    def lines(self):
+        return self.render('').count('\n')
+
+    def render(self, path):
+        return _TEMPLATES[self.language](path, self.functions)
+
+
+# Lines of a function, without the branches
+_FUNCTION_LINES = 8
+
+
+def _branches(seed):
+    """Return the number of branches and two constants of a function"""
+
+    return seed % 4, seed % 7 + 2, seed % 97 + 3
+
+
+def _render_python(path, functions):
+    lines = ['"""Module generated for benchmarking Graal"""', '', 'import os', '']
+    for i, seed in enumerate(functions):
+        branches, k, m = _branches(seed)
+        lines += ['', 'def fun_%d(value):' % i,
+                  '    """Return a value derived from `value`"""', '',
+                  '    total = 0', '    for i in range(value):',
+                  '        if i %% %d == 0:' % k, '            total += i']
+        for b in range(branches):
+            lines += ['        elif i > %d:' % (m + b), '            total -= %d' % (b + 1)]
+        lines += ['    assert total >= -value * %d' % (branches + 1), '    return total', '']
+
+    if functions:
+        lines += ['', 'class Module:', '    """Class generated for benchmarking Graal"""', '',
+                  '    def run(self):', '        return fun_0(len(os.sep))', '']
+
+    return '\n'.join(lines)
+
+
+def _render_braces(header, signature, footer, var='int'):
+    """Return the renderer of a language with C-like syntax"""
+
+    def render(path, functions):
+        name = os.path.splitext(os.path.basename(path))[0]
+        indent = '    ' if footer else ''
+        lines = [line % {'name': name} for line in header]
+        for i, seed in enumerate(functions):
+            branches, k, m = _branches(seed)
+            body = ['', signature % i + ' {',
+                    '    %s total = 0;' % var,
+                    '    for (%s i = 0; i < value; i++) {' % var,
+                    '        if (i %% %d == 0) {' % k,
+                    '            total += i;']
+            for b in range(branches):
+                body += ['        } else if (i > %d) {' % (m + b),
+                         '            total -= %d;' % (b + 1)]
+            body += ['        }', '    }', '    return total;', '}']
+            lines += [indent + line if line else line for line in body]
+
+        return '\n'.join(lines + footer + [''])
+
+    return render
+
+
+_TEMPLATES = {
+    'py': _render_python,
+    'java': _render_braces(['// File generated for benchmarking Graal', '',
+                            'public class %(name)s {'],
+                           'public int fun_%d(int value)', ['}']),
+    'c': _render_braces(['/* File generated for benchmarking Graal */', '',
+                         '#include <stdio.h>'],
+                        'int fun_%d(int value)', []),
+    'js': _render_braces(['// File generated for benchmarking Graal'],
+                         'function fun_%d(value)', [], var='var')
+}
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from graal._version import __version__
+from graal.backends.core.cocom import CoCom
+from graal.backends.core.codep import CoDep
+from graal.backends.core.coqua import CoQua
+from graal.backends.core.covuln import CoVuln
+from graal.graal import GraalRepository
+from graal.memory import RSS_UNIT
+
+from .generator import (DEFAULT_LANGUAGES,
+                        PROFILES,
+                        PYTHON_PACKAGE,
+                        RepositoryGenerator)
+
+# Backends run by the benchmark, with the arguments they need
+# and the files of the trees they analyze
+BACKENDS = {
+    'cocom': (CoCom, {}, '*'),
+    'coqua': (CoQua, {'entrypoint': PYTHON_PACKAGE}, 'py'),
+    'covuln': (CoVuln, {'entrypoint': PYTHON_PACKAGE}, 'py'),
+    'codep': (CoDep, {'entrypoint': PYTHON_PACKAGE}, 'py')
+}
+
+# Seconds between the checks of the process running a backend
+POLL_INTERVAL = 1
+
+logger = logging.getLogger(__name__)
+
+
+def run_backend(name, manifest, workdir, **kwargs):
+    """Run a backend on a generated repository and measure it.
+
+    The backend runs in a new process, thus its peak RSS does not
+    depend on the backends run before. The repository is mirrored
+    before starting the clock, and the stages are timed as done by
+    the `perf` option of the backends.
+
+    :param name: name of the backend (see `BACKENDS`)
+    :param manifest: manifest of the repository, as returned by
+        `RepositoryGenerator.generate`
+    :param workdir: directory where to store the mirror and the working trees
+    :param kwargs: other arguments of the backend (e.g., `workers`)
+
+    :returns: a dict with the `commits` and `items` fetched, the `wall` and
+        `cpu` seconds spent, the `commits_per_second` and `files_per_second`,
+        the `peak_rss` of the process and of its children, in bytes, and the
+        time spent in each stage (`stages`), or with the `error` raised
+
+    :raises RuntimeError: when the process exits without a result
+    """
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    proc = ctx.Process(target=_run_backend, args=(results, name, manifest, workdir, kwargs))
+    proc.start()
+
+    try:
+        result = _wait_result(proc, results)
+    finally:
+        proc.join()
+
+    if result is None:
+        raise RuntimeError("benchmark of %s exited with code %s without a result" % (name, proc.exitcode))
+
+    return result
+
+
+def _wait_result(proc, results):
+    """Return the result put by `proc` in `results`, or None when
+    the process exits without putting it"""
+
+    while True:
+        # a result put before exiting is already in the queue
+        alive = proc.is_alive()
+        try:
+            return results.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            if not alive:
+                return None
+
+
+def _run_backend(results, name, manifest, workdir, kwargs):
+    try:
+        result = _measure_backend(name, manifest, workdir, kwargs)
+    except Exception as e:
+        logger.exception("Benchmark of %s failed", name)
+        result = {'error': '%s: %s' % (e.__class__.__name__, e)}
+
+    results.put(result)
+
+
+def _measure_backend(name, manifest, workdir, kwargs):
+    klass, params, files = BACKENDS[name]
+    params = dict(params, **kwargs)
+
+    uri = manifest['path']
+    git_path = os.path.join(workdir, name, 'mirror')
+    worktree_path = os.path.join(workdir, name, 'worktrees')
+    GraalRepository.clone(uri, git_path)
+
+    backend = klass(uri, git_path, worktree_path, perf=True, **params)
+
+    commits = set()
+    items = 0
+    stages = {}
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for item in backend.fetch():
+        items += 1
+        commits.add(item['data']['commit'])
+        for stage, timing in item['perf'].items():
+            total = stages.setdefault(stage, {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+            for key in total:
+                total[key] += timing[key]
+    wall = time.perf_counter() - wall
+
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = time.process_time() - cpu + children.ru_utime + children.ru_stime
+
+    return {
+        'commits': len(commits),
+        'items': items,
+        'wall': wall,
+        'cpu': cpu,
+        'commits_per_second': len(commits) / wall if wall else 0.0,
+        'files_per_second': manifest['analyses'][files] / wall if wall else 0.0,
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT,
+        'children_peak_rss': children.ru_maxrss * RSS_UNIT,
+        'stages': stages
+    }
+
+
+def run(generator, backends=None, options=None, workdir=None, keep=False):
+    """Generate a repository and run the backends on it.
+
+    :param generator: the `RepositoryGenerator` of the repository
+    :param backends: names of the backends to run, all of them if None
+    :param options: dict with other arguments of each backend
+        (e.g., `{'cocom': {'workers': 4}}`)
+    :param workdir: directory where to generate the repository and
+        the mirrors; a temporary one, removed at the end, if None
+    :param keep: if enable, the temporary directory is kept
+
+    :returns: a dict with the versions of Graal, of the backends and of
+        Python, the parameters of the generator, the manifest of the
+        repository and the results of each backend
+    """
+    backends = backends or sorted(BACKENDS)
+    options = options or {}
+    tmp = workdir is None and not keep
+    workdir = workdir or tempfile.mkdtemp(prefix='graal_bench_')
+
+    try:
+        manifest = generator.generate(os.path.join(workdir, 'repository'))
+        logger.info("Repository with %s commits and %s files generated at %s",
+                    manifest['commits'], manifest['files'], manifest['path'])
+
+        results = {}
+        for name in backends:
+            logger.info("Running %s", name)
+            results[name] = run_backend(name, manifest, workdir, **options.get(name, {}))
+    finally:
+        if tmp:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'graal_version': __version__,
+        'backend_versions': {name: BACKENDS[name][0].version for name in backends},
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'options': options,
+        'generator': generator.parameters(),
+        'repository': {key: value for key, value in manifest.items() if key != 'path'},
+        'results': results
+    }
+
+
+def report(benchmark):
+    """Return a table with the results of a benchmark"""
+
+    lines = ["%-8s %8s %10s %10s %12s %12s" % ('backend', 'commits', 'commits/s', 'files/s', 'peak RSS', 'children')]
+    for name, result in sorted(benchmark['results'].items()):
+        if 'error' in result:
+            lines.append("%-8s %s" % (name, result['error']))
+            continue
+
+        lines.append("%-8s %8d %10.2f %10.2f %10.1fMB %10.1fMB" %
+                     (name, result['commits'], result['commits_per_second'], result['files_per_second'],
+                      result['peak_rss'] / 2 ** 20, result['children_peak_rss'] / 2 ** 20))
+
+        stages = sorted(result['stages'].items(), key=lambda s: s[1]['wall'], reverse=True)
+        for stage, timing in stages:
+            lines.append("  %-12s %8.3fs wall %8.3fs cpu %8d calls" %
+                         (stage, timing['wall'], timing['cpu'], timing['calls']))
+
+    return '\n'.join(lines)
+
+
+def languages(value):
+    """Parse a mix of languages given as `py=0.5,java=0.5`"""
+
+    try:
+        mix = {}
+        for share in value.split(','):
+            language, weight = share.split('=')
+            mix[language.strip()] = float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid languages %s, expected <language>=<share>,..." % value)
+
+    return mix
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Measure the throughput of the Graal backends "
+                                                 "on a synthetic repository")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='small',
+                        help="size of the repository, overridden by --commits and --files")
+    parser.add_argument('--commits', type=int,
+                        help="number of commits")
+    parser.add_argument('--files', type=int,
+                        help="number of files of the first commit")
+    parser.add_argument('--languages', type=languages, default=DEFAULT_LANGUAGES,
+                        help="share of files of each language (e.g., py=0.5,java=0.3,c=0.2)")
+    parser.add_argument('--median-lines', type=int, default=100,
+                        help="median number of lines of the files")
+    parser.add_argument('--size-sigma', type=float, default=1.0,
+                        help="standard deviation of the logarithm of the number of lines")
+    parser.add_argument('--changes', type=int, default=5,
+                        help="average number of files modified by a commit")
+    parser.add_argument('--rename-rate', type=float, default=0.05,
+                        help="probability that a modified file is also renamed")
+    parser.add_argument('--merge-rate', type=float, default=0.05,
+                        help="probability that a commit is merged from a side branch")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed of the generator")
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS),
+                        help="backends to run, all of them by default")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of workers of CoCom")
+    parser.add_argument('--workdir',
+                        help="directory where to generate the repository")
+    parser.add_argument('--keep', action='store_true',
+                        help="keep the temporary directory of the repository and the mirrors")
+    parser.add_argument('-o', '--output',
+                        help="path of the JSON file where the results are saved")
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.WARNING, format='[%(asctime)s] %(message)s')
+    logger.setLevel(logging.INFO)
+
+    size = dict(PROFILES[args.profile])
+    if args.commits is not None:
+        size['commits'] = args.commits
+    if args.files is not None:
+        size['files'] = args.files
+
+    generator = RepositoryGenerator(languages=args.languages, median_lines=args.median_lines,
+                                    size_sigma=args.size_sigma, changes=args.changes,
+                                    rename_rate=args.rename_rate, merge_rate=args.merge_rate,
+                                    seed=args.seed, **size)
+
+    options = {'cocom': {'workers': args.workers}}
+
+    benchmark = run(generator, backends=args.backends, options=options, workdir=args.workdir, keep=args.keep)
+    benchmark['profile'] = args.profile
+
+    print(report(benchmark))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(benchmark, f, indent=4, sort_keys=True)
+        print("Results saved to %s" % args.output, file=sys.stderr)
+
+    return 0
@@ -21,18 +21,127 @@
 #
 
 
+from contextlib import contextmanager
+import os
+import subprocess
+import time
+
+from graal.graal import (ALL_ANALYZERS,
+                         SKIP_TIMEOUT,
+                         SKIP_TOO_LARGE,
+                         AnalysisSkippedError)
+from graal.memory import record_child
+from graal.metrics import ANALYZER_DURATION
+from graal.perf import stage
+from graal.profiling import record_run
+from .runner import run_tool
+
+
 class Analyzer:
     """Abstract class for analyzer.
 
     Base class to perform analysis on software artifacts.
 
     Derivated classes have to implement the method
-    `analyze(self, **kwargs)`.
+    `analyze(self, **kwargs)`. External tools are executed with
+    `_run_tool`, which streams their output to a `LineParser`.
+    Derivated classes can rely on `_check_size` and `_timeout_error`
+    to give up the analysis of targets too large or taking too long.
+    The time spent by the tools is measured with `_measure`, which records
+    it in the stages of the analysis, when they are timed (see `graal.perf`),
+    in the metrics of the analyzer (see `graal.metrics`) and in the profile
+    of the execution, if any (see `graal.profiling`). The peak memory of
+    the tools is recorded as well, when tracked (see `graal.memory`).
 
     :raises NotImplementedError: raised when `analyze`
         is not defined
     """
-    version = '0.1.0'
+    version = '0.1.4'
+
+    @property
+    def name(self):
+        """Name of the analyzer, used to set its limits"""
+
+        return self.__class__.__name__.lower()
 
     def analyze(self, **kwargs):
         raise NotImplementedError
+
+    def size_limit(self, max_file_size):
+        """Get the max size of the files analyzed by this analyzer
+
+        :param max_file_size: max size in bytes, or a dict with the
+            max size for each analyzer
+
+        :returns: the size limit, None if there is no limit
+        """
+        if isinstance(max_file_size, dict):
+            return max_file_size.get(self.name, max_file_size.get(ALL_ANALYZERS, None))
+
+        return max_file_size
+
+    def _check_size(self, file_path, max_file_size):
+        """Check whether a file can be analyzed according to its size
+
+        :param file_path: file path
+        :param max_file_size: max size in bytes, or a dict with the
+            max size for each analyzer
+
+        :raises AnalysisSkippedError: raised when the file is too large
+        """
+        limit = self.size_limit(max_file_size)
+        if limit is None:
+            return
+
+        size = os.path.getsize(file_path)
+        if size > limit:
+            cause = "%s skipped %s, %s bytes exceed the limit of %s" % (self.name, file_path, size, limit)
+            raise AnalysisSkippedError(cause=cause, target=file_path,
+                                       reason=SKIP_TOO_LARGE, analyzer=self.name)
+
+    def _run_tool(self, cmd, parser, target, timeout=None, cwd=None):
+        """Run an external tool over a target, feeding its output to a parser
+
+        :param cmd: command to execute, as a list
+        :param parser: a `LineParser` object
+        :param target: file or folder analyzed
+        :param timeout: seconds after which the tool is killed
+        :param cwd: directory where to run the tool
+
+        :returns: a `ToolRun` object
+
+        :raises AnalysisSkippedError: raised when the tool timed out
+        """
+        with self._measure(target) as timer:
+            try:
+                run = run_tool(cmd, parser, timeout=timeout, cwd=cwd)
+            except subprocess.TimeoutExpired:
+                raise self._timeout_error(target, timeout)
+
+            timer.cpu += run.cpu_time
+
+        record_child(self.name, run.max_rss)
+
+        return run
+
+    @contextmanager
+    def _measure(self, target=None):
+        """Record the time spent in the block as spent by the analyzer
+        on `target`. The object returned has an attribute `cpu`, where
+        the CPU time of external tools can be added (see `graal.perf.stage`)."""
+
+        start = time.perf_counter()
+        with stage(self.name) as timer:
+            try:
+                yield timer
+            finally:
+                wall = time.perf_counter() - start
+                ANALYZER_DURATION.labels(self.name).observe(wall)
+                record_run(self.name, target, wall, timer.cpu)
+
+    def _timeout_error(self, target, timeout):
+        """Build the error raised when the analysis of a target timed out"""
+
+        cause = "%s timed out at %s after %ss" % (self.name, target, timeout)
+        return AnalysisSkippedError(cause=cause, target=target,
+                                    reason=SKIP_TIMEOUT, analyzer=self.name)
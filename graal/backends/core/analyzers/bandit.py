@@ -21,10 +21,12 @@
 #
 
 from collections import Counter
-import subprocess
+import os
 
-from graal.graal import GraalError
+from graal.graal import (AnalysisSkippedError,
+                         GraalError)
 from .analyzer import Analyzer
+from .runner import LineParser
 
 
 class Bandit(Analyzer):
@@ -33,85 +35,98 @@ class Bandit(Analyzer):
     Once Bandit has finished scanning all the files it generates a report.
     """
 
-    version = '0.2.1'
+    version = '0.2.4'
+
+    PYTHON_EXTENSIONS = ('.py', '.pyw')
 
     def analyze(self, **kwargs):
         """Add security issue data using Bandit.
 
         :param folder_path: folder path
         :param details: if True, it returns information about single vulnerabilities
+        :param timeout: max seconds to wait for Bandit
+        :param max_file_size: max size in bytes of the files scanned, or a dict
+            with the max size for each analyzer
+        :param skipped: list where to append an `AnalysisSkippedError` for each
+            file excluded from the scan because it is too large
 
         :returns result: dict of the results of the analysis
+
+        :raises AnalysisSkippedError: raised when Bandit timed out
         """
         folder_path = kwargs['folder_path']
         details = kwargs['details']
+        timeout = kwargs.get('timeout', None)
+        skipped = kwargs.get('skipped', None)
 
-        try:
-            msg = subprocess.check_output(['bandit', '-r', folder_path]).decode("utf-8")
-        except subprocess.CalledProcessError as e:
-            msg = e.output.decode("utf-8")
-            if not msg.startswith("Run started:"):
-                raise GraalError(cause="Bandit failed at %s, %s" % (folder_path, msg))
-        finally:
-            subprocess._cleanup()
-
-        vulns = []
-        severities = []
-        confidences = []
-        loc = None
-        descr = None
-        severity = None
-        confidence = None
-        inIssue = False
-        inOverview = False
-        lines = msg.lower().split('\n')
-        for line in lines:
-            if line.startswith(">> issue: "):
-                descr = line.replace(">> issue: ", "")
-                inIssue = True
-            elif line.startswith("code scanned:"):
-                inOverview = True
-            else:
-                if inIssue:
-                    line = line.strip()
-                    if line.startswith("severity:"):
-                        tokens = [t.strip(":") for t in line.split(" ")]
-                        severity = tokens[1]
-                        confidence = tokens[-1]
-                        severities.append(severity)
-                        confidences.append(confidence)
-                    elif line.startswith("location:"):
-                        location = line.replace("location: ", "").replace(folder_path, "")
-                        line = location.split(":")[-1]
-                        file = location.replace(":" + line, "")
-                        vuln = {"file": file,
-                                "line": int(line),
-                                "severity": severity,
-                                "confidence": confidence,
-                                "descr": descr}
-                        vulns.append(vuln)
-                        severity = None
-                        confidence = None
-                        descr = None
-                        inIssue = False
-                elif inOverview:
-                    if line.startswith("\ttotal lines of code:"):
-                        loc = line.split(":")[1].strip()
-                        loc = int(loc)
-                        break
-                else:
-                    continue
+        excluded = self.__exclude_large_files(folder_path, kwargs.get('max_file_size', None))
+        if skipped is not None:
+            skipped.extend(excluded)
+
+        # the files excluded are left out of the targets, since
+        # the paths given with `-x` are split on commas and matched
+        # as substrings, thus they may exclude other files too
+        targets = self.__targets(folder_path, {e.target for e in excluded})
+
+        parser = BanditParser(folder_path)
+        if targets:
+            cmd = ['bandit', '-r'] + targets
+            run = self._run_tool(cmd, parser, folder_path, timeout=timeout)
+
+            if run.returncode != 0 and not parser.started:
+                raise GraalError(cause="Bandit failed at %s, %s" % (folder_path, run.output))
+        else:
+            parser.loc = 0
 
-        result = {'loc_analyzed': loc,
-                  'num_vulns': len(vulns),
-                  'by_severity': self.__create_ranked_dict(severities),
-                  'by_confidence': self.__create_ranked_dict(confidences)}
+        result = {'loc_analyzed': parser.loc,
+                  'num_vulns': len(parser.vulns),
+                  'by_severity': self.__create_ranked_dict(parser.severities),
+                  'by_confidence': self.__create_ranked_dict(parser.confidences)}
 
         if details:
-            result['vulns'] = vulns
+            result['vulns'] = parser.vulns
 
         return result
 
+    def __exclude_large_files(self, folder_path, max_file_size):
+        """Find the Python files of a folder which exceed the size limit"""
+
+        if self.size_limit(max_file_size) is None:
+            return []
+
+        excluded = []
+        for root, _, files in os.walk(folder_path):
+            for name in files:
+                if not name.endswith(self.PYTHON_EXTENSIONS):
+                    continue
+
+                try:
+                    self._check_size(os.path.join(root, name), max_file_size)
+                except AnalysisSkippedError as e:
+                    excluded.append(e)
+
+        return excluded
+
+    def __targets(self, path, excluded):
+        """List the paths to scan in order to cover the Python files
+        of a folder but the ones excluded. The folders without any file
+        excluded are scanned as a whole, the others are listed entry by entry"""
+
+        if not any(target.startswith(path + os.sep) for target in excluded):
+            return [path]
+
+        targets = []
+        for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+            if entry.path in excluded:
+                continue
+
+            if entry.is_dir(follow_symlinks=False):
+                targets.extend(self.__targets(entry.path, excluded))
+            elif entry.name.endswith(self.PYTHON_EXTENSIONS):
+                targets.append(entry.path)
+
+        return targets
+
     @staticmethod
     def __create_ranked_dict(lst):
         output = {
@@ -129,3 +144,62 @@ class Bandit(Analyzer):
             output[k] = counted[k]
 
         return output
+
+
+class BanditParser(LineParser):
+    """Parser of the text report of Bandit, which collects the issues
+    found and the lines of code scanned.
+
+    :param folder_path: folder scanned, removed from the locations of the issues
+    """
+    def __init__(self, folder_path):
+        super().__init__()
+        self.folder_path = folder_path
+        self.started = None
+        self.vulns = []
+        self.severities = []
+        self.confidences = []
+        self.loc = None
+
+        self.descr = None
+        self.severity = None
+        self.confidence = None
+        self.in_issue = False
+        self.in_overview = False
+
+    def feed(self, line):
+        if self.started is None:
+            self.started = line.startswith("Run started:")
+
+        line = line.lower()
+        if line.startswith(">> issue: "):
+            self.descr = line.replace(">> issue: ", "")
+            self.in_issue = True
+        elif line.startswith("code scanned:"):
+            self.in_overview = True
+        elif self.in_issue:
+            line = line.strip()
+            if line.startswith("severity:"):
+                tokens = [t.strip(":") for t in line.split(" ")]
+                self.severity = tokens[1]
+                self.confidence = tokens[-1]
+                self.severities.append(self.severity)
+                self.confidences.append(self.confidence)
+            elif line.startswith("location:"):
+                location = line.replace("location: ", "").replace(self.folder_path, "")
+                line = location.split(":")[-1]
+                file = location.replace(":" + line, "")
+                vuln = {"file": file,
+                        "line": int(line),
+                        "severity": self.severity,
+                        "confidence": self.confidence,
+                        "descr": self.descr}
+                self.vulns.append(vuln)
+                self.severity = None
+                self.confidence = None
+                self.descr = None
+                self.in_issue = False
+        elif self.in_overview:
+            if line.startswith("\ttotal lines of code:"):
+                self.loc = int(line.split(":")[1].strip())
+                self.done = True
@@ -20,10 +20,9 @@
 #     Valerio Cosentino <valcos@bitergia.com>
 #
 
-import subprocess
-
 from graal.graal import GraalError
 from .analyzer import Analyzer
+from .runner import LineParser
 
 
 class Cloc(Analyzer):
@@ -32,45 +31,61 @@ class Cloc(Analyzer):
     This class allows to call Cloc over a file, parses
     the result of the analysis and returns it as a dict.
     """
-    version = '0.1.1'
+    version = '0.1.3'
 
     def analyze(self, **kwargs):
         """Add information about LOC, blank and commented lines using CLOC
 
         :param file_path: file path
+        :param timeout: max seconds to wait for Cloc
+        :param max_file_size: max size in bytes of the file, or a dict
+            with the max size for each analyzer
 
         :returns result: dict of the results of the analysis
+
+        :raises AnalysisSkippedError: raised when the file is too large
+            or Cloc timed out
         """
-        result = {'blanks': 0,
-                  'comments': 0,
-                  'loc': 0
-                  }
         file_path = kwargs['file_path']
-        flag = False
-
-        try:
-            msg = subprocess.check_output(['cloc', file_path]).decode("utf-8")
-        except subprocess.CalledProcessError as e:
-            raise GraalError(cause="Cloc failed at %s, %s" % (file_path, e.output.decode("utf-8")))
-        finally:
-            subprocess._cleanup()
-
-        for line in msg.split("\n"):
-            if flag:
-                if not line.startswith("-----"):
-                    digested = " ".join(line.split())
-                    info_file = digested.split(" ")
-                    blank_lines = int(info_file[2])
-                    commented_lines = int(info_file[3])
-                    loc = int(info_file[4])
-
-                    result['blanks'] = blank_lines
-                    result['comments'] = commented_lines
-                    result['loc'] = loc
-                    break
-
-            if line.lower().startswith("language"):
-                flag = True
+        timeout = kwargs.get('timeout', None)
+
+        self._check_size(file_path, kwargs.get('max_file_size', None))
+
+        parser = ClocParser()
+        run = self._run_tool(['cloc', file_path], parser, file_path, timeout=timeout)
+
+        if run.returncode != 0:
+            raise GraalError(cause="Cloc failed at %s, %s" % (file_path, run.output))
+
+        result = {'blanks': parser.blanks,
+                  'comments': parser.comments,
+                  'loc': parser.loc
+                  }
 
         result['ext'] = file_path.split(".")[-1]
         return result
+
+
+class ClocParser(LineParser):
+    """Parser of the output of Cloc, which reads the first
+    row of the table of languages"""
+
+    def __init__(self):
+        super().__init__()
+        self.blanks = 0
+        self.comments = 0
+        self.loc = 0
+        self.in_table = False
+
+    def feed(self, line):
+        if self.in_table:
+            if not line.startswith("-----"):
+                info_file = line.split()
+                self.blanks = int(info_file[2])
+                self.comments = int(info_file[3])
+                self.loc = int(info_file[4])
+                self.done = True
+                return
+
+        if line.lower().startswith("language"):
+            self.in_table = True
@@ -20,60 +20,40 @@
 #     Valerio Cosentino <valcos@bitergia.com>
 #
 
-import subprocess
-
 from graal.graal import GraalError
 from .analyzer import Analyzer
+from .runner import LineParser
 
 
 class Lint(Analyzer):
     """A wrapper for Pylint, a source code, bug and quality checker for Python."""
 
-    version = '0.2.0'
+    version = '0.2.2'
 
     def analyze(self, **kwargs):
         """Add quality checks data using Pylint.
 
         :param module_path: module path
         :param details: if True, it returns information about single modules
+        :param timeout: max seconds to wait for Pylint
 
         :returns result: dict of the results of the analysis
+
+        :raises AnalysisSkippedError: raised when Pylint timed out
         """
         module_path = kwargs['module_path']
         details = kwargs['details']
+        timeout = kwargs.get('timeout', None)
+
+        parser = LintParser()
+        run = self._run_tool(['pylint', '-rn', '--output-format=text', module_path], parser,
+                             module_path, timeout=timeout)
 
-        try:
-            msg = subprocess.check_output(['pylint', '-rn', '--output-format=text', module_path]).decode("utf-8")
-        except subprocess.CalledProcessError as e:
-            msg = e.output.decode("utf-8")
-            if not msg.startswith("***"):
-                raise GraalError(cause="Pylint failed at %s, %s" % (module_path, msg))
-        finally:
-            subprocess._cleanup()
-
-        end = False
-        code_quality = None
-        mod_details = []
-        module_name = ""
-        lines = msg.split('\n')
-        modules = {}
-        for line in lines:
-            if line.startswith("***"):
-                if mod_details:
-                    modules.update({module_name: mod_details})
-                module_name = line.strip("*").strip().replace("Module ", "")
-                mod_details = []
-            elif line.strip() == "":
-                continue
-            elif line.startswith("----"):
-                modules.update({module_name: mod_details})
-                end = True
-            else:
-                if end:
-                    code_quality = line.split("/")[0].split(" ")[-1]
-                    break
-                else:
-                    mod_details.append(line)
+        if run.returncode != 0 and not parser.started:
+            raise GraalError(cause="Pylint failed at %s, %s" % (module_path, run.output))
+
+        code_quality = parser.code_quality
+        modules = parser.modules
 
         result = {'quality': code_quality,
                   'num_modules': len(modules),
@@ -83,3 +63,38 @@ class Lint(Analyzer):
             result['modules'] = modules
 
         return result
+
+
+class LintParser(LineParser):
+    """Parser of the text report of Pylint, which collects the messages
+    of each module and the global evaluation of the code"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = None
+        self.code_quality = None
+        self.modules = {}
+
+        self.module_name = ""
+        self.mod_details = []
+        self.end = False
+
+    def feed(self, line):
+        if self.started is None:
+            self.started = line.startswith("***")
+
+        if line.startswith("***"):
+            if self.mod_details:
+                self.modules.update({self.module_name: self.mod_details})
+            self.module_name = line.strip("*").strip().replace("Module ", "")
+            self.mod_details = []
+        elif line.strip() == "":
+            return
+        elif line.startswith("----"):
+            self.modules.update({self.module_name: self.mod_details})
+            self.end = True
+        elif self.end:
+            self.code_quality = line.split("/")[0].split(" ")[-1]
+            self.done = True
+        else:
+            self.mod_details.append(line)
@@ -20,12 +20,21 @@
 #     Valerio Cosentino <valcos@bitergia.com>
 #
 
+import heapq
+import time
 import warnings
 
 import lizard
 
+from graal.graal import GraalError
 from .analyzer import Analyzer
 
+RANK_CCN = 'ccn'
+RANK_LOC = 'loc'
+
+SCOPE_FILE = 'file'
+SCOPE_COMMIT = 'commit'
+
 
 class Lizard(Analyzer):
     """A wrapper for Lizard, a code complexity analyzer, which is able
@@ -43,7 +52,10 @@ class Lizard(Analyzer):
         Scala
         GDScript
     """
-    version = '0.2.1'
+    version = '0.2.7'
+
+    # Number of tokens processed between two checks of the deadline
+    DEADLINE_CHECK_INTERVAL = 1000
 
     def analyze(self, **kwargs):
         """Add code complexity information using Lizard.
@@ -55,16 +67,38 @@ class Lizard(Analyzer):
 
         :param file_path: file path
         :param details: if True, it returns information about single functions
+        :param timeout: max seconds spent analyzing the file
+        :param max_file_size: max size in bytes of the file, or a dict
+            with the max size for each analyzer
+        :param funs_filter: a `FunctionFilter` object, which selects the
+            functions returned when `details` is True. The other results
+            are computed over all the functions
+        :param sketches: dict which maps `ccn` and `loc` to `KLLSketch` objects,
+            updated with the CCN and LOC of every function
 
         :returns  result: dict of the results of the analysis
+
+        :raises AnalysisSkippedError: raised when the file is too large
+            or its analysis timed out
         """
         result = {}
         file_path = kwargs['file_path']
         details = kwargs['details']
+        timeout = kwargs.get('timeout', None)
+        funs_filter = kwargs.get('funs_filter', None)
+        sketches = kwargs.get('sketches', None)
 
-        with warnings.catch_warnings():
+        self._check_size(file_path, kwargs.get('max_file_size', None))
+
+        if timeout:
+            deadline = time.monotonic() + timeout
+            analyze_file = lizard.FileAnalyzer(lizard.get_extensions([self.__deadline(file_path, timeout, deadline)]))
+        else:
+            analyze_file = lizard.analyze_file
+
+        with warnings.catch_warnings(), self._measure(file_path):
             warnings.simplefilter('ignore', DeprecationWarning)
-            analysis = lizard.analyze_file(file_path)
+            analysis = analyze_file(file_path)
 
         result['ccn'] = analysis.CCN
         result['avg_ccn'] = analysis.average_cyclomatic_complexity
@@ -75,11 +109,21 @@ class Lizard(Analyzer):
         result['tokens'] = analysis.token_count
         result['ext'] = file_path.split(".")[-1]
 
+        if sketches:
+            for metric, sketch in sketches.items():
+                attribute = FunctionFilter.RANK_ATTRIBUTES[metric]
+                for fun in analysis.function_list:
+                    sketch.update(getattr(fun, attribute))
+
         if not details:
             return result
 
+        functions = analysis.function_list
+        if funs_filter:
+            functions = funs_filter.select(functions)
+
         funs_data = []
-        for fun in analysis.function_list:
+        for fun in functions:
             fun_data = {'ccn': fun.cyclomatic_complexity,
                         'tokens': fun.token_count,
                         'loc': fun.nloc,
@@ -92,3 +136,91 @@ class Lizard(Analyzer):
 
         result['funs'] = funs_data
         return result
+
+    def __deadline(self, file_path, timeout, deadline):
+        """Build a Lizard extension which stops the analysis once
+        the deadline is over"""
+
+        def check_deadline(tokens, reader):
+            for i, token in enumerate(tokens):
+                if i % self.DEADLINE_CHECK_INTERVAL == 0 and time.monotonic() > deadline:
+                    raise self._timeout_error(file_path, timeout)
+                yield token
+
+        return check_deadline
+
+
+class FunctionFilter:
+    """Filter of the functions returned by Lizard.
+
+    Functions are kept when their CCN and LOC reach `min_ccn` and `min_loc`.
+    When `top` is set, only the `top` functions with the highest `rank_by`
+    metric (i.e., `ccn` or `loc`) are kept, in descending order. The top
+    functions are selected within each file or, when `scope` is `commit`,
+    over all the files of a commit (see `trim`).
+
+    :param top: number of functions to keep, all of them if None
+    :param rank_by: metric used to rank the functions, `ccn` or `loc`
+    :param scope: scope of the ranking, `file` or `commit`
+    :param min_ccn: min cyclomatic complexity of the functions kept
+    :param min_loc: min lines of code of the functions kept
+
+    :raises GraalError: raised when `rank_by` or `scope` are not valid
+    """
+    RANK_ATTRIBUTES = {
+        RANK_CCN: 'cyclomatic_complexity',
+        RANK_LOC: 'nloc'
+    }
+    SCOPES = [SCOPE_FILE, SCOPE_COMMIT]
+
+    def __init__(self, top=None, rank_by=RANK_CCN, scope=SCOPE_FILE, min_ccn=None, min_loc=None):
+        if rank_by not in self.RANK_ATTRIBUTES:
+            raise GraalError(cause="Unknown rank %s, valid ones are %s" % (rank_by, sorted(self.RANK_ATTRIBUTES)))
+        if scope not in self.SCOPES:
+            raise GraalError(cause="Unknown scope %s, valid ones are %s" % (scope, self.SCOPES))
+
+        self.top = top
+        self.rank_by = rank_by
+        self.scope = scope
+        self.min_ccn = min_ccn
+        self.min_loc = min_loc
+
+    def select(self, functions):
+        """Select the functions of a file.
+
+        The top functions of a file are kept also when the scope is
+        `commit`, since the top functions of a commit are among them.
+
+        :param functions: list of Lizard `FunctionInfo` objects
+
+        :returns: the list of functions selected
+        """
+        if self.min_ccn is not None:
+            functions = [fun for fun in functions if fun.cyclomatic_complexity >= self.min_ccn]
+        if self.min_loc is not None:
+            functions = [fun for fun in functions if fun.nloc >= self.min_loc]
+
+        if self.top is None:
+            return functions
+
+        attribute = self.RANK_ATTRIBUTES[self.rank_by]
+        return heapq.nlargest(self.top, functions, key=lambda fun: getattr(fun, attribute))
+
+    def trim(self, file_infos):
+        """Keep the top functions of a commit. This is a no-op unless
+        the scope is `commit`.
+
+        :param file_infos: list of the results of the files of a commit,
+            whose `funs` are modified in place
+        """
+        if self.scope != SCOPE_COMMIT or self.top is None:
+            return
+
+        ranked = ((fun[self.rank_by], i, j)
+                  for i, file_info in enumerate(file_infos)
+                  for j, fun in enumerate(file_info.get('funs', [])))
+        kept = {(i, j) for _, i, j in heapq.nlargest(self.top, ranked, key=lambda entry: entry[0])}
+
+        for i, file_info in enumerate(file_infos):
+            if 'funs' in file_info:
+                file_info['funs'] = [fun for j, fun in enumerate(file_info['funs']) if (i, j) in kept]
@@ -21,7 +21,6 @@
 #
 
 import os
-import subprocess
 import tempfile
 
 import networkx as nx
@@ -30,6 +29,7 @@ from networkx.readwrite import json_graph
 
 from graal.graal import GraalError
 from .analyzer import Analyzer
+from .runner import LineParser
 
 CLASSES_FILE_NAME = "classes.dot"
 PACKAGES_FILE_NAME = "packages.dot"
@@ -39,7 +39,7 @@ class Reverse(Analyzer):
     """A wrapper for Pyreverse, a tool to extract UML class diagrams and package
     dependencies from Python projects.
     """
-    version = '0.1.0'
+    version = '0.1.3'
 
     def __init__(self):
         self.tmp_path = tempfile.mkdtemp(prefix='codep_graal_')
@@ -49,17 +49,27 @@ class Reverse(Analyzer):
         """Get a UML class diagrams from a Python project.
 
         :param module_path: module path
+        :param timeout: max seconds to wait for Pyreverse
         :param result: dict of the results of the analysis
+
+        :raises AnalysisSkippedError: raised when Pyreverse timed out
         """
         result = {}
         module_path = kwargs['module_path']
+        timeout = kwargs.get('timeout', None)
+
+        # remove the diagrams of previous analyses, since Pyreverse
+        # does not generate them when no classes or packages are found
+        for file_name in [CLASSES_FILE_NAME, PACKAGES_FILE_NAME]:
+            file_path = os.path.join(self.tmp_path, file_name)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+        run = self._run_tool(['pyreverse', module_path], LineParser(), module_path,
+                             timeout=timeout, cwd=self.tmp_path)
 
-        try:
-            subprocess.check_output(['pyreverse', module_path]).decode("utf-8")
-        except subprocess.CalledProcessError as e:
-            raise GraalError(cause="Pyreverse failed at %s, %s" % (module_path, e.output.decode("utf-8")))
-        finally:
-            subprocess._cleanup()
+        if run.returncode != 0:
+            raise GraalError(cause="Pyreverse failed at %s, %s" % (module_path, run.output))
 
         class_diagram = os.path.join(self.tmp_path, CLASSES_FILE_NAME)
         if os.path.exists(class_diagram):
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+from collections import deque
+import io
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Number of output lines kept to report the failures of a tool
+TAIL_LINES = 50
+
+# Tools are launched with posix_spawn when available, thus the cost of
+# launching them does not depend on the memory used by Graal
+USE_POSIX_SPAWN = hasattr(os, 'posix_spawnp')
+
+# Shell snippet used to run a tool in a given directory, since
+# posix_spawn cannot change the working directory of the child
+CHDIR_SHIM = ['/bin/sh', '-c', 'cd -- "$1" && shift && exec "$@"', 'sh']
+
+
+class LineParser:
+    """Base class for parsers of the output of external tools.
+
+    The output is fed line by line, while the tool is running. Derived
+    classes redefine `feed(self, line)` and set `done` once they are not
+    interested in the rest of the output. This class discards all
+    the lines.
+    """
+    def __init__(self):
+        self.done = False
+
+    def feed(self, line):
+        """Parse a line of the output, without the line terminator"""
+
+        pass
+
+
+class ToolRun:
+    """Outcome of the execution of an external tool.
+
+    :param cmd: command executed
+    :param returncode: exit status of the tool, negative when
+        it was terminated by a signal
+    :param wall_time: seconds elapsed from the launch to the exit of the tool
+    :param max_rss: peak resident set size of the tool, in kilobytes
+    :param output: last lines of the output of the tool
+    :param cpu_time: seconds of CPU time (user and system) spent by the tool
+    """
+    def __init__(self, cmd, returncode, wall_time, max_rss, output, cpu_time=0.0):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.wall_time = wall_time
+        self.max_rss = max_rss
+        self.output = output
+        self.cpu_time = cpu_time
+
+    def __repr__(self):
+        return "ToolRun(%s, returncode=%s, wall_time=%.3f, cpu_time=%.3f, max_rss=%s)" % \
+            (self.cmd[0], self.returncode, self.wall_time, self.cpu_time, self.max_rss)
+
+
+def run_tool(cmd, parser, timeout=None, cwd=None):
+    """Run an external tool and stream its output to a parser.
+
+    The standard output of the tool is decoded and passed line by line
+    to `parser`, thus parsing overlaps with the execution of the tool and
+    the output is never held in memory. Only the last `TAIL_LINES` lines
+    are kept, to report failures. Once the parser is `done`, the rest of
+    the output is drained and discarded.
+
+    When the tool is still running after `timeout` seconds, its process
+    group is killed, thus also the processes it launched, which may hold
+    its output open. A tool which exits in time is never reported as
+    timed out, even if the processes it left behind are killed.
+
+    :param cmd: command to execute, as a list
+    :param parser: a `LineParser` object
+    :param timeout: seconds after which the tool is killed
+    :param cwd: directory where to run the tool
+
+    :returns: a `ToolRun` object
+
+    :raises subprocess.TimeoutExpired: raised when the tool was killed
+        because of the timeout
+    """
+    tail = deque(maxlen=TAIL_LINES)
+    timed_out = threading.Event()
+    timer = None
+
+    start = time.perf_counter()
+    proc = spawn(cmd, cwd=cwd)
+
+    if timeout is not None:
+        def expire():
+            if _is_running(proc):
+                timed_out.set()
+            _kill(proc)
+
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+
+    try:
+        with io.TextIOWrapper(proc.stdout, encoding='utf-8', errors='replace') as stdout:
+            for line in stdout:
+                line = line.rstrip('\n')
+                tail.append(line)
+
+                if not parser.done:
+                    parser.feed(line)
+    except BaseException:
+        _kill(proc)
+        raise
+    finally:
+        if timer:
+            timer.cancel()
+            timer.join()
+        rusage = _wait(proc)
+
+    wall_time = time.perf_counter() - start
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    run = ToolRun(cmd, proc.returncode, wall_time, rusage.ru_maxrss, "\n".join(tail),
+                  cpu_time=rusage.ru_utime + rusage.ru_stime)
+    logger.debug("%s", run)
+
+    return run
+
+
+def spawn(cmd, cwd=None):
+    """Launch an external tool with its standard output piped to Graal.
+
+    When `USE_POSIX_SPAWN` is set, the tool is launched with `posix_spawnp`,
+    which does not copy the page tables of the parent process as `fork`
+    does. Thus, the launch takes the same time no matter how much memory
+    Graal holds (e.g., caches, graphs) and how many threads are running.
+    Otherwise, it falls back to `subprocess.Popen`. Either way, the tool
+    runs in a new session, thus in its own process group.
+
+    :param cmd: command to execute, as a list
+    :param cwd: directory where to run the tool
+
+    :returns: an object with the attributes `pid`, `stdout` and `returncode`
+        and the method `kill`, like `subprocess.Popen` objects
+    """
+    if not USE_POSIX_SPAWN:
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, cwd=cwd, start_new_session=True)
+
+    if cwd:
+        cmd = CHDIR_SHIM + [cwd] + list(cmd)
+
+    # descriptors created by os.pipe are not inherited, thus the child
+    # only gets the write end, duplicated as its standard output
+    read_fd, write_fd = os.pipe()
+    try:
+        pid = os.posix_spawnp(cmd[0], cmd, os.environ, setsid=True,
+                              file_actions=[(os.POSIX_SPAWN_DUP2, write_fd, 1)])
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+
+    return _SpawnedProcess(pid, os.fdopen(read_fd, 'rb'))
+
+
+class _SpawnedProcess:
+    """Process launched with `posix_spawnp`"""
+
+    def __init__(self, pid, stdout):
+        self.pid = pid
+        self.stdout = stdout
+        self.returncode = None
+
+    def kill(self):
+        """Kill the tool and the processes in its group"""
+
+        if self.returncode is not None:
+            return
+
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _is_running(proc):
+    """Check whether a process has not exited yet, without reaping it"""
+
+    if proc.returncode is not None:
+        return False
+
+    try:
+        return os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is None
+    except ChildProcessError:
+        return False
+
+
+def _kill(proc):
+    """Kill the process group of a tool, i.e., the tool and the
+    processes it launched which are still in its group"""
+
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _wait(proc):
+    """Wait for a process and return its resource usage.
+
+    The process is reaped with `os.wait4` to collect its resource
+    usage, thus the exit status is set on `proc` here.
+    """
+    _, status, rusage = os.wait4(proc.pid, 0)
+
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+
+    return rusage
@@ -20,14 +20,33 @@
 #     Valerio Cosentino <valcos@bitergia.com>
 #
 
+from concurrent.futures import ThreadPoolExecutor
 import logging
-
-from graal.graal import (Graal,
+import os
+import time
+
+from graal.cost import CostModel
+from graal.plan import Plan
+from graal.metrics import CACHE_LOOKUPS, FILES, WORKER_BUSY, WORKERS
+from graal.perf import STAGE_ANALYZE, STAGE_POST, propagate, stage
+from graal.records import FileMetrics
+from graal.rollup import DirectoryTree
+from graal.sketch import KLLSketch
+from graal.summary import Summary
+from graal.graal import (AnalysisSkippedError,
+                         Graal,
                          GraalRepository,
                          GraalCommand,
-                         DEFAULT_WORKTREE_PATH)
+                         DEFAULT_PROGRESS_INTERVAL,
+                         DEFAULT_WORKTREE_PATH,
+                         SKIP_TIMEOUT)
 from graal.backends.core.analyzers.cloc import Cloc
-from graal.backends.core.analyzers.lizard import Lizard
+from graal.backends.core.analyzers.lizard import (FunctionFilter,
+                                                  Lizard,
+                                                  RANK_CCN,
+                                                  RANK_LOC,
+                                                  SCOPE_FILE)
+from perceval.errors import RepositoryError
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
 
 CATEGORY_COCOM = 'code_complexity'
@@ -62,23 +81,111 @@ class CoCom(Graal):
     :param in_paths: the target paths of the analysis
     :param out_paths: the paths to be excluded from the analysis
     :param details: if enable, it returns complexity data about each single function found
+    :param workers: number of threads used to analyze the files of a commit
+    :param cost_model: path of the JSON file where the time spent analyzing each file is
+        learned, thus the most expensive files are analyzed first
+    :param chunk_size: if set, the files of a commit are split over several items,
+        each one with the analysis of `chunk_size` files at most
+    :param top_funs: when `details` is enabled, number of functions with the highest
+        `rank_funs_by` metric kept for each file or commit, all of them if None
+    :param rank_funs_by: metric used to rank the functions, `ccn` or `loc`
+    :param top_funs_scope: scope of the ranking, `file` or `commit` (i.e., the
+        functions of the commit, or of the item when `chunk_size` is set)
+    :param min_ccn: when `details` is enabled, min cyclomatic complexity of the functions kept
+    :param min_loc: when `details` is enabled, min lines of code of the functions kept
+    :param incremental: if enable, the results of the files not modified since the
+        previous commit analyzed are reused, instead of analyzing the files again
+    :param summary: if enable, the aggregates of the metrics of all the files, of
+        each extension and of each top-level directory are added to the attribute
+        `summary` of the item (of the last item when `chunk_size` is set). It requires NumPy
+    :param distributions: if enable, the percentiles of the CCN and LOC of the functions
+        of the commit, estimated with quantile sketches, are added to the attribute
+        `distributions` of the item (of the last item when `chunk_size` is set). In
+        incremental mode, the sketches of each file (about `3 * k` values per metric
+        at most) are kept across commits, thus the ones of the files modified or
+        removed can be dropped from the distributions
+    :param rollup_depth: if set, the number of files and the sums of their metrics for
+        each directory, down to this depth (0 is the root), are added to the attribute
+        `rollup` of the item (of the last item when `chunk_size` is set)
+    :param recycle_worktree: if enable, the working tree is kept and reused across executions
+    :param tmpfs_path: memory-backed directory where to store the working tree, when it fits
+    :param pipeline: if enable, the next commit is checked out while the current one is analyzed
+    :param file_timeout: max seconds spent by an analyzer on a file
+    :param commit_timeout: max seconds spent analyzing a commit
+    :param max_file_size: max size in bytes of the files analyzed, or a dict
+        with the max size for each analyzer (i.e., `cloc` and `lizard`)
+    :param perf: if enable, the time spent in each stage is added to the metadata of the items
+    :param memory: if enable, the memory used by each commit is added to the metadata of its last item
+    :param memory_limit: soft limit, in bytes, of the Python memory used by a commit
+    :param memory_spill: if enable, the memory held across commits is released
+        when a commit exceeds `memory_limit`
+    :param progress: if enable, the progress of the analysis is logged periodically
+    :param progress_interval: seconds between two reports of the progress
+    :param status_file: path of the JSON file where the progress is written
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
 
     :raises RepositoryError: raised when there was an error cloning or
         updating the repository.
+    :raises GraalError: raised when `summary` is set and NumPy is not installed
     """
-    version = '0.2.2'
+    version = '0.2.15'
 
     CATEGORIES = [CATEGORY_COCOM]
 
+    DISTRIBUTIONS = [RANK_CCN, RANK_LOC]
+    DISTRIBUTION_PERCENTILES = [10, 25, 50, 75, 90, 95, 99]
+
     def __init__(self, uri, git_path, worktreepath=DEFAULT_WORKTREE_PATH,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 recycle_worktree=False, tmpfs_path=None, pipeline=False,
+                 file_timeout=None, commit_timeout=None, max_file_size=None,
+                 workers=1, cost_model=None, chunk_size=None,
+                 top_funs=None, rank_funs_by=RANK_CCN, top_funs_scope=SCOPE_FILE, min_ccn=None, min_loc=None,
+                 incremental=False, summary=False, distributions=False, rollup_depth=None,
+                 perf=False, memory=False, memory_limit=None, memory_spill=False,
+                 progress=False, progress_interval=DEFAULT_PROGRESS_INTERVAL, status_file=None,
                  tag=None, archive=None):
         super().__init__(uri, git_path, worktreepath,
                          entrypoint=entrypoint, in_paths=in_paths, out_paths=out_paths, details=details,
+                         recycle_worktree=recycle_worktree, tmpfs_path=tmpfs_path, pipeline=pipeline,
+                         file_timeout=file_timeout, commit_timeout=commit_timeout, max_file_size=max_file_size,
+                         perf=perf, memory=memory, memory_limit=memory_limit, memory_spill=memory_spill,
+                         progress=progress, progress_interval=progress_interval, status_file=status_file,
                          tag=tag, archive=archive)
-        self.file_analyzer = FileAnalyzer(details)
+        self.funs_filter = None
+        if top_funs is not None or min_ccn is not None or min_loc is not None:
+            self.funs_filter = FunctionFilter(top=top_funs, rank_by=rank_funs_by, scope=top_funs_scope,
+                                              min_ccn=min_ccn, min_loc=min_loc)
+
+        self.file_analyzer = FileAnalyzer(details, funs_filter=self.funs_filter)
+        self.workers = workers
+        WORKERS.labels(self.__class__.__name__).set(workers)
+        self.cost_model = CostModel(cost_model, scope=uri)
+        self.chunk_size = chunk_size
+        self.incremental = incremental
+
+        # results of the files of the previous commit analyzed, kept
+        # as `FileMetrics` objects and keyed by path
+        self._results = {}
+        self._results_commit = None
+
+        # aggregates of the files of the current commit, updated by delta
+        # with respect to the previous one in incremental mode
+        self.summary = Summary() if summary else None
+        self.rollup_depth = rollup_depth
+        self.rollup = DirectoryTree() if rollup_depth is not None else None
+        self._aggregates = [aggregate for aggregate in [self.summary, self.rollup] if aggregate]
+
+        # quantile sketches of the functions of each file of the current
+        # commit, merged into the distributions of the commit. The merged
+        # sketches are kept and updated with the files analyzed since then,
+        # unless a file is modified or removed, which requires to merge
+        # all the sketches again (i.e., `_distributions` is None)
+        self.distributions = distributions
+        self._sketches = {}
+        self._distributions = None
+        self._sketches_new = set()
 
     def fetch(self, category=CATEGORY_COCOM, paths=None,
               from_date=DEFAULT_DATETIME, to_date=DEFAULT_LAST_DATETIME,
@@ -91,6 +198,33 @@ class CoCom(Graal):
 
         return items
 
+    def fetch_items(self, category, **kwargs):
+        """Fetch the commits and add code complexity information.
+        The cost model is saved at the end of the process.
+
+        :param category: the category of items to fetch
+        :param kwargs: backend arguments
+
+        :returns: a generator of items
+        """
+        try:
+            for item in super().fetch_items(category, **kwargs):
+                yield item
+        finally:
+            self.cost_model.save()
+
+    @staticmethod
+    def metadata_id(item):
+        """Extracts the identifier from a Code item.
+
+        The items which hold a chunk of the files of a commit
+        are identified by the commit and the index of the chunk.
+        """
+        if 'chunk' in item:
+            return '%s-%s' % (item['commit'], item['chunk'])
+
+        return item['commit']
+
     @staticmethod
     def metadata_category(item):
         """Extracts the category from a Code item.
@@ -117,14 +251,169 @@ class CoCom(Graal):
 
         return True
 
+    def _generate_items(self, commit):
+        """Generate the items of a commit. When `chunk_size` is set,
+        the files are analyzed a chunk at a time and each chunk is
+        yielded as soon as it is over, thus the results of the whole
+        commit are never held in memory. Every item keeps the data of
+        the commit, the index of its chunk in `chunk` and the number of
+        chunks in `chunks`; the targets skipped are listed in the item
+        of their chunk.
+
+        :param commit: a Perceval commit item
+
+        :returns: a generator of Graal items
+        """
+        if not self.chunk_size:
+            yield from super()._generate_items(commit)
+            return
+
+        with stage(STAGE_ANALYZE):
+            self.__reuse_results(commit)
+            selected = self.__select_files()
+        chunks = [selected[i:i + self.chunk_size]
+                  for i in range(0, len(selected), self.chunk_size)] or [[]]
+        with stage(STAGE_POST):
+            commit = self._post(commit)
+
+        for index, files in enumerate(chunks):
+            self._skipped = []
+
+            item = dict(commit)
+            with stage(STAGE_ANALYZE):
+                item['analysis'] = self.__analyze_files(files)
+            item['chunk'] = index
+            item['chunks'] = len(chunks)
+            if self._skipped:
+                item['skipped'] = self._skipped
+            if index == len(chunks) - 1:
+                with stage(STAGE_ANALYZE):
+                    self.__summarize(item)
+
+            yield item
+
     def _analyze(self, commit):
         """Analyse a commit and the corresponding
         checkout version of the repository
 
         :param commit: a Perceval commit item
         """
+        self.__reuse_results(commit)
+        analysis = self.__analyze_files(self.__select_files())
+        self.__summarize(commit)
+
+        return analysis
+
+    def _spill(self):
+        """Drop the results kept to be reused in the next commit, which
+        is then fully analyzed"""
+
+        logger.info("Results of %s files dropped to release memory", len(self._results))
+
+        self._results = {}
+        self._sketches = {}
+        self._distributions = None
+        self._sketches_new = set()
+        self._results_commit = None
+
+    def _new_plan(self):
+        """Create the `Plan` which estimates the cost of the analysis,
+        with the cost model, the workers and the incremental mode of the backend"""
+
+        return Plan(cost_model=self.cost_model, workers=self.workers, incremental=self.incremental)
+
+    def _plan_files(self, files):
+        """Select the files analyzed in a commit, when estimating its cost.
+        As done when listing the files of the working tree, hidden files
+        and directories are not selected.
+
+        :param files: dict with the size of each file of the commit, keyed by path
+
+        :returns: a list of tuples with the path and the size of the files
+        """
+        selected = []
+
+        for path, size in files.items():
+            if any(part.startswith('.') for part in path.split('/')):
+                continue
+
+            if self.in_paths and not any(path.endswith(p) for p in self.in_paths):
+                continue
+
+            selected.append((path, size))
+
+        return selected
+
+    def __summarize(self, item):
+        """Add the summary, the distributions and the rollup of the commit to an item"""
+
+        if self.summary:
+            item['summary'] = self.summary.summarize()
+
+        if self.rollup:
+            item['rollup'] = self.rollup.rollup(self.rollup_depth)
+
+        if self.distributions:
+            if self._distributions is None:
+                self._distributions = {metric: KLLSketch() for metric in self.DISTRIBUTIONS}
+                self._sketches_new = set(self._sketches)
+
+            for path in sorted(self._sketches_new):
+                for metric in self.DISTRIBUTIONS:
+                    self._distributions[metric].merge(self._sketches[path][metric])
+            self._sketches_new = set()
+
+            item['distributions'] = {metric: sketch.summary(self.DISTRIBUTION_PERCENTILES)
+                                     for metric, sketch in self._distributions.items()}
+
+            # the sketches of the files are needed only to drop
+            # the ones of the files modified in the next commit
+            if not self.incremental:
+                self._sketches = {}
+                self._distributions = None
+
+    def __reuse_results(self, commit):
+        """Keep the results of the previous commit analyzed for the
+        files not modified since then, according to `git diff-tree`.
+        The aggregates (i.e., summary and rollup) keep the same files,
+        otherwise they are reset."""
+
+        changed = None
+
+        if self.incremental and self._results_commit:
+            try:
+                changed = self.graalRepo.changed_files(self._results_commit, commit['commit'])
+            except RepositoryError as e:
+                logger.warning("Results of %s not reused, %s", self._results_commit, e)
+
+        if changed is None:
+            self._results = {}
+            self._sketches = {}
+            self._distributions = None
+        else:
+            self._results = {path: record for path, record in self._results.items()
+                             if path not in changed}
+            if any(path in self._sketches for path in changed):
+                self._sketches = {path: sketches for path, sketches in self._sketches.items()
+                                  if path not in changed}
+                self._distributions = None
+        self._sketches_new = set()
+
+        if self.incremental:
+            self._results_commit = commit['commit']
+
+        for aggregate in self._aggregates:
+            if changed is None:
+                aggregate.reset()
+            else:
+                for path in changed:
+                    aggregate.remove(path)
+
+    def __select_files(self):
+        """List the files of the working tree targeted by the analysis"""
+
         files = GraalRepository.files(self.worktreepath)
-        analysis = []
+        selected = []
 
         for file_path in files:
 
@@ -133,12 +422,116 @@ class CoCom(Graal):
                 if not found:
                     continue
 
-            file_info = self.file_analyzer.analyze(file_path)
-            file_info.update({'file_path': file_path.replace(self.worktreepath + '/', "")})
-            analysis.append(file_info)
+            selected.append(file_path)
+
+        return selected
+
+    def __analyze_files(self, files):
+        """Analyze a list of files, dropping the ones given up"""
+
+        if self.workers > 1:
+            analysis = self.__analyze_parallel(files)
+        else:
+            analysis = [self.__analyze_file(file_path) for file_path in files]
+
+        analysis = [file_info for file_info in analysis if file_info is not None]
+        if self.funs_filter:
+            self.funs_filter.trim(analysis)
+
+        return analysis
+
+    def __analyze_parallel(self, files):
+        """Analyze files on a pool of threads. Files are dispatched
+        from the most to the least expensive, according to the cost model,
+        while the results keep the order of `files`."""
+
+        sized = [(self.__relative_path(file_path), os.path.getsize(file_path), file_path)
+                 for file_path in files]
+        schedule = self.cost_model.schedule(sized)
+
+        # the stages run by the workers are recorded in the timings of the commit
+        analyze_file = propagate(self.__analyze_file)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {file_path: executor.submit(analyze_file, file_path, size)
+                       for _, size, file_path in schedule}
+
+            analysis = [futures[file_path].result() for file_path in files]
 
         return analysis
 
+    def __analyze_file(self, file_path, size=None):
+        """Analyze a file. The analyzers which give up on it are recorded
+        as skipped; when all of them do, None is returned."""
+
+        if size is None:
+            size = os.path.getsize(file_path)
+
+        backend_name = self.__class__.__name__
+        FILES.labels(backend_name).inc()
+
+        relative_path = self.__relative_path(file_path)
+        if self.incremental:
+            cached = self._results.get(relative_path, None)
+            CACHE_LOOKUPS.labels(backend_name, 'miss' if cached is None else 'hit').inc()
+            if cached is not None:
+                return cached.to_dict()
+
+        skipped = []
+        sketches = {metric: KLLSketch() for metric in self.DISTRIBUTIONS} if self.distributions else None
+
+        start = time.perf_counter()
+        try:
+            file_info = self.file_analyzer.analyze(file_path,
+                                                   timeout=self._timeout(file_path),
+                                                   max_file_size=self.max_file_size,
+                                                   skipped=skipped,
+                                                   sketches=sketches)
+        except AnalysisSkippedError as e:
+            file_info = None
+            skipped.append(e)
+        elapsed = time.perf_counter() - start
+        WORKER_BUSY.labels(backend_name).inc(elapsed)
+
+        # files given up because of their size or because the commit
+        # ran out of time don't tell how long their analysis takes
+        if all(e.reason == SKIP_TIMEOUT for e in skipped):
+            self.cost_model.record(relative_path, size, elapsed)
+
+        for error in skipped:
+            self._skip(error)
+
+        if file_info is not None:
+            file_info.update({'file_path': relative_path})
+
+            # partial results are not reused, thus the file
+            # is analyzed again in the next commit
+            if self.incremental and not skipped:
+                self._results[relative_path] = FileMetrics.from_dict(file_info)
+            for aggregate in self._aggregates:
+                aggregate.set(file_info)
+            if sketches and any(sketch.count for sketch in sketches.values()):
+                self.__replace_sketches(relative_path, sketches)
+        else:
+            for aggregate in self._aggregates:
+                aggregate.remove(relative_path)
+            self.__replace_sketches(relative_path, None)
+
+        return file_info
+
+    def __replace_sketches(self, path, sketches):
+        """Set the sketches of a file, which are merged into the distributions
+        of the commit, or drop them when `sketches` is None"""
+
+        if self._sketches.pop(path, None) is not None:
+            self._distributions = None
+
+        if sketches is not None:
+            self._sketches[path] = sketches
+            self._sketches_new.add(path)
+
+    def __relative_path(self, file_path):
+        return file_path.replace(self.worktreepath + '/', "")
+
     def _post(self, commit):
         """Remove attributes of the Graal item obtained
 
@@ -157,15 +550,27 @@ class FileAnalyzer:
     FORBIDDEN_EXTENSIONS = ['tar', 'bz2', "gz", "lz", "apk", "tbz2",
                             "lzma", "tlz", "war", "xar", "zip", "zipx"]
 
-    def __init__(self, details=False):
+    def __init__(self, details=False, funs_filter=None):
         self.details = details
+        self.funs_filter = funs_filter
         self.cloc = Cloc()
         self.lizard = Lizard()
 
-    def analyze(self, file_path):
-        """Analyze the content of a file using CLOC and Lizard
+    def analyze(self, file_path, timeout=None, max_file_size=None, skipped=None, sketches=None):
+        """Analyze the content of a file using CLOC and Lizard.
+
+        When Lizard gives up on the file (i.e., it is too large or its
+        analysis timed out), the results of CLOC are returned and the
+        error is appended to `skipped`, if given.
 
         :param file_path: file path
+        :param timeout: max seconds spent by each analyzer on the file
+        :param max_file_size: max size in bytes of the file, or a dict
+            with the max size for each analyzer
+        :param skipped: list where to append the `AnalysisSkippedError`
+            of Lizard
+        :param sketches: dict which maps `ccn` and `loc` to `KLLSketch` objects,
+            updated with the metrics of the functions found by Lizard
 
         :returns a dict containing the results of the analysis, like the one below
         {
@@ -180,15 +585,28 @@ class FileAnalyzer:
           'tokens': ..,
           'funs_data': [..]
         }
+
+        :raises AnalysisSkippedError: raised when CLOC gives up on
+            the file, or Lizard does and `skipped` is not given
         """
-        kwargs = {'file_path': file_path}
+        kwargs = {'file_path': file_path,
+                  'timeout': timeout,
+                  'max_file_size': max_file_size}
         cloc_analysis = self.cloc.analyze(**kwargs)
 
         if GraalRepository.extension(file_path) not in self.ALLOWED_EXTENSIONS:
             return cloc_analysis
 
         kwargs['details'] = self.details
-        lizard_analysis = self.lizard.analyze(**kwargs)
+        kwargs['funs_filter'] = self.funs_filter
+        kwargs['sketches'] = sketches
+        try:
+            lizard_analysis = self.lizard.analyze(**kwargs)
+        except AnalysisSkippedError as e:
+            if skipped is None:
+                raise e
+            skipped.append(e)
+            return cloc_analysis
         # the LOC returned by CLOC is replaced by the one obtained with Lizard
         # for consistency purposes
 
@@ -202,3 +620,50 @@ class CoComCommand(GraalCommand):
     """Class to run CoCom backend from the command line."""
 
     BACKEND = CoCom
+
+    @staticmethod
+    def setup_cmd_parser():
+        """Returns the CoCom argument parser."""
+
+        parser = GraalCommand.setup_cmd_parser()
+
+        group = parser.parser.add_argument_group('CoCom arguments')
+        group.add_argument('--workers', dest='workers',
+                           type=int, default=1,
+                           help="Number of threads used to analyze the files of a commit")
+        group.add_argument('--cost-model', dest='cost_model',
+                           default=None,
+                           help="JSON file where to learn the time spent analyzing each file")
+        group.add_argument('--chunk-size', dest='chunk_size',
+                           type=int, default=None,
+                           help="Split the files of a commit over several items of this size")
+        group.add_argument('--top-funs', dest='top_funs',
+                           type=int, default=None,
+                           help="Number of functions kept in the details of each file or commit")
+        group.add_argument('--rank-funs-by', dest='rank_funs_by',
+                           choices=sorted(FunctionFilter.RANK_ATTRIBUTES), default=RANK_CCN,
+                           help="Metric used to select the top functions")
+        group.add_argument('--top-funs-scope', dest='top_funs_scope',
+                           choices=FunctionFilter.SCOPES, default=SCOPE_FILE,
+                           help="Select the top functions of each file or of each commit")
+        group.add_argument('--min-ccn', dest='min_ccn',
+                           type=int, default=None,
+                           help="Min cyclomatic complexity of the functions kept in the details")
+        group.add_argument('--min-loc', dest='min_loc',
+                           type=int, default=None,
+                           help="Min lines of code of the functions kept in the details")
+        group.add_argument('--incremental', dest='incremental',
+                           action='store_true',
+                           help="Reuse the results of the files not modified since the previous commit")
+        group.add_argument('--summary', dest='summary',
+                           action='store_true',
+                           help="Add the aggregates of the metrics of all the files, "
+                                "of each extension and of each top-level directory (requires NumPy)")
+        group.add_argument('--distributions', dest='distributions',
+                           action='store_true',
+                           help="Add the percentiles of the CCN and LOC of the functions of each commit")
+        group.add_argument('--rollup-depth', dest='rollup_depth',
+                           type=int, default=None,
+                           help="Add the metrics of each directory down to this depth (0 is the root)")
+
+        return parser
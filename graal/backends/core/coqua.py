@@ -23,9 +23,11 @@
 import logging
 import os
 
-from graal.graal import (Graal,
+from graal.graal import (AnalysisSkippedError,
+                         Graal,
                          GraalCommand,
                          GraalError,
+                         DEFAULT_PROGRESS_INTERVAL,
                          DEFAULT_WORKTREE_PATH)
 from graal.backends.core.analyzers.lint import Lint
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
@@ -44,25 +46,47 @@ class CoQua(Graal):
     :param uri: URI of the Git repository
     :param gitpath: path to the repository or to the log file
     :param worktreepath: the directory where to store the working tree
-    :param entrypoint: the entrypoint of the analysis
+    :param entrypoint: the entrypoint of the analysis, or a list of entrypoints
     :param in_paths: the target paths of the analysis
     :param out_paths: the paths to be excluded from the analysis
     :param details: if enable, it returns fine-grained results
+    :param recycle_worktree: if enable, the working tree is kept and reused across executions
+    :param tmpfs_path: memory-backed directory where to store the working tree, when it fits
+    :param pipeline: if enable, the next commit is checked out while the current one is analyzed
+    :param file_timeout: max seconds spent by Pylint on a commit
+    :param commit_timeout: max seconds spent analyzing a commit
+    :param max_file_size: not used by this backend
+    :param perf: if enable, the time spent in each stage is added to the metadata of the items
+    :param memory: if enable, the memory used by each commit is added to the metadata of its last item
+    :param memory_limit: soft limit, in bytes, of the Python memory used by a commit
+    :param memory_spill: if enable, the memory held across commits is released
+        when a commit exceeds `memory_limit`
+    :param progress: if enable, the progress of the analysis is logged periodically
+    :param progress_interval: seconds between two reports of the progress
+    :param status_file: path of the JSON file where the progress is written
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
 
     :raises RepositoryError: raised when there was an error cloning or
         updating the repository.
     """
-    version = '0.2.0'
+    version = '0.2.5'
 
     CATEGORIES = [CATEGORY_COQUA]
 
     def __init__(self, uri, git_path, worktreepath=DEFAULT_WORKTREE_PATH,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 recycle_worktree=False, tmpfs_path=None, pipeline=False,
+                 file_timeout=None, commit_timeout=None, max_file_size=None,
+                 perf=False, memory=False, memory_limit=None, memory_spill=False,
+                 progress=False, progress_interval=DEFAULT_PROGRESS_INTERVAL, status_file=None,
                  tag=None, archive=None):
         super().__init__(uri, git_path, worktreepath,
                          entrypoint=entrypoint, in_paths=in_paths, out_paths=out_paths, details=details,
+                         recycle_worktree=recycle_worktree, tmpfs_path=tmpfs_path, pipeline=pipeline,
+                         file_timeout=file_timeout, commit_timeout=commit_timeout, max_file_size=max_file_size,
+                         perf=perf, memory=memory, memory_limit=memory_limit, memory_spill=memory_spill,
+                         progress=progress, progress_interval=progress_interval, status_file=status_file,
                          tag=tag, archive=archive)
 
         if not self.entrypoint:
@@ -101,18 +125,26 @@ class CoQua(Graal):
 
     def _analyze(self, commit):
         """Analyse a snapshot and the corresponding
-        checkout version of the repository
+        checkout version of the repository. When several
+        entrypoints are set, the results are keyed by entrypoint.
 
         :param commit: a Perceval commit item
         """
-        module_path = os.path.join(self.worktreepath, self.entrypoint)
+        return self._analyze_entrypoints(commit, self.__analyze_entrypoint)
+
+    def __analyze_entrypoint(self, commit, entrypoint):
+        module_path = os.path.join(self.worktreepath, entrypoint)
 
         if not os.path.exists(module_path):
             logger.warning("module path %s does not exist at commit %s, analysis will be skipped"
                            % (module_path, commit['commit']))
             return {}
 
-        analysis = self.module_analyzer.analyze(module_path)
+        try:
+            analysis = self.module_analyzer.analyze(module_path, timeout=self._timeout(module_path))
+        except AnalysisSkippedError as e:
+            self._skip(e)
+            analysis = {}
 
         return analysis
 
@@ -136,10 +168,11 @@ class ModuleAnalyzer:
         self.details = details
         self.lint = Lint()
 
-    def analyze(self, module_path):
+    def analyze(self, module_path, timeout=None):
         """Analyze the content of a module using Pylint
 
         :param folder_path: folder path
+        :param timeout: max seconds spent by Pylint
 
         :returns a dict containing the results of the analysis, like the one below
         {
@@ -149,7 +182,8 @@ class ModuleAnalyzer:
         """
         kwargs = {
             'module_path': module_path,
-            'details': self.details
+            'details': self.details,
+            'timeout': timeout
         }
         analysis = self.lint.analyze(**kwargs)
 
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import argparse
+import logging
+
+from graal.perf import stage
+from graal.graal import (Graal,
+                         GraalCommand,
+                         GraalError,
+                         DEFAULT_PROGRESS_INTERVAL,
+                         DEFAULT_WORKTREE_PATH)
+from graal.backends.core.cocom import CoCom
+from graal.backends.core.codep import CoDep
+from graal.backends.core.coqua import CoQua
+from graal.backends.core.covuln import CoVuln
+from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
+
+CATEGORY_MULTI = 'code_analysis'
+
+logger = logging.getLogger(__name__)
+
+
+class Multi(Graal):
+    """Multi backend.
+
+    This class extends the Graal backend. It runs the analysis
+    of several backends (i.e., CoCom, CoQua, CoVuln and CoDep) against
+    the same checkout of each commit, thus the log of the repository
+    is parsed and each commit is checked out only once. The results
+    of each backend are stored in the `analysis` attribute of
+    the item under the name of the backend (e.g., `cocom`).
+
+    A commit is analyzed when at least one backend selects it; then,
+    only the backends which select it analyze it. The targets skipped
+    by each backend are listed in the attribute `skipped` of the item,
+    together with the name of the backend.
+
+    :param uri: URI of the Git repository
+    :param gitpath: path to the repository or to the log file
+    :param worktreepath: the directory where to store the working tree
+    :param entrypoint: the entrypoint of the analysis, or a list of
+        entrypoints, required by CoQua, CoVuln and CoDep
+    :param in_paths: the target paths of the analysis
+    :param out_paths: the paths to be excluded from the analysis
+    :param details: if enable, it returns fine-grained results
+    :param recycle_worktree: if enable, the working tree is kept and reused across executions
+    :param tmpfs_path: memory-backed directory where to store the working tree, when it fits
+    :param pipeline: if enable, the next commit is checked out while the current one is analyzed
+    :param file_timeout: max seconds spent by an analyzer on a target
+    :param commit_timeout: max seconds spent analyzing a commit, by all the backends
+    :param max_file_size: max size in bytes of the files analyzed, or a dict
+        with the max size for each analyzer
+    :param backends: names of the backends to run; when None, all of them
+        if `entrypoint` is given, otherwise the ones which do not need it
+    :param workers: number of threads used by CoCom to analyze the files of a commit
+    :param cost_model: path of the JSON file where CoCom learns the time spent
+        analyzing each file
+    :param perf: if enable, the time spent in each stage is added to the metadata of the items
+    :param memory: if enable, the memory used by each commit is added to the metadata of its last item
+    :param memory_limit: soft limit, in bytes, of the Python memory used by a commit
+    :param memory_spill: if enable, the memory held across commits is released
+        when a commit exceeds `memory_limit`
+    :param progress: if enable, the progress of the analysis is logged periodically
+    :param progress_interval: seconds between two reports of the progress
+    :param status_file: path of the JSON file where the progress is written
+    :param tag: label used to mark the data
+    :param archive: archive to store/retrieve items
+
+    :raises RepositoryError: raised when there was an error cloning or
+        updating the repository.
+    :raises GraalError: raised when a backend is unknown, or it needs
+        an entrypoint and none is given
+    """
+    version = '0.1.5'
+
+    CATEGORIES = [CATEGORY_MULTI]
+
+    BACKENDS = {
+        'cocom': CoCom,
+        'codep': CoDep,
+        'coqua': CoQua,
+        'covuln': CoVuln
+    }
+
+    # Backends which analyze the entrypoints, thus need them
+    ENTRYPOINT_BACKENDS = ['codep', 'coqua', 'covuln']
+
+    def __init__(self, uri, git_path, worktreepath=DEFAULT_WORKTREE_PATH,
+                 entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 recycle_worktree=False, tmpfs_path=None, pipeline=False,
+                 file_timeout=None, commit_timeout=None, max_file_size=None,
+                 backends=None, workers=1, cost_model=None,
+                 perf=False, memory=False, memory_limit=None, memory_spill=False,
+                 progress=False, progress_interval=DEFAULT_PROGRESS_INTERVAL, status_file=None,
+                 tag=None, archive=None):
+        super().__init__(uri, git_path, worktreepath,
+                         entrypoint=entrypoint, in_paths=in_paths, out_paths=out_paths, details=details,
+                         recycle_worktree=recycle_worktree, tmpfs_path=tmpfs_path, pipeline=pipeline,
+                         file_timeout=file_timeout, commit_timeout=commit_timeout, max_file_size=max_file_size,
+                         perf=perf, memory=memory, memory_limit=memory_limit, memory_spill=memory_spill,
+                         progress=progress, progress_interval=progress_interval, status_file=status_file,
+                         tag=tag, archive=archive)
+
+        names = backends or self.default_backends(entrypoint)
+        unknown = [name for name in names if name not in self.BACKENDS]
+        if unknown:
+            raise GraalError(cause="Unknown backends %s, available ones are %s"
+                             % (unknown, sorted(self.BACKENDS.keys())))
+
+        needing = [name for name in names if name in self.ENTRYPOINT_BACKENDS]
+        if needing and not entrypoint:
+            raise GraalError(cause="Backends %s need an entrypoint" % needing)
+
+        self.backends = {}
+        for name in names:
+            kwargs = {
+                'entrypoint': entrypoint,
+                'in_paths': in_paths,
+                'out_paths': out_paths,
+                'details': details,
+                'file_timeout': file_timeout,
+                'max_file_size': max_file_size,
+                'tag': tag
+            }
+            if name == 'cocom':
+                kwargs.update({'workers': workers, 'cost_model': cost_model})
+
+            self.backends[name] = self.BACKENDS[name](uri, git_path, worktreepath, **kwargs)
+
+    def fetch(self, category=CATEGORY_MULTI, paths=None,
+              from_date=DEFAULT_DATETIME, to_date=DEFAULT_LAST_DATETIME,
+              branches=None, latest_items=False):
+        """Fetch commits and add the analysis of several backends."""
+
+        items = super().fetch(category,
+                              from_date=from_date, to_date=to_date,
+                              branches=branches, latest_items=latest_items)
+
+        return items
+
+    def fetch_items(self, category, **kwargs):
+        """Fetch the commits and add the analysis of several backends.
+        The cost model of CoCom, if any, is saved at the end of the process.
+
+        :param category: the category of items to fetch
+        :param kwargs: backend arguments
+
+        :returns: a generator of items
+        """
+        try:
+            for item in super().fetch_items(category, **kwargs):
+                yield item
+        finally:
+            if 'cocom' in self.backends:
+                self.backends['cocom'].cost_model.save()
+
+    @classmethod
+    def default_backends(cls, entrypoint=None):
+        """Return the names of the backends run when none is selected:
+        all of them with an entrypoint, otherwise the ones which do not need it"""
+
+        names = sorted(cls.BACKENDS.keys())
+        if entrypoint:
+            return names
+
+        return [name for name in names if name not in cls.ENTRYPOINT_BACKENDS]
+
+    @staticmethod
+    def metadata_category(item):
+        """Extracts the category from a Code item.
+
+        This backend only generates one type of item which is
+        'code_analysis'.
+        """
+        return CATEGORY_MULTI
+
+    def _filter_commit(self, commit):
+        """Filter a commit when all the backends filter it
+
+        :param commit: a Perceval commit item
+
+        :returns: a boolean value
+        """
+        return all(backend._filter_commit(commit) for backend in self.backends.values())
+
+    def _analyze(self, commit):
+        """Analyse a commit and the corresponding checkout
+        version of the repository with each backend
+
+        :param commit: a Perceval commit item
+        """
+        analysis = {}
+
+        for name, backend in self.backends.items():
+            if backend._filter_commit(commit):
+                continue
+
+            # the backends work on the checkout of this backend and
+            # share the deadline of the commit
+            backend.graalRepo = self.graalRepo
+            backend.worktreepath = self.worktreepath
+            backend._skipped = []
+            backend._commit_deadline = self._commit_deadline
+
+            try:
+                with stage(name):
+                    analysis[name] = backend._analyze(commit)
+            finally:
+                self._skipped.extend(dict(skipped, backend=name) for skipped in backend._skipped)
+
+        return analysis
+
+    def _spill(self):
+        """Release the memory held across commits by each backend"""
+
+        for backend in self.backends.values():
+            backend._spill()
+
+    def _can_spill(self):
+        """Check whether any backend holds memory across commits"""
+
+        return any(backend._can_spill() for backend in self.backends.values())
+
+    def _new_plan(self):
+        """Create the `Plan` which estimates the cost of the analysis,
+        the one of CoCom when it is run"""
+
+        if 'cocom' in self.backends:
+            return self.backends['cocom']._new_plan()
+
+        return super()._new_plan()
+
+    def _plan_files(self, files):
+        """Select the files targeted by the analysis of a commit, the ones
+        of CoCom when it is run, when estimating its cost
+
+        :param files: dict with the size of each file of the commit, keyed by path
+
+        :returns: a list of tuples with the path and the size of the files
+        """
+        if 'cocom' in self.backends:
+            return self.backends['cocom']._plan_files(files)
+
+        return super()._plan_files(files)
+
+    def _post(self, commit):
+        """Remove attributes of the Graal item obtained
+
+        :param commit: a Graal commit item
+        """
+        commit.pop('files', None)
+        commit.pop('parents', None)
+        commit.pop('refs', None)
+        return commit
+
+
+def backend_names(value):
+    """Parse a comma-separated list of backend names"""
+
+    names = [name.strip().lower() for name in value.split(',') if name.strip()]
+    if not names:
+        raise argparse.ArgumentTypeError("no backends given")
+
+    return names
+
+
+class MultiCommand(GraalCommand):
+    """Class to run Multi backend from the command line."""
+
+    BACKEND = Multi
+
+    @staticmethod
+    def setup_cmd_parser():
+        """Returns the Multi argument parser."""
+
+        parser = GraalCommand.setup_cmd_parser()
+
+        group = parser.parser.add_argument_group('Multi arguments')
+        group.add_argument('--with', dest='backends',
+                           type=backend_names, default=None,
+                           help="Comma-separated list of backends to run (e.g., cocom,covuln); "
+                                "by default, all of them with --entrypoint, otherwise the ones "
+                                "which do not need it")
+        group.add_argument('--workers', dest='workers',
+                           type=int, default=1,
+                           help="Number of threads used by CoCom to analyze the files of a commit")
+        group.add_argument('--cost-model', dest='cost_model',
+                           default=None,
+                           help="JSON file where CoCom learns the time spent analyzing each file")
+
+        return parser
+
+    def _pre_init(self):
+        """Check that the backends selected get an entrypoint, when they need it"""
+
+        super()._pre_init()
+
+        backends = self.parsed_args.backends or []
+        needing = [name for name in backends if name in Multi.ENTRYPOINT_BACKENDS]
+        if needing and not self.parsed_args.entrypoint:
+            parser = self.setup_cmd_parser()
+            parser.parser.error("--with %s needs --entrypoint" % ','.join(needing))
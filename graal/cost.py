@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from graal.graal import GraalRepository
+
+logger = logging.getLogger(__name__)
+
+
+class CostModel:
+    """Model of the time spent analyzing files.
+
+    The model learns from past analyses how many seconds each file
+    takes to be analyzed. For every file path, it keeps a moving average
+    of the time spent and the size of the file when it was last analyzed.
+    For every extension, it fits a linear model (fixed overhead plus
+    seconds per byte) over all files with that extension. Predictions
+    for unseen files rely on the model of their extension, or on the
+    model of all the files when the extension is unknown.
+
+    The model can be persisted to a JSON file, where the files are
+    sorted from the most to the least expensive, thus easing the
+    inspection. Models of different repositories are stored under
+    different `scope` keys.
+
+    :param store_path: path of the JSON file where to persist the model
+    :param scope: key of the model within the store (e.g., the repository URI)
+    """
+    SMOOTHING = 0.5
+    DEFAULT_OVERHEAD = 0.05
+    DEFAULT_RATE = 1e-6
+    ALL_EXTENSIONS = '*'
+
+    def __init__(self, store_path=None, scope='default'):
+        self.store_path = os.path.expanduser(store_path) if store_path else None
+        self.scope = scope
+        self.files = {}
+        self.extensions = {}
+        self._lock = threading.Lock()
+
+        self.load()
+
+    def predict(self, file_path, size):
+        """Predict the seconds needed to analyze a file
+
+        :param file_path: path of the file, relative to the repository
+        :param size: size of the file in bytes
+
+        :returns: the predicted seconds
+        """
+        ext = GraalRepository.extension(file_path)
+        overhead, rate = self.__linear_model(ext)
+
+        entry = self.files.get(file_path, None)
+        if entry:
+            seconds = entry['seconds'] + rate * (size - entry['size'])
+        else:
+            seconds = overhead + rate * size
+
+        return max(seconds, 0.0)
+
+    def record(self, file_path, size, seconds):
+        """Update the model with the seconds spent analyzing a file
+
+        :param file_path: path of the file, relative to the repository
+        :param size: size of the file in bytes
+        :param seconds: seconds spent analyzing the file
+        """
+        ext = GraalRepository.extension(file_path)
+
+        with self._lock:
+            entry = self.files.get(file_path, None)
+            if entry:
+                entry['seconds'] = self.SMOOTHING * seconds + (1 - self.SMOOTHING) * entry['seconds']
+                entry['size'] = size
+                entry['runs'] += 1
+            else:
+                self.files[file_path] = {'ext': ext, 'size': size, 'seconds': seconds, 'runs': 1}
+
+            for key in [ext, self.ALL_EXTENSIONS]:
+                stats = self.extensions.setdefault(key, {'n': 0, 'sx': 0.0, 'sy': 0.0, 'sxx': 0.0, 'sxy': 0.0})
+                stats['n'] += 1
+                stats['sx'] += size
+                stats['sy'] += seconds
+                stats['sxx'] += size * size
+                stats['sxy'] += size * seconds
+
+    def schedule(self, files):
+        """Sort files from the most to the least expensive to analyze,
+        as done by the Longest Processing Time first (LPT) rule.
+
+        :param files: list of tuples, whose first two elements are
+            the path of the file and its size
+
+        :returns: the list of tuples sorted by predicted cost
+        """
+        return sorted(files, key=lambda f: self.predict(f[0], f[1]), reverse=True)
+
+    def dump(self, top=None):
+        """Dump the files of the model, from the most to the least expensive
+
+        :param top: number of files to return, all of them if None
+
+        :returns: a list of dicts with path, extension, size, seconds and runs
+        """
+        entries = [dict(path=path, **entry) for path, entry in self.files.items()]
+        entries.sort(key=lambda e: e['seconds'], reverse=True)
+
+        return entries[:top] if top else entries
+
+    def load(self):
+        """Load the model from its store, if any"""
+
+        if not self.store_path or not os.path.exists(self.store_path):
+            return
+
+        with open(self.store_path, 'r') as f:
+            content = json.load(f)
+
+        model = content.get(self.scope, {})
+        self.files = {entry.pop('path'): entry for entry in model.get('files', [])}
+        self.extensions = model.get('extensions', {})
+
+        logger.debug("Cost model of %s loaded from %s (%s files)",
+                     self.scope, self.store_path, len(self.files))
+
+    def save(self):
+        """Save the model to its store. The models of other scopes
+        stored in the same file are preserved."""
+
+        if not self.store_path:
+            return
+
+        content = {}
+        if os.path.exists(self.store_path):
+            with open(self.store_path, 'r') as f:
+                content = json.load(f)
+
+        with self._lock:
+            content[self.scope] = {
+                'files': self.dump(),
+                'extensions': self.extensions
+            }
+
+        dirname = os.path.dirname(self.store_path) or '.'
+        os.makedirs(dirname, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.cost_')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(content, f, indent=4)
+        os.replace(tmp_path, self.store_path)
+
+        logger.debug("Cost model of %s saved to %s", self.scope, self.store_path)
+
+    def __linear_model(self, ext):
+        for key in [ext, self.ALL_EXTENSIONS]:
+            stats = self.extensions.get(key, None)
+            if not stats or not stats['n']:
+                continue
+
+            n = stats['n']
+            variance = n * stats['sxx'] - stats['sx'] ** 2
+            if n > 1 and variance > 0:
+                rate = (n * stats['sxy'] - stats['sx'] * stats['sy']) / variance
+                rate = max(rate, 0.0)
+            else:
+                rate = self.DEFAULT_RATE
+
+            overhead = max((stats['sy'] - rate * stats['sx']) / n, 0.0)
+            return overhead, rate
+
+        return self.DEFAULT_OVERHEAD, self.DEFAULT_RATE
@@ -20,14 +20,23 @@
 #     Valerio Cosentino <valcos@bitergia.com>
 #
 
+import argparse
+from contextlib import contextmanager
 from glob import glob
+import fcntl
 import io
 import importlib
+import json
 import logging
 import os
 import pkgutil
+import queue
+import re
 import shutil
+import subprocess
 import tarfile
+import threading
+import time
 
 from grimoirelab.toolkit.datetime import datetime_utcnow
 from grimoirelab.toolkit.introspect import find_signature_parameters
@@ -40,9 +49,41 @@ from perceval.errors import BaseError, RepositoryError
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
 
 from ._version import __version__
+from .memory import MemoryTracker
+from .metrics import (COMMITS,
+                      ITEMS,
+                      LAST_COMMIT,
+                      QUEUE_DEPTH,
+                      MetricsServer,
+                      MetricsTextfile,
+                      REGISTRY)
+from .perf import (STAGE_ANALYZE,
+                   STAGE_CHECKOUT,
+                   STAGE_FILES,
+                   STAGE_LOG,
+                   STAGE_POST,
+                   Timings,
+                   activate,
+                   record,
+                   stage)
+from .plan import Plan
+from .profiling import record_commit
+from .progress import (STATE_COMPLETED,
+                       STATE_FAILED,
+                       Progress)
 
 CATEGORY_GRAAL = 'graal'
 DEFAULT_WORKTREE_PATH = '/tmp/worktrees/'
+DEFAULT_PROGRESS_INTERVAL = Progress.INTERVAL
+
+ALL_ANALYZERS = '*'
+SKIP_TIMEOUT = 'timeout'
+SKIP_COMMIT_TIMEOUT = 'commit_timeout'
+SKIP_TOO_LARGE = 'too_large'
+
+# Key of the item where its timings are kept until the metadata is added
+PERF_KEY = '__perf'
+MEMORY_KEY = '__memory'
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +94,17 @@ class GraalError(BaseError):
     message = "%(cause)s"
 
 
+class AnalysisSkippedError(GraalError):
+    """Exception raised when the analysis of a target is given up,
+    because it took too long or the target was too large"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.target = kwargs['target']
+        self.reason = kwargs['reason']
+        self.analyzer = kwargs.get('analyzer', None)
+
+
 class Graal(Git):
     """Generic Repository AnALyzer backend.
 
@@ -63,7 +115,62 @@ class Graal(Git):
     the local path of a Git repository (URI), a value for
     `git_path`, where the repository will be mirrored, and the path where
     a working tree will be created. The working tree is added to the
-    mirror and removed after the analysis is over.
+    mirror and removed after the analysis is over, unless `recycle_worktree`
+    is set. In that case, the working tree is locked and kept on disk, thus
+    the next executions on the same mirror reuse it.
+
+    Working trees can be placed on a memory-backed file system (e.g.,
+    a folder under `/dev/shm`) by setting `tmpfs_path`. Before creating the
+    working tree, the size of the checkout is estimated with `git ls-tree`;
+    when the working trees of the execution do not fit in the space available
+    at `tmpfs_path`, Graal falls back to `worktreepath`. The working trees
+    kept by previous executions in the location not used are deleted.
+
+    When `pipeline` is set, commits are parsed and checked out in background
+    on a second working tree, while the current one is analyzed (see
+    `SnapshotPipeline`).
+
+    The time spent analyzing a commit can be bounded with `file_timeout`,
+    which applies to every run of an analyzer, and `commit_timeout`, which
+    applies to the whole commit. The files analyzed can be limited with
+    `max_file_size`, either a number of bytes or a dict which maps the names
+    of the analyzers (e.g., `lizard`, `cloc`) to their limits (`*` sets the
+    limit of the analyzers not listed). Targets skipped because of these
+    limits are listed in the attribute `skipped` of the item, together with
+    the analyzer and the reason, while the results of the other analyses
+    are kept.
+
+    When `perf` is set, the wall and CPU time spent in each stage (i.e.,
+    parsing the log, checking out the commit, listing the files, analyzing
+    the commit and each analyzer, post-processing the item) to produce
+    each item are added to the attribute `perf` of its metadata, and
+    a summary of the whole execution is logged at the end.
+
+    When `memory` is set, the memory used to analyze each commit (i.e., the
+    peak of the Python allocations, the source lines which hold the most
+    memory and the peak RSS of the tools run by each analyzer, see
+    `MemoryTracker`) is added to the attribute `memory` of the metadata
+    of its last item. Commits whose peak exceeds `memory_limit` are logged
+    as warnings and, if `memory_spill` is set, the memory held across
+    commits is released by calling the method `_spill()`. Backends which
+    do not redefine it hold no memory across commits, thus they refuse
+    `memory_spill`.
+
+    When `progress` is set, the commits to process are counted up front with
+    `git rev-list`, and every `progress_interval` seconds the percentage of
+    commits done, the commits per second, the estimated time to finish and
+    the current stage are logged (see `Progress`). The same status is written
+    to the JSON file `status_file`, when given.
+
+    The cost of a run can be estimated up front with `plan`, which clones or
+    updates the mirror as `fetch` does, and then walks the commits and the
+    sizes of their files using the metadata of the mirror only, without
+    checking out nor analyzing the commits (see `Plan`).
+
+    Several executions can safely target the same mirror at the same time.
+    Each one leases its own working tree from a `WorktreePool`, while the
+    operations which modify the mirror (i.e., clone, update, creation and
+    pruning of working trees) are serialized by a file lock.
 
     For each target commit (by default all of them), a checkout version
     of the repository is created at `worktreepath` to ease the analysis.
@@ -72,26 +179,52 @@ class Graal(Git):
     Furthermore, you can plug your analysis by redefining the
     method `_analyze(self, commit)` as well as tweak
     the item generated by redefining the method `_post(commit)`.
+    A commit can be split over several items by redefining the
+    method `_generate_items(commit)`.
 
     :param uri: URI of the Git repository
     :param git_path: path to where is/to clone the repository
     :param worktreepath: the directory where to store the working tree
-    :param entrypoint: the entrypoint of the analysis
+    :param entrypoint: the entrypoint of the analysis, or a list of entrypoints
     :param in_paths: the target paths of the analysis
     :param out_paths: the paths to be excluded from the analysis
     :param details: if enable, it returns fine-grained results
+    :param recycle_worktree: if enable, the working tree is kept and reused across executions
+    :param tmpfs_path: memory-backed directory where to store the working tree, when it fits
+    :param pipeline: if enable, the next commit is checked out on a second working tree
+        while the current one is analyzed
+    :param file_timeout: max seconds spent by an analyzer on a target
+    :param commit_timeout: max seconds spent analyzing a commit
+    :param max_file_size: max size in bytes of the files analyzed, or a dict
+        with the max size for each analyzer
+    :param perf: if enable, the time spent in each stage is recorded
+    :param memory: if enable, the memory used by each commit is recorded
+    :param memory_limit: soft limit, in bytes, of the Python memory used by a commit
+    :param memory_spill: if enable, the memory held across commits is released
+        when a commit exceeds `memory_limit`
+    :param progress: if enable, the progress of the analysis is logged periodically
+    :param progress_interval: seconds between two reports of the progress
+    :param status_file: path of the JSON file where the progress is written
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
 
     :raises RepositoryError: raised when there was an error cloning or
         updating the repository.
     """
-    version = '0.2.1'
+    version = '0.2.11'
 
     CATEGORIES = [CATEGORY_GRAAL]
 
+    # Free space required on the memory-backed file system, with respect
+    # to the estimated size of the working tree
+    TMPFS_HEADROOM = 1.5
+
     def __init__(self, uri, gitpath, worktreepath=DEFAULT_WORKTREE_PATH,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 recycle_worktree=False, tmpfs_path=None, pipeline=False,
+                 file_timeout=None, commit_timeout=None, max_file_size=None,
+                 perf=False, memory=False, memory_limit=None, memory_spill=False,
+                 progress=False, progress_interval=DEFAULT_PROGRESS_INTERVAL, status_file=None,
                  tag=None, archive=None):
         super().__init__(uri, gitpath, tag=tag, archive=archive)
         self.uri = uri
@@ -101,13 +234,33 @@ class Graal(Git):
         self.in_paths = in_paths
         self.out_paths = out_paths
         self.details = details
+        self.recycle_worktree = recycle_worktree
+        self.tmpfs_path = tmpfs_path
+        self.pipeline = pipeline
+        self.file_timeout = file_timeout
+        self.commit_timeout = commit_timeout
+        self.max_file_size = max_file_size
+        self.perf = perf
+        self.memory = memory
+        self.memory_limit = memory_limit
+        self.memory_spill = memory_spill
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.status_file = status_file
 
         if not os.path.exists(worktreepath):
             os.mkdir(worktreepath)
 
         self.worktreepath = os.path.join(worktreepath, os.path.split(self.gitpath)[1])
+        self.disk_worktreepath = worktreepath
+        self.worktreepool = WorktreePool(self.gitpath, worktreepath, tmpfs_path=tmpfs_path)
         self.graalRepo = None
 
+        self._skipped = []
+        self._commit_deadline = None
+        self._timings = None
+        self._progress = None
+
     def fetch(self, category=CATEGORY_GRAAL,
               from_date=DEFAULT_DATETIME, to_date=DEFAULT_LAST_DATETIME,
               branches=None, latest_items=False):
@@ -161,30 +314,179 @@ class Graal(Git):
         :returns: a generator of items
         """
         icommits = 0
+        branches = kwargs.get('branches', None)
+        backend_name = self.__class__.__name__
+        self._timings = Timings() if self.perf else None
 
-        self.graalRepo = self.__create_graal_repository()
+        if self.memory_spill and not self._can_spill():
+            cause = "%s holds no memory across commits, thus it cannot spill it" % backend_name
+            raise GraalError(cause=cause)
 
-        commits = super().fetch_items(category, **kwargs)
-        for commit in commits:
-            try:
-                if self._filter_commit(commit):
-                    continue
+        self.graalRepo = self.__create_graal_repository(branches)
+        repos = [self.graalRepo]
+        snapshots = None
+        tracker = MemoryTracker() if self.memory else None
+        completed = False
 
-                self.graalRepo.checkout(commit['commit'])
-                commit['analysis'] = self._analyze(commit)
+        self._progress = None
+        if self.progress or self.status_file:
+            self._progress = Progress('%s %s' % (backend_name, self.uri),
+                                      interval=self.progress_interval, status_path=self.status_file)
 
-                commit = self._post(commit)
-                yield commit
+        try:
+            if tracker:
+                tracker.start()
+            if self._progress:
+                self._progress.set_stage(STAGE_LOG)
+                self._progress.start()
+
+            if self.pipeline:
+                repos.append(self.__create_graal_repository(branches, place=False))
+
+            commits = self.__fetch_commits(category, **kwargs)
+            if self.pipeline:
+                snapshots = SnapshotPipeline(commits, repos, self._filter_commit, timed=self.perf)
+            else:
+                snapshots = SnapshotSequence(commits, self.graalRepo, self._filter_commit, timed=self.perf)
+
+            snapshots_iter = iter(snapshots)
+            while True:
+                # the memory of a commit includes parsing and checking it out
+                if tracker:
+                    tracker.begin_commit()
+
+                snapshot = next(snapshots_iter, None)
+                if snapshot is None:
+                    break
+                commit, repo = snapshot
+
+                # the last item of a commit is yielded once its working
+                # tree is released, thus the next checkout can go on
+                last = None
+                start = time.perf_counter()
+                try:
+                    self.graalRepo = repo
+                    self.worktreepath = repo.worktreepath
+                    self._start_commit()
+                    if self._progress:
+                        self._progress.set_stage(STAGE_ANALYZE, commit['commit'])
+
+                    timings = snapshots.timings.pop(commit['commit'], None)
+                    for item in self.__timed_items(commit, timings):
+                        ITEMS.labels(backend_name).inc()
+                        if last is not None:
+                            yield last
+                        last = item
+
+                    if tracker and last is not None:
+                        last[MEMORY_KEY] = self.__check_memory(commit, tracker.end_commit())
+                except Exception as e:
+                    logger.error("Analysis failed at %s" % commit['commit'])
+                    raise e
+                finally:
+                    snapshots.release(repo)
+
+                record_commit(commit['commit'], time.perf_counter() - start)
+                COMMITS.labels(backend_name).inc()
+                LAST_COMMIT.labels(backend_name).set(time.time())
+
+                if last is not None:
+                    yield last
                 icommits += 1
-            except Exception as e:
-                logger.error("Analysis failed at %s" % commit['commit'])
-                raise e
 
-        self.graalRepo.prune()
+                if self._progress:
+                    self._progress.update(icommits + snapshots.discarded)
+                    self._progress.set_stage(STAGE_CHECKOUT)
+
+            snapshots.close()
+            completed = True
+
+            for repo in repos:
+                if self.recycle_worktree:
+                    logger.info("Git worktree %s kept for the next executions" % repo.worktreepath)
+                else:
+                    with self.worktreepool.mirror_lock():
+                        repo.prune()
+        finally:
+            if snapshots:
+                snapshots.close()
+
+            if tracker:
+                tracker.stop()
+            if self._progress:
+                self._progress.stop(STATE_COMPLETED if completed else STATE_FAILED)
+
+            for repo in repos:
+                self.worktreepool.release(repo.worktreepath)
 
         logger.info("Fetch process completed: %s commits inspected",
                     icommits)
 
+        if self._timings is not None:
+            self.__log_timings(icommits)
+
+    def plan(self, from_date=DEFAULT_DATETIME, to_date=DEFAULT_LAST_DATETIME, branches=None):
+        """Estimate the cost of fetching the commits, without analyzing them.
+
+        The commits are listed and selected as done by `fetch`, thus the
+        mirror is cloned or updated. The files of the first commit selected
+        are listed with `git ls-tree`, while the changes of the next ones
+        are tracked with `git diff-tree`, thus neither working trees nor
+        analyzers are used. The files of each commit selected by `_plan_files`
+        are added to the `Plan` returned by `_new_plan`. All the commits
+        between the dates are estimated, since `latest_items` is not supported.
+
+        :param from_date: obtain commits newer than a specific date
+            (inclusive)
+        :param to_date: obtain commits older than a specific date
+        :param branches: names of branches to fetch from (default: None)
+
+        :returns: a dict with the estimate (see `Plan.to_dict`), the
+            name of the backend and the origin of the data
+        """
+        kwargs = {
+            'from_date': from_date or DEFAULT_DATETIME,
+            'to_date': to_date or DEFAULT_LAST_DATETIME,
+            'branches': branches,
+            'latest_items': False
+        }
+
+        plan = self._new_plan()
+        repo = None
+        files = None
+        previous = None
+
+        for commit in self.__fetch_commits(self.CATEGORIES[0], **kwargs):
+            if self._filter_commit(commit):
+                plan.skip_commit()
+                continue
+
+            repo = repo or GraalRepository(self.uri, self.gitpath)
+            if previous is None:
+                files = repo.file_sizes(commit['commit'])
+                changed = None
+            else:
+                blobs = repo.changed_blobs(previous, commit['commit'])
+                sizes = repo.blob_sizes([blob for blob in set(blobs.values()) if blob])
+                for path, blob in blobs.items():
+                    if blob is None:
+                        files.pop(path, None)
+                    else:
+                        files[path] = sizes[blob]
+                changed = set(blobs)
+
+            plan.add_commit(self._plan_files(files), changed)
+            previous = commit['commit']
+
+        estimate = plan.to_dict()
+        estimate['backend_name'] = self.__class__.__name__
+        estimate['origin'] = self.origin
+
+        logger.info("Plan completed: %s commits, %s file analyses (%s incremental)",
+                    estimate['commits'], estimate['analyses']['full'], estimate['analyses']['incremental'])
+
+        return estimate
+
     def metadata(self, item):
         """Add metadata to an item.
 
@@ -194,9 +496,14 @@ class Graal(Git):
 
         :param item: an item fetched by a backend
         """
+        timings = item.pop(PERF_KEY, None)
+        memory = item.pop(MEMORY_KEY, None)
+
         item = {
             'backend_name': self.__class__.__name__,
             'backend_version': self.version,
+            'perf': None,
+            'memory': None,
             'graal_version': __version__,
             'timestamp': datetime_utcnow().timestamp(),
             'origin': self.origin,
@@ -207,6 +514,16 @@ class Graal(Git):
             'data': item,
         }
 
+        if timings is None:
+            item.pop('perf')
+        else:
+            item['perf'] = timings.to_dict()
+
+        if memory is None:
+            item.pop('memory')
+        else:
+            item['memory'] = memory
+
         return item
 
     @staticmethod
@@ -242,18 +559,656 @@ class Graal(Git):
         """
         return commit
 
-    def __create_graal_repository(self):
-        if not os.path.exists(self.gitpath):
-            repo = GraalRepository.clone(self.uri, self.gitpath)
-        elif os.path.isdir(self.gitpath):
-            repo = GraalRepository(self.uri, self.gitpath)
+    def _generate_items(self, commit):
+        """Generate the items of a commit. By default, a single item is
+        generated, whose `analysis` is the result of `_analyze(commit)`.
+        Backends can redefine it to split the analysis of a commit
+        over several items.
+
+        :param commit: a Perceval commit item
+
+        :returns: a generator of Graal items
+        """
+        with stage(STAGE_ANALYZE):
+            commit['analysis'] = self._analyze(commit)
+        if self._skipped:
+            commit['skipped'] = self._skipped
+
+        with stage(STAGE_POST):
+            commit = self._post(commit)
+
+        yield commit
+
+    def _analyze_entrypoints(self, commit, analyze_entrypoint):
+        """Analyze the entrypoints of the current commit.
+
+        When `entrypoint` is a list, all the entrypoints are analyzed
+        against the same checkout and the results are returned in a dict
+        keyed by entrypoint. Otherwise, the result of the single
+        entrypoint is returned.
+
+        :param commit: a Perceval commit item
+        :param analyze_entrypoint: function which takes the commit
+            and an entrypoint and returns the analysis
+
+        :returns: the result of the analysis
+        """
+        if isinstance(self.entrypoint, (list, tuple)):
+            return {entrypoint: analyze_entrypoint(commit, entrypoint)
+                    for entrypoint in self.entrypoint}
+
+        return analyze_entrypoint(commit, self.entrypoint)
+
+    def _timeout(self, target):
+        """Return the seconds an analyzer can spend on a target, according
+        to `file_timeout` and to the time left to analyze the current commit.
+
+        :param target: path of the file or folder to analyze
+
+        :returns: the seconds available, None if there is no limit
+
+        :raises AnalysisSkippedError: raised when the time to analyze
+            the current commit is over
+        """
+        timeout = self.file_timeout
+
+        if self._commit_deadline is not None:
+            left = self._commit_deadline - time.monotonic()
+            if left <= 0:
+                cause = "Time to analyze the commit is over, %s skipped" % target
+                raise AnalysisSkippedError(cause=cause, target=target, reason=SKIP_COMMIT_TIMEOUT)
+
+            timeout = min(timeout, left) if timeout else left
+
+        return timeout
+
+    def _skip(self, error):
+        """Record a target whose analysis was skipped in the current commit
+
+        :param error: the `AnalysisSkippedError` raised
+        """
+        logger.warning("Analysis skipped: %s", error)
+
+        self._skipped.append({
+            'file_path': os.path.relpath(error.target, self.worktreepath),
+            'analyzer': error.analyzer,
+            'reason': error.reason
+        })
+
+    def _start_commit(self):
+        """Reset the skipped targets and the deadline of the current commit"""
+
+        self._skipped = []
+        self._commit_deadline = time.monotonic() + self.commit_timeout if self.commit_timeout else None
+
+    def _spill(self):
+        """Release the memory held across commits (e.g., caches), called when
+        a commit exceeds the soft memory limit and `memory_spill` is set"""
+
+        pass
+
+    def _can_spill(self):
+        """Check whether the backend holds memory across commits which
+        `_spill` releases, i.e., whether it redefines `_spill`"""
+
+        return type(self)._spill is not Graal._spill
+
+    def _new_plan(self):
+        """Create the `Plan` which estimates the cost of the analysis"""
+
+        return Plan()
+
+    def _plan_files(self, files):
+        """Select the files targeted by the analysis of a commit, when
+        estimating its cost. By default, the files within the entrypoints,
+        or all of them when no entrypoint is set.
+
+        :param files: dict with the size of each file of the commit, keyed by path
+
+        :returns: a list of tuples with the path and the size of the files
+        """
+        if not self.entrypoint:
+            return list(files.items())
+
+        entrypoints = self.entrypoint if isinstance(self.entrypoint, (list, tuple)) else [self.entrypoint]
+        prefixes = tuple(entrypoint.rstrip('/') + '/' for entrypoint in entrypoints)
+
+        return [(path, size) for path, size in files.items() if path.startswith(prefixes)]
+
+    def __check_memory(self, commit, memory):
+        """Warn when the memory used by a commit exceeds the soft limit,
+        and release the memory held across commits if requested"""
+
+        if self.memory_limit and memory['peak'] > self.memory_limit:
+            logger.warning("Analysis of %s peaked at %s bytes, above the limit of %s bytes",
+                           commit['commit'], memory['peak'], self.memory_limit)
+            if self.memory_spill:
+                self._spill()
+
+        return memory
+
+    def __timed_items(self, commit, timings):
+        """Generate the items of a commit. When `timings` is given, the
+        stages run to produce each item are recorded and attached to it"""
+
+        if timings is None:
+            yield from self._generate_items(commit)
+            return
+
+        items = self._generate_items(commit)
+        while True:
+            with activate(timings):
+                item = next(items, None)
+
+            if item is None:
+                return
+
+            item[PERF_KEY] = timings
+            self._timings.merge(timings)
+            timings = Timings()
+
+            yield item
+
+    def __log_timings(self, icommits):
+        """Log the time spent in each stage during the whole execution"""
+
+        stages = sorted(self._timings.to_dict().items(), key=lambda s: s[1]['wall'], reverse=True)
+
+        logger.info("Time spent in %s commits:", icommits)
+        for name, timing in stages:
+            logger.info("  %-12s %8.3fs wall %8.3fs cpu %8d calls",
+                        name, timing['wall'], timing['cpu'], timing['calls'])
+
+    def __fetch_commits(self, category, **kwargs):
+        """Fetch the commits. The mirror is updated while holding its lock"""
+
+        commits = super().fetch_items(category, **kwargs)
+
+        with self.worktreepool.mirror_lock():
+            commit = next(commits, None)
+
+        if commit is None:
+            return
+
+        if self._progress:
+            self.__count_commits(**kwargs)
+
+        yield commit
+
+        for commit in commits:
+            yield commit
+
+    def __count_commits(self, **kwargs):
+        """Count the commits to process, once the mirror is updated"""
+
+        if kwargs.get('latest_items', False):
+            return
+
+        try:
+            total = self.graalRepo.count_commits(from_date=kwargs.get('from_date', None),
+                                                 to_date=kwargs.get('to_date', None),
+                                                 branches=kwargs.get('branches', None))
+        except RepositoryError as e:
+            logger.warning("Commits to process not counted, %s", e)
+            return
+
+        logger.info("%s commits to process", total)
+        self._progress.set_total(total)
+
+    def __create_graal_repository(self, branches=None, place=True):
+        with self.worktreepool.mirror_lock():
+            if not os.path.exists(self.gitpath):
+                repo = GraalRepository.clone(self.uri, self.gitpath)
+            elif os.path.isdir(self.gitpath):
+                repo = GraalRepository(self.uri, self.gitpath)
+
+            if self.tmpfs_path and place:
+                self.__place_worktree(repo, branches)
 
-        if os.path.exists(self.worktreepath):
-            shutil.rmtree(self.worktreepath)
+            self.worktreepool.cleanup(repo)
+            worktreepath = self.worktreepool.acquire()
 
-        repo.worktree(self.worktreepath)
+            try:
+                self.__prepare_worktree(repo, worktreepath)
+            except Exception as e:
+                self.worktreepool.release(worktreepath)
+                raise e
+
+        self.worktreepath = worktreepath
         return repo
 
+    def __place_worktree(self, repo, branches):
+        """Move the pool of working trees to `tmpfs_path` when the
+        checkouts of all the working trees of the execution (i.e., two
+        with `pipeline`) fit in it, otherwise keep it on disk"""
+
+        self.worktreepool.worktreepath = self.disk_worktreepath
+
+        revs = ['refs/heads/' + branch for branch in branches] if branches else ['HEAD']
+        nworktrees = 2 if self.pipeline else 1
+        try:
+            needed = max([repo.tree_size(rev)[0] for rev in revs]) * self.TMPFS_HEADROOM * nworktrees
+        except RepositoryError:
+            logger.warning("Size of the worktree of %s not estimated, tmpfs will not be used" % self.gitpath)
+            return
+
+        os.makedirs(self.tmpfs_path, exist_ok=True)
+        stat = os.statvfs(self.tmpfs_path)
+        available = stat.f_bavail * stat.f_frsize
+
+        if needed > available:
+            logger.warning("Worktrees of %s do not fit in %s (%s bytes needed, %s available), "
+                           "falling back to %s" % (self.gitpath, self.tmpfs_path, int(needed),
+                                                   available, self.disk_worktreepath))
+            return
+
+        logger.info("Worktrees of %s placed in %s" % (self.gitpath, self.tmpfs_path))
+        self.worktreepool.worktreepath = self.tmpfs_path
+
+    def __prepare_worktree(self, repo, worktreepath):
+        if self.recycle_worktree and repo.is_worktree(worktreepath):
+            repo.reuse_worktree(worktreepath)
+            repo.lock()
+            return
+
+        if os.path.exists(worktreepath):
+            shutil.rmtree(worktreepath)
+
+        repo.worktree(worktreepath)
+
+        if self.recycle_worktree:
+            repo.lock()
+
+
+class SnapshotSequence:
+    """Sequence of repository snapshots to analyze.
+
+    For each commit in `commits` which is not discarded by `filter_commit`,
+    the working tree of `repo` is checked out at that commit and the pair
+    (commit, repo) is returned.
+
+    The number of commits discarded so far is available in `discarded`.
+    When `timed` is set, the time spent to parse and filter the commit
+    (including the commits discarded before it) and to check it out is
+    stored in `timings`, which maps the hash of each commit returned to
+    a `Timings` object.
+
+    :param commits: an iterator of Perceval commit items
+    :param repo: a `GraalRepository` with a working tree
+    :param filter_commit: function to discard commits
+    :param timed: if enable, the time spent in each stage is recorded
+    """
+    def __init__(self, commits, repo, filter_commit, timed=False):
+        self.commits = commits
+        self.repo = repo
+        self.filter_commit = filter_commit
+        self.timed = timed
+        self.timings = {}
+        self.discarded = 0
+
+    def __iter__(self):
+        for commit, timings in self._parse():
+            try:
+                self._checkout(self.repo, commit, timings)
+            except Exception as e:
+                logger.error("Analysis failed at %s" % commit['commit'])
+                raise e
+
+            yield commit, self.repo
+
+    def release(self, repo):
+        """Notify that the analysis on the working tree of `repo` is over"""
+
+        pass
+
+    def close(self):
+        """Stop producing snapshots"""
+
+        pass
+
+    def _parse(self):
+        """Return the commits not discarded by `filter_commit`, together
+        with the time spent to parse and filter them"""
+
+        commits = iter(self.commits)
+        timings = Timings() if self.timed else None
+
+        while True:
+            with record(timings, STAGE_LOG):
+                commit = next(commits, None)
+                discarded = commit is not None and self.filter_commit(commit)
+
+            if commit is None:
+                return
+            elif discarded:
+                self.discarded += 1
+                continue
+
+            yield commit, timings
+            timings = Timings() if self.timed else None
+
+    def _checkout(self, repo, commit, timings):
+        """Check out `commit` on the working tree of `repo`"""
+
+        with record(timings, STAGE_CHECKOUT):
+            repo.checkout(commit['commit'])
+
+        if self.timed:
+            self.timings[commit['commit']] = timings
+
+
+class SnapshotPipeline(SnapshotSequence):
+    """Sequence of repository snapshots prepared in background.
+
+    Snapshots are produced by two stages, each one running on its own
+    thread: the first one parses and filters the commits, the second one
+    checks out the next commit on a free working tree. Meanwhile, the
+    consumer analyzes the current snapshot. Once done, the consumer must
+    call `release` to return the working tree to the pipeline.
+
+    Snapshots are returned in the same order of the commits. Memory is
+    bounded by backpressure: at most `depth` parsed commits wait to be
+    checked out, and a working tree is not reused until it is released.
+
+    :param commits: an iterator of Perceval commit items
+    :param repos: list of `GraalRepository` objects, each one with its working tree
+    :param filter_commit: function to discard commits
+    :param depth: number of parsed commits that can wait to be checked out
+    :param timed: if enable, the time spent in each stage is recorded
+    """
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, commits, repos, filter_commit, depth=1, timed=False):
+        super().__init__(commits, None, filter_commit, timed=timed)
+
+        self.free = queue.Queue()
+        for repo in repos:
+            self.free.put(repo)
+
+        self.parsed = queue.Queue(maxsize=depth)
+        self.ready = queue.Queue(maxsize=len(repos))
+        self.stopped = threading.Event()
+        self.threads = [threading.Thread(target=self.__parse, daemon=True),
+                        threading.Thread(target=self.__prepare, daemon=True)]
+
+    def __iter__(self):
+        for thread in self.threads:
+            thread.start()
+
+        while True:
+            item = self.ready.get()
+            self.__track(self.ready)
+
+            if item is _END_OF_PIPELINE:
+                break
+            elif isinstance(item, _PipelineFailure):
+                if item.commit:
+                    logger.error("Analysis failed at %s" % item.commit['commit'])
+                raise item.error
+
+            yield item
+
+    def release(self, repo):
+        self.free.put(repo)
+        self.__track(self.free)
+
+    def close(self):
+        self.stopped.set()
+
+        for thread in self.threads:
+            if thread.is_alive():
+                thread.join()
+
+    def __parse(self):
+        try:
+            for parsed in self._parse():
+                if self.stopped.is_set():
+                    return
+
+                if not self.__put(self.parsed, parsed):
+                    return
+        except Exception as e:
+            self.__put(self.parsed, _PipelineFailure(e))
+            return
+
+        self.__put(self.parsed, _END_OF_PIPELINE)
+
+    def __prepare(self):
+        while True:
+            parsed = self.__get(self.parsed)
+
+            if parsed is None:
+                return
+            elif parsed is _END_OF_PIPELINE or isinstance(parsed, _PipelineFailure):
+                self.__put(self.ready, parsed)
+                return
+
+            commit, timings = parsed
+            repo = self.__get(self.free)
+            if repo is None:
+                return
+
+            try:
+                self._checkout(repo, commit, timings)
+            except Exception as e:
+                self.__put(self.ready, _PipelineFailure(e, commit))
+                return
+
+            if not self.__put(self.ready, (commit, repo)):
+                return
+
+    def __put(self, q, item):
+        while not self.stopped.is_set():
+            try:
+                q.put(item, timeout=self.POLL_INTERVAL)
+                self.__track(q)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def __get(self, q):
+        while not self.stopped.is_set():
+            try:
+                item = q.get(timeout=self.POLL_INTERVAL)
+                self.__track(q)
+                return item
+            except queue.Empty:
+                continue
+
+        return None
+
+    def __track(self, q):
+        """Update the metric of the depth of a queue"""
+
+        if q is self.parsed:
+            name = 'parsed'
+        elif q is self.ready:
+            name = 'ready'
+        else:
+            name = 'free'
+
+        QUEUE_DEPTH.labels(name).set(q.qsize())
+
+
+class _PipelineFailure:
+    """Error raised by a stage of a `SnapshotPipeline`"""
+
+    def __init__(self, error, commit=None):
+        self.error = error
+        self.commit = commit
+
+
+_END_OF_PIPELINE = object()
+
+
+class WorktreePool:
+    """Pool of the working trees of a Git mirror.
+
+    Every execution on a mirror leases a slot of the pool, which is
+    a working tree located at `worktreepath`. The first slot is named
+    after the mirror (e.g., `graaltest`), the following ones append
+    a counter to it (e.g., `graaltest-1`, `graaltest-2`). Leases are held
+    with `flock` on the files stored in the `.locks` folder, thus they are
+    released by the kernel when the process which holds them dies.
+
+    The pool also provides a lock to serialize the operations which
+    modify the mirror. The lock file is stored next to the mirror.
+
+    When `tmpfs_path` is set, the slots are stored either there or at
+    `worktreepath`, depending on the space available for each execution
+    (see `Graal`); the attribute `worktreepath` holds the location used.
+
+    :param gitpath: path of the mirror
+    :param worktreepath: the directory where the working trees are stored
+    :param tmpfs_path: memory-backed directory where the working trees
+        may be stored instead
+    """
+    LOCKS_FOLDER = '.locks'
+    MIRROR_LOCK_SUFFIX = '.graal.lock'
+
+    def __init__(self, gitpath, worktreepath, tmpfs_path=None):
+        self.name = os.path.split(gitpath)[1]
+        self.worktreepath = worktreepath
+        self.locations = [worktreepath]
+        if tmpfs_path and os.path.normpath(tmpfs_path) != os.path.normpath(worktreepath):
+            self.locations.append(tmpfs_path)
+        self.mirror_lock_path = os.path.normpath(gitpath) + self.MIRROR_LOCK_SUFFIX
+
+        self._leases = {}
+        self._mirror_fd = None
+        self._mirror_depth = 0
+
+    @property
+    def locks_path(self):
+        return os.path.join(self.worktreepath, self.LOCKS_FOLDER)
+
+    def slot(self, index):
+        """Get the path of the slot at position `index`"""
+
+        name = self.name if index == 0 else '%s-%s' % (self.name, index)
+        return os.path.join(self.worktreepath, name)
+
+    def slots(self, location=None):
+        """List the paths of the slots available on disk at `location`,
+        by default the one currently used"""
+
+        location = location or self.worktreepath
+        if not os.path.isdir(location):
+            return []
+
+        pattern = re.compile(r'^%s(-\d+)?$' % re.escape(self.name))
+        return sorted([os.path.join(location, entry)
+                       for entry in os.listdir(location) if pattern.match(entry)])
+
+    def acquire(self):
+        """Lease the first free slot of the pool
+
+        :returns: the path of the leased slot
+        """
+        index = 0
+        while True:
+            path = self.slot(index)
+            fd = self.__try_lock(path)
+
+            if fd is not None:
+                self._leases[path] = fd
+                logger.debug("Worktree slot %s leased" % path)
+                return path
+
+            index += 1
+
+    def release(self, path):
+        """Release the lease on the slot `path`"""
+
+        fd = self._leases.pop(path, None)
+        if fd is None:
+            return
+
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+        logger.debug("Worktree slot %s released" % path)
+
+    def is_leased(self, path):
+        """Check whether the slot `path` is leased by any execution"""
+
+        if path in self._leases:
+            return True
+
+        fd = self.__try_lock(path)
+        if fd is None:
+            return True
+
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+        return False
+
+    def cleanup(self, repo):
+        """Delete the working trees left behind by crashed executions.
+
+        A slot which is not leased and whose working tree is not locked
+        (i.e., it was not kept on purpose to be reused) is stale. The slots
+        of the locations not currently used are stale even when locked,
+        since they are not reused by this execution.
+
+        :param repo: a `GraalRepository` of the mirror
+        """
+        for location in self.locations:
+            current = os.path.normpath(location) == os.path.normpath(self.worktreepath)
+            self.__cleanup_location(repo, location, current)
+
+    def __cleanup_location(self, repo, location, current):
+        for path in self.slots(location):
+            if self.is_leased(path):
+                continue
+
+            if current and repo.is_worktree(path) and repo.is_locked(path):
+                continue
+
+            logger.warning("Stale worktree %s found, it will be deleted" % path)
+            stale = GraalRepository(repo.uri, repo.dirpath)
+            stale.worktreepath = path
+            stale.prune()
+
+    @contextmanager
+    def mirror_lock(self):
+        """Hold the lock of the mirror. The lock is reentrant
+        for the same pool."""
+
+        if self._mirror_depth == 0:
+            dirname = os.path.dirname(self.mirror_lock_path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+
+            self._mirror_fd = os.open(self.mirror_lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+            fcntl.flock(self._mirror_fd, fcntl.LOCK_EX)
+
+        self._mirror_depth += 1
+        try:
+            yield
+        finally:
+            self._mirror_depth -= 1
+            if self._mirror_depth == 0:
+                fcntl.flock(self._mirror_fd, fcntl.LOCK_UN)
+                os.close(self._mirror_fd)
+                self._mirror_fd = None
+
+    def __try_lock(self, path):
+        # the locks of the slots are stored where the slots are
+        locks_path = os.path.join(os.path.dirname(path), self.LOCKS_FOLDER)
+        os.makedirs(locks_path, exist_ok=True)
+        lock_path = os.path.join(locks_path, os.path.basename(path) + '.lock')
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+
+        return fd
+
 
 class GraalRepository(GitRepository):
     """Manage a Graal repository.
@@ -261,17 +1216,26 @@ class GraalRepository(GitRepository):
     This class extends the GitRepository class. Thus, it provides some
     additional commands such as `worktree`, `create_tar` or `untar`.
 
+    Working trees are created in detached HEAD mode, thus they do not hold
+    any branch of the mirror and do not prevent it from being updated.
+
     :param uri: URI of the repository
     :param dirpath: local directory where the repository is stored
     """
 
+    PAGE_SIZE = 4096
+
+    # Modes of the entries of a tree which are not files (i.e., missing
+    # entries and submodules)
+    NO_BLOB_MODES = ['000000', '160000']
+
     def __init__(self, uri, dirpath):
         super().__init__(uri, dirpath)
         self.worktreepath = None
 
     def worktree(self, worktreepath, branch=None):
-        """Create a working tree of the cloned repository with the active branch
-        set to `branch`
+        """Create a working tree of the cloned repository with the HEAD
+        detached at the tip of `branch`
 
         :param worktreepath: the path where the working tree will be located
         :param branch: the name of the branch. If None, the branch is set to `master`
@@ -281,14 +1245,14 @@ class GraalRepository(GitRepository):
         if not branch:
             branch = 'master'
 
-        cmd_worktree = ['git', 'worktree', 'add', self.worktreepath, branch]
+        cmd_worktree = ['git', 'worktree', 'add', '--detach', self.worktreepath, branch]
 
         try:
             self._exec(cmd_worktree, cwd=self.dirpath, env=self.gitenv)
             logger.info("Git worktree %s created!" % self.worktreepath)
             return
         except Exception:
-            pass
+            logger.warning("Git worktree %s could not be created, retrying after a prune" % self.worktreepath)
 
         try:
             self.prune()
@@ -297,11 +1261,80 @@ class GraalRepository(GitRepository):
             cause = "Impossible to create the worktree %s" % (self.worktreepath)
             raise RepositoryError(cause=cause)
 
+    def is_worktree(self, worktreepath):
+        """Check whether `worktreepath` is a working tree of this repository
+
+        :param worktreepath: the path of the working tree
+
+        :returns: True if the working tree exists and belongs to the repository
+        """
+        gitdir = self.__worktree_gitdir(worktreepath)
+        if not gitdir or not os.path.isdir(gitdir):
+            return False
+
+        worktrees_dir = os.path.join(os.path.realpath(self.dirpath), 'worktrees')
+        return os.path.dirname(gitdir) == worktrees_dir
+
+    def is_locked(self, worktreepath):
+        """Check whether the working tree `worktreepath` is locked"""
+
+        gitdir = self.__worktree_gitdir(worktreepath)
+        if not gitdir:
+            return False
+
+        return os.path.exists(os.path.join(gitdir, 'locked'))
+
+    def reuse_worktree(self, worktreepath):
+        """Reuse an existing working tree of the repository.
+
+        Any change or untracked file left in the working tree by
+        previous executions is discarded, while the checked out files
+        are kept, thus the next checkout rewrites only the files that differ.
+
+        :param worktreepath: the path of the working tree
+        """
+        self.worktreepath = worktreepath
+
+        cmd_reset = ['git', 'reset', '-q', '--hard']
+        cmd_clean = ['git', 'clean', '-q', '-ffdx']
+        try:
+            self._exec(cmd_reset, cwd=self.worktreepath, env=self.gitenv)
+            self._exec(cmd_clean, cwd=self.worktreepath, env=self.gitenv)
+            logger.info("Git worktree %s reused!" % self.worktreepath)
+        except Exception:
+            cause = "Impossible to reuse the worktree %s" % (self.worktreepath)
+            raise RepositoryError(cause=cause)
+
+    def lock(self):
+        """Lock the working tree, thus it is not pruned when its directory is missing"""
+
+        if self.is_locked(self.worktreepath):
+            return
+
+        cmd_lock = ['git', 'worktree', 'lock', '--reason', 'graal', self.worktreepath]
+        try:
+            self._exec(cmd_lock, cwd=self.dirpath, env=self.gitenv)
+            logger.debug("Git worktree %s locked!" % self.worktreepath)
+        except Exception:
+            cause = "Impossible to lock the worktree %s" % (self.worktreepath)
+            raise RepositoryError(cause=cause)
+
+    def unlock(self):
+        """Unlock the working tree. Nothing is done if it is not locked"""
+
+        cmd_unlock = ['git', 'worktree', 'unlock', self.worktreepath]
+        try:
+            self._exec(cmd_unlock, cwd=self.dirpath, env=self.gitenv)
+            logger.debug("Git worktree %s unlocked!" % self.worktreepath)
+        except Exception:
+            pass
+
     def prune(self):
         """Delete a working tree from disk
 
         :param worktreepath: directory where the working tree is located
         """
+        self.unlock()
         GraalRepository.delete(self.worktreepath)
         cmd_worktree = ['git', 'worktree', 'prune']
         try:
@@ -312,11 +1345,12 @@ class GraalRepository(GitRepository):
             raise RepositoryError(cause=cause)
 
     def checkout(self, hash):
-        """Checkout a Git repository at a given commit
+        """Checkout a Git repository at a given commit. Only the
+        files that differ from the current checkout are rewritten.
 
         :param hash: the hash of a commit
         """
-        cmd_checkout = ['git', 'checkout', hash]
+        cmd_checkout = ['git', 'checkout', '-q', '-f', hash]
         try:
             self._exec(cmd_checkout, cwd=self.worktreepath, env=self.gitenv)
             logger.info("Git repository %s checked out!" % self.dirpath)
@@ -324,6 +1358,219 @@ class GraalRepository(GitRepository):
             cause = "Impossible to checkout the worktree %s at %s" % (self.worktreepath, hash)
             raise RepositoryError(cause=cause)
 
+    def tree_size(self, hash='HEAD'):
+        """Estimate the space taken by a checkout of the commit `hash`
+        using the git ls-tree command. The size of each file is rounded up
+        to the size of a page, as done by tmpfs.
+
+        :param hash: the hash of a commit or a reference
+
+        :returns: a tuple with the estimated bytes and the number of files
+        """
+        try:
+            entries = self._ls_tree(hash)
+        except Exception:
+            cause = "Impossible to estimate the size of %s at %s" % (self.dirpath, hash)
+            raise RepositoryError(cause=cause)
+
+        total = 0
+        nfiles = 0
+        for _, _, _, size, _ in entries:
+            if size is None:
+                continue
+
+            pages = (size + self.PAGE_SIZE - 1) // self.PAGE_SIZE
+            total += max(pages, 1) * self.PAGE_SIZE
+            nfiles += 1
+
+        return total, nfiles
+
+    def changed_files(self, from_hash, to_hash):
+        """List the files which differ between two commits using
+        the git diff-tree command. Renamed files are listed with
+        both their old and new paths.
+
+        :param from_hash: the hash of the first commit
+        :param to_hash: the hash of the second commit
+
+        :returns: a set of paths, relative to the repository
+        """
+        try:
+            changes = self._diff_tree(from_hash, to_hash)
+        except Exception:
+            cause = "Impossible to compare %s and %s in %s" % (from_hash, to_hash, self.dirpath)
+            raise RepositoryError(cause=cause)
+
+        return {path for _, _, path in changes}
+
+    def file_sizes(self, hash='HEAD'):
+        """List the files of the commit `hash` with their size
+        using the git ls-tree command. Submodules are not listed.
+
+        :param hash: the hash of a commit or a reference
+
+        :returns: a dict with the size in bytes of each file, keyed by
+            its path relative to the repository
+        """
+        try:
+            entries = self._ls_tree(hash)
+        except Exception:
+            cause = "Impossible to list the files of %s at %s" % (self.dirpath, hash)
+            raise RepositoryError(cause=cause)
+
+        return {path: size for _, _, _, size, path in entries if size is not None}
+
+    def file_blobs(self, hash='HEAD'):
+        """List the files of the commit `hash` with the blobs they
+        point to using the git ls-tree command. Submodules are not listed.
+
+        :param hash: the hash of a commit or a reference
+
+        :returns: a dict with the hash of the blob of each file, keyed by
+            its path relative to the repository
+        """
+        try:
+            entries = self._ls_tree(hash)
+        except Exception:
+            cause = "Impossible to list the files of %s at %s" % (self.dirpath, hash)
+            raise RepositoryError(cause=cause)
+
+        return {path: obj for _, kind, obj, _, path in entries if kind == 'blob'}
+
+    def changed_blobs(self, from_hash, to_hash):
+        """List the files which differ between two commits, with the
+        blobs they point to in `to_hash`, using the git diff-tree command.
+        Renamed files are listed with both their old and new paths.
+
+        :param from_hash: the hash of the first commit
+        :param to_hash: the hash of the second commit
+
+        :returns: a dict with the hash of the blob of each file, keyed by
+            its path; the files deleted or turned into submodules are None
+        """
+        try:
+            changes = self._diff_tree(from_hash, to_hash)
+        except Exception:
+            cause = "Impossible to compare %s and %s in %s" % (from_hash, to_hash, self.dirpath)
+            raise RepositoryError(cause=cause)
+
+        return {path: None if mode in self.NO_BLOB_MODES else blob for mode, blob, path in changes}
+
+    def blob_sizes(self, blobs):
+        """Get the size of a list of blobs using the git cat-file command
+
+        :param blobs: the hashes of the blobs
+
+        :returns: a dict with the size in bytes of each blob, keyed by hash
+        """
+        if not blobs:
+            return {}
+
+        cmd_cat_file = ['git', 'cat-file', '--batch-check=%(objectname) %(objectsize)']
+        request = ''.join(blob + '\n' for blob in blobs).encode('ascii')
+
+        try:
+            proc = subprocess.Popen(cmd_cat_file, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, cwd=self.dirpath, env=self.gitenv)
+            outs, _ = proc.communicate(request)
+        except OSError:
+            proc = None
+
+        if proc is None or proc.returncode != 0:
+            cause = "Impossible to get the size of the blobs of %s" % self.dirpath
+            raise RepositoryError(cause=cause)
+
+        sizes = {}
+        for line in outs.decode('ascii').splitlines():
+            blob, size = line.split()
+            if size.isdigit():
+                sizes[blob] = int(size)
+
+        return sizes
+
+    def _ls_tree(self, hash):
+        """List the entries of the tree of the commit `hash`, recursively,
+        using the git ls-tree command.
+
+        :param hash: the hash of a commit or a reference
+
+        :returns: a list of tuples with the mode, the type, the hash and
+            the size of each entry, and its path relative to the repository;
+            the size of the submodules is None
+        """
+        cmd_ls_tree = ['git', 'ls-tree', '-r', '-l', '-z', hash]
+        outs = self._exec(cmd_ls_tree, cwd=self.dirpath, env=self.gitenv)
+
+        entries = []
+        for entry in outs.split(b'\0'):
+            if not entry:
+                continue
+
+            info, path = entry.split(b'\t', 1)
+            mode, kind, obj, size = info.decode('ascii').split()
+            size = int(size) if size.isdigit() else None
+            entries.append((mode, kind, obj, size, os.fsdecode(path)))
+
+        return entries
+
+    def _diff_tree(self, from_hash, to_hash):
+        """List the entries which differ between the trees of two commits,
+        recursively, using the git diff-tree command. Renamed entries are
+        listed with both their old and new paths.
+
+        :param from_hash: the hash of the first commit
+        :param to_hash: the hash of the second commit
+
+        :returns: a list of tuples with the mode and the hash of each
+            entry in `to_hash`, and its path relative to the repository
+        """
+        cmd_diff_tree = ['git', 'diff-tree', '-r', '-z', '--no-renames', '--raw', from_hash, to_hash]
+        outs = self._exec(cmd_diff_tree, cwd=self.dirpath, env=self.gitenv)
+
+        # each change is made of a line of info (i.e., modes, hashes
+        # and status) followed by the path, separated by NUL
+        fields = outs.split(b'\0')
+        changes = []
+        for info, path in zip(fields[0::2], fields[1::2]):
+            _, mode, _, obj, _ = info.decode('ascii').split()
+            changes.append((mode, obj, os.fsdecode(path)))
+
+        return changes
+
+    def count_commits(self, from_date=None, to_date=None, branches=None):
+        """Count the commits of the log using the git rev-list command.
+        The commits are selected as done by `log`.
+
+        :param from_date: count commits newer than a specific date (inclusive)
+        :param to_date: count commits older than a specific date
+        :param branches: names of branches to count from, all of them when None
+
+        :returns: the number of commits
+        """
+        if branches is not None and len(branches) == 0:
+            return 0
+
+        cmd_rev_list = ['git', 'rev-list', '--count']
+
+        if from_date:
+            cmd_rev_list.append('--since=' + from_date.strftime("%Y-%m-%d %H:%M:%S %z"))
+
+        if to_date:
+            cmd_rev_list.append('--until=' + to_date.strftime("%Y-%m-%d %H:%M:%S %z"))
+
+        if branches is None:
+            cmd_rev_list.extend(['--branches', '--tags', '--remotes=origin'])
+        else:
+            cmd_rev_list.extend(['refs/heads/' + branch for branch in branches])
+
+        try:
+            outs = self._exec(cmd_rev_list, cwd=self.dirpath, env=self.gitenv)
+        except Exception:
+            cause = "Impossible to count the commits of %s" % self.dirpath
+            raise RepositoryError(cause=cause)
+
+        return int(outs.strip() or 0)
+
     def archive(self, hash):
         """Create an archive using the git archive command
 
@@ -401,6 +1648,23 @@ class GraalRepository(GitRepository):
         tar_obj.extractall(path=dest)
         logger.info("Tar object untarred at %s" % dest)
 
+    @staticmethod
+    def __worktree_gitdir(worktreepath):
+        """Get the administrative directory of a working tree within the mirror"""
+
+        gitfile = os.path.join(worktreepath, '.git') if worktreepath else None
+        if not gitfile or not os.path.isfile(gitfile):
+            return None
+
+        with open(gitfile, 'r') as f:
+            content = f.read().strip()
+
+        if not content.startswith('gitdir:'):
+            return None
+
+        gitdir = content.replace('gitdir:', '', 1).strip()
+        return os.path.realpath(os.path.join(worktreepath, gitdir))
+
     @staticmethod
     def extension(file_path):
         """Get the extension of a file"""
@@ -417,8 +1681,10 @@ class GraalRepository(GitRepository):
         if not dir_path or not os.path.exists(dir_path):
             return []
 
-        everything = glob(dir_path + '/**/*', recursive=True)
-        onlyfiles = [f for f in everything if os.path.isfile(f)]
+        with stage(STAGE_FILES):
+            everything = glob(dir_path + '/**/*', recursive=True)
+            onlyfiles = [f for f in everything if os.path.isfile(f)]
+
         return onlyfiles
 
     @staticmethod
@@ -450,6 +1716,54 @@ class GraalCommand(GitCommand):
         git_path = self.parsed_args.git_path
         setattr(self.parsed_args, 'gitpath', git_path)
 
+        max_file_size = getattr(self.parsed_args, 'max_file_size', None)
+        if max_file_size:
+            setattr(self.parsed_args, 'max_file_size', dict(max_file_size))
+
+    def run(self):
+        """Fetch and write items. Meanwhile, the metrics of the process
+        are served at `--metrics-port` and written to `--metrics-textfile`,
+        when set. With `--plan`, the estimate of the cost of the run is
+        written instead."""
+
+        if getattr(self.parsed_args, 'plan', False):
+            self._plan()
+            return
+
+        exporters = []
+
+        port = getattr(self.parsed_args, 'metrics_port', None)
+        if port is not None:
+            exporters.append(MetricsServer(REGISTRY, port=port))
+
+        textfile = getattr(self.parsed_args, 'metrics_textfile', None)
+        if textfile:
+            exporters.append(MetricsTextfile(REGISTRY, textfile,
+                                             interval=self.parsed_args.metrics_interval))
+
+        for exporter in exporters:
+            exporter.start()
+
+        try:
+            super().run()
+        finally:
+            for exporter in exporters:
+                exporter.stop()
+
+    def _plan(self):
+        """Write the estimate of the cost of the run, in JSON"""
+
+        backend_args = vars(self.parsed_args)
+        init_args = find_signature_parameters(self.BACKEND.__init__, backend_args)
+        init_args['archive'] = None
+
+        backend = self.BACKEND(**init_args)
+        plan_args = find_signature_parameters(backend.plan, backend_args)
+        estimate = backend.plan(**plan_args)
+
+        self.outfile.write(json.dumps(estimate, indent=4, sort_keys=True))
+        self.outfile.write('\n')
+
     @staticmethod
     def setup_cmd_parser():
         """Returns the Graal argument parser."""
@@ -467,6 +1781,53 @@ class GraalCommand(GitCommand):
         group.add_argument('--worktree-path', dest='worktreepath',
                            default=DEFAULT_WORKTREE_PATH,
                            help="Path where to save the working tree")
+        group.add_argument('--recycle-worktree', dest='recycle_worktree',
+                           action='store_true', default=False,
+                           help="Keep the working tree and reuse it in the next executions")
+        group.add_argument('--tmpfs-path', dest='tmpfs_path',
+                           default=None,
+                           help="Memory-backed path (e.g., /dev/shm/worktrees) where to save "
+                                "the working tree, when it fits")
+        group.add_argument('--pipeline', dest='pipeline',
+                           action='store_true', default=False,
+                           help="Check out the next commit while analyzing the current one")
+        group.add_argument('--file-timeout', dest='file_timeout',
+                           type=float, default=None,
+                           help="Max seconds spent by an analyzer on a file")
+        group.add_argument('--commit-timeout', dest='commit_timeout',
+                           type=float, default=None,
+                           help="Max seconds spent analyzing a commit")
+        group.add_argument('--max-file-size', dest='max_file_size',
+                           nargs='+', type=size_limit, default=None,
+                           help="Max size in bytes of the files analyzed, for all the analyzers "
+                                "(e.g., 1000000) or for a given one (e.g., lizard=500000)")
+        group.add_argument('--perf', dest='perf',
+                           action='store_true', default=False,
+                           help="Add the time spent in each stage to the metadata of the items")
+        group.add_argument('--memory', dest='memory',
+                           action='store_true', default=False,
+                           help="Add the memory used by each commit to the metadata of its last item")
+        group.add_argument('--memory-limit', dest='memory_limit',
+                           type=int, default=None,
+                           help="Warn when a commit uses more bytes of Python memory than this limit")
+        group.add_argument('--memory-spill', dest='memory_spill',
+                           action='store_true', default=False,
+                           help="Release the memory held across commits when a commit exceeds the limit "
+                                "(only by the backends which hold any, e.g. CoCom)")
+        group.add_argument('--progress', dest='progress',
+                           action='store_true', default=False,
+                           help="Log the progress of the analysis periodically")
+        group.add_argument('--progress-interval', dest='progress_interval',
+                           type=float, default=DEFAULT_PROGRESS_INTERVAL,
+                           help="Seconds between two reports of the progress")
+        group.add_argument('--status-file', dest='status_file',
+                           default=None,
+                           help="JSON file where the progress of the analysis is written")
+        group.add_argument('--plan', dest='plan',
+                           action='store_true', default=False,
+                           help="Estimate the cost of the run from the metadata of the "
+                                "repository, without analyzing the commits (the mirror "
+                                "is cloned or updated first)")
         group.add_argument('--in-paths', dest='in_paths',
                            nargs='+', type=str, default=None,
                            help="Target paths of the analysis")
@@ -475,11 +1836,24 @@ class GraalCommand(GitCommand):
                            help="Paths to be excluded from the analysis")
         group.add_argument('--entrypoint', dest='entrypoint',
                            type=str, default=None,
-                           help="Entrypoint of the analysis")
+                           action=EntrypointAction,
+                           help="Entrypoint of the analysis, repeat it to analyze several entrypoints")
         group.add_argument('--details', dest='details',
                            action='store_true', default=False,
                            help="include details")
 
+        group = parser.parser.add_argument_group('Metrics arguments')
+        group.add_argument('--metrics-port', dest='metrics_port',
+                           type=int, default=None,
+                           help="Local port where to serve the metrics in Prometheus format")
+        group.add_argument('--metrics-textfile', dest='metrics_textfile',
+                           default=None,
+                           help="File where to write the metrics in Prometheus format "
+                                "(e.g., for the textfile collector of node-exporter)")
+        group.add_argument('--metrics-interval', dest='metrics_interval',
+                           type=float, default=MetricsTextfile.DEFAULT_INTERVAL,
+                           help="Seconds between two writes of the metrics file")
+
         # Required arguments
         parser.parser.add_argument('uri',
                                    help="URI of the Git log repository")
@@ -489,6 +1863,43 @@ class GraalCommand(GitCommand):
         return parser
 
 
+class EntrypointAction(argparse.Action):
+    """Store the entrypoints of the command line, given by repeating
+    the option. A single entrypoint is stored as a string, as done by
+    previous versions of Graal, several ones as a list."""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        current = getattr(namespace, self.dest, None)
+
+        if current is None:
+            entrypoints = values
+        elif isinstance(current, list):
+            entrypoints = current + [values]
+        else:
+            entrypoints = [current, values]
+
+        setattr(namespace, self.dest, entrypoints)
+
+
+def size_limit(value):
+    """Parse a size limit of the command line, expressed as `<bytes>`
+    or `<analyzer>=<bytes>`.
+
+    :param value: the limit to parse
+
+    :returns: a tuple with the name of the analyzer (`*` for all of them)
+        and the limit
+    """
+    analyzer, _, size = value.rpartition('=')
+
+    try:
+        size = int(size)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid size limit: %s" % value)
+
+    return analyzer or ALL_ANALYZERS, size
+
+
 def fetch(backend_class, backend_args, category):
     """Fetch items using the given backend.
 
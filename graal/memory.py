@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import resource
+import sys
+import threading
+import tracemalloc
+
+# Bytes in a unit of `ru_maxrss`, which is given in kilobytes on Linux
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+# Whether the peak of the traced memory can be reset, since Python 3.9
+_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+# Tracker where the peak memory of the child processes is recorded
+_active = None
+
+
+class MemoryTracker:
+    """Memory used to analyze each commit.
+
+    Python allocations are traced with `tracemalloc` while the tracker
+    is running. For each commit (i.e., between `begin_commit` and
+    `end_commit`), the peak and the current size of the traced memory
+    are reported, together with the `top` source lines which hold the
+    most memory at the end of the commit (e.g., the Perceval commit
+    items, the functions parsed by Lizard or the graphs of Reverse).
+
+    The external tools do not show up in the traces, thus the analyzers
+    record the peak resident set size of each tool they run (see
+    `record_child`); the largest one of each analyzer is reported with
+    the commit, while `children_max_rss` is the largest one among all
+    the children waited by the process so far.
+
+    Before Python 3.9 the peak of the traced memory cannot be reset, thus
+    the peak of a commit is exact only when it exceeds the peaks of the
+    commits before it; otherwise, the largest of the sizes traced at the
+    beginning and at the end of the commit is reported.
+
+    :param top: number of allocation sites reported
+    """
+    TOP = 10
+
+    def __init__(self, top=TOP):
+        self.top = top
+        self._children = {}
+        self._started = False
+        self._previous = None
+        self._begin = (0, 0)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start tracing the allocations"""
+
+        global _active
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+        self._previous = _active
+        _active = self
+
+    def stop(self):
+        """Stop tracing the allocations, if started by this tracker"""
+
+        global _active
+
+        _active = self._previous
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def begin_commit(self):
+        """Start measuring the memory used by a commit"""
+
+        if _RESET_PEAK:
+            tracemalloc.reset_peak()
+        self._begin = tracemalloc.get_traced_memory()
+
+        with self._lock:
+            self._children = {}
+
+    def end_commit(self):
+        """Return the memory used by the commit since `begin_commit`
+
+        :returns: a dict with the `peak` and `current` bytes traced, the
+            `top` allocation sites and the peak RSS, in bytes, of the
+            children of each analyzer
+        """
+        current, peak = tracemalloc.get_traced_memory()
+
+        begin_current, begin_peak = self._begin
+        if not _RESET_PEAK and peak <= begin_peak:
+            peak = max(begin_current, current)
+
+        snapshot = tracemalloc.take_snapshot()
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+        top = []
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            frame = stat.traceback[0]
+            top.append({
+                'site': '%s:%s' % (frame.filename, frame.lineno),
+                'size': stat.size,
+                'count': stat.count
+            })
+
+        with self._lock:
+            children = dict(sorted(self._children.items()))
+
+        return {
+            'peak': peak,
+            'current': current,
+            'top': top,
+            'children': children,
+            'children_max_rss': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * RSS_UNIT
+        }
+
+    def record_child(self, analyzer, max_rss):
+        """Record the peak RSS of a child process
+
+        :param analyzer: name of the analyzer which ran the process
+        :param max_rss: peak RSS of the process, as given by `wait4`
+        """
+        max_rss *= RSS_UNIT
+        with self._lock:
+            self._children[analyzer] = max(self._children.get(analyzer, 0), max_rss)
+
+
+def record_child(analyzer, max_rss):
+    """Record the peak RSS of a child process in the active
+    tracker, if any (see `MemoryTracker.record_child`)"""
+
+    tracker = _active
+    if tracker is not None:
+        tracker.record_child(analyzer, max_rss)
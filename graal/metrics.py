@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import logging
+import math
+import os
+import socketserver
+import tempfile
+import threading
+
+EXPOSITION_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger(__name__)
+
+
+class Registry:
+    """Set of metrics, rendered in the Prometheus text exposition format.
+
+    Metrics are created once, with `counter`, `gauge` and `histogram`,
+    and updated by the code which runs the analysis. Updates only take
+    a lock and change a number, thus they are cheap enough to be always
+    done; the metrics are exported only when requested (see
+    `MetricsServer` and `MetricsTextfile`).
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labels=()):
+        """Return the counter `name`, created if it does not exist"""
+
+        return self.__register(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        """Return the gauge `name`, created if it does not exist"""
+
+        return self.__register(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        """Return the histogram `name`, created if it does not exist"""
+
+        return self.__register(Histogram, name, documentation, labels, buckets=buckets)
+
+    def exposition(self):
+        """Return the metrics in the Prometheus text exposition format"""
+
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+
+        lines = []
+        for metric in metrics:
+            lines.append('# HELP %s %s' % (metric.name, _escape(metric.documentation, quote=False)))
+            lines.append('# TYPE %s %s' % (metric.name, metric.TYPE))
+            for suffix, labels, value in metric.samples():
+                lines.append('%s%s%s %s' % (metric.name, suffix, _format_labels(labels), _format_value(value)))
+
+        return '\n'.join(lines) + '\n'
+
+    def __register(self, klass, name, documentation, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name, None)
+            if metric is None:
+                metric = klass(name, documentation, labels, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, klass) or metric.labelnames != tuple(labels):
+                raise ValueError("metric %s already registered with a different type or labels" % name)
+
+        return metric
+
+
+class _Metric:
+    """Metric with a value for each combination of its labels.
+    Metrics without labels are updated directly."""
+
+    TYPE = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Return the child of the metric for the given label values"""
+
+        if len(values) != len(self.labelnames):
+            raise ValueError("%s expects the labels %s" % (self.name, list(self.labelnames)))
+
+        values = tuple(str(value) for value in values)
+        with self._lock:
+            child = self._children.get(values, None)
+            if child is None:
+                child = self._new_child()
+                self._children[values] = child
+
+        return child
+
+    def samples(self):
+        """Return the samples of the metric as tuples of
+        (suffix of the name, labels, value)"""
+
+        with self._lock:
+            children = sorted(self._children.items())
+
+        samples = []
+        for values, child in children:
+            labels = list(zip(self.labelnames, values))
+            samples.extend((suffix, labels + extra, value) for suffix, extra, value in child.samples())
+
+        return samples
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def __getattr__(self, name):
+        # metrics without labels forward the updates to their only child
+        if name.startswith('_') or self.labelnames:
+            raise AttributeError(name)
+
+        return getattr(self.labels(), name)
+
+
+class Counter(_Metric):
+    """Value which only goes up (e.g., number of commits analyzed)"""
+
+    TYPE = 'counter'
+
+    def _new_child(self):
+        return _CounterValue()
+
+
+class Gauge(_Metric):
+    """Value which goes up and down (e.g., depth of a queue)"""
+
+    TYPE = 'gauge'
+
+    def _new_child(self):
+        return _GaugeValue()
+
+
+class Histogram(_Metric):
+    """Distribution of observations (e.g., time spent by an analyzer),
+    counted in cumulative buckets with their sum and count"""
+
+    TYPE = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+
+class _CounterValue:
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("counters can only be increased")
+
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        return [('', [], self.value)]
+
+
+class _GaugeValue(_CounterValue):
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class _HistogramValue:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def samples(self):
+        with self._lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+
+        samples = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            samples.append(('_bucket', [('le', _format_value(float(bound)))], cumulative))
+        samples.append(('_bucket', [('le', '+Inf')], count))
+        samples.append(('_sum', [], total))
+        samples.append(('_count', [], count))
+
+        return samples
+
+
+class MetricsServer:
+    """Local HTTP endpoint which serves the metrics of a registry at
+    `/metrics`, to be scraped by Prometheus. The server runs on
+    a daemon thread; `port` 0 picks a free port, available in `port`
+    once started.
+
+    :param registry: the `Registry` to serve
+    :param port: port where to listen
+    :param host: address where to listen, only the local one by default
+    """
+    def __init__(self, registry, port=0, host='127.0.0.1'):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start serving the metrics"""
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+
+                body = registry.exposition().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', EXPOSITION_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("Metrics request: " + format, *args)
+
+        self._server = _ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+        logger.info("Metrics served at http://%s:%s/metrics", self.host, self.port)
+
+    def stop(self):
+        """Stop serving the metrics"""
+
+        if not self._server:
+            return
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+
+
+class MetricsTextfile:
+    """File where the metrics of a registry are written every `interval`
+    seconds, to be read by the textfile collector of node-exporter. The
+    file is replaced atomically, thus it is never read half-written, and
+    it is written a last time when stopped.
+
+    :param registry: the `Registry` to write
+    :param path: path of the file (e.g., `graal.prom`)
+    :param interval: seconds between two writes
+    """
+    DEFAULT_INTERVAL = 15
+
+    def __init__(self, registry, path, interval=DEFAULT_INTERVAL):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start writing the metrics"""
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+        self._thread.start()
+
+        logger.info("Metrics written to %s every %ss", self.path, self.interval)
+
+    def stop(self):
+        """Stop writing the metrics, after writing them a last time"""
+
+        if not self._thread:
+            return
+
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        self.write()
+
+    def write(self):
+        """Write the metrics to the file"""
+
+        dirpath = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=dirpath, prefix='.graal-metrics-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.registry.exposition())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+    def __run(self):
+        while not self._stopped.is_set():
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning("Metrics not written to %s, %s", self.path, e)
+
+            self._stopped.wait(self.interval)
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def _escape(value, quote=True):
+    value = value.replace('\\', '\\\\').replace('\n', '\\n')
+    return value.replace('"', '\\"') if quote else value
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in labels)
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if value.is_integer():
+            return '%.1f' % value
+
+        return repr(value)
+
+    return str(value)
+
+
+# Metrics of Graal. Rates (e.g., commits and files per second) are
+# computed by Prometheus from the counters (e.g., `rate(graal_commits_total[5m])`),
+# and the utilization of the workers is given by the rate of
+# `graal_worker_busy_seconds_total` divided by `graal_workers`.
+REGISTRY = Registry()
+
+COMMITS = REGISTRY.counter('graal_commits_total',
+                           "Commits analyzed", ['backend'])
+ITEMS = REGISTRY.counter('graal_items_total',
+                         "Items produced", ['backend'])
+LAST_COMMIT = REGISTRY.gauge('graal_last_commit_timestamp_seconds',
+                             "Time when the last commit was analyzed", ['backend'])
+FILES = REGISTRY.counter('graal_files_total',
+                         "Files analyzed, including the ones whose results are reused", ['backend'])
+CACHE_LOOKUPS = REGISTRY.counter('graal_cache_lookups_total',
+                                 "Lookups of the results of the files in the previous commit analyzed",
+                                 ['backend', 'result'])
+ANALYZER_DURATION = REGISTRY.histogram('graal_analyzer_duration_seconds',
+                                       "Time spent by an analyzer on a target", ['analyzer'])
+QUEUE_DEPTH = REGISTRY.gauge('graal_queue_depth',
+                             "Items waiting in the queues of the snapshot pipeline: commits parsed, "
+                             "snapshots checked out and free working trees", ['queue'])
+WORKERS = REGISTRY.gauge('graal_workers',
+                         "Threads which analyze the files of a commit", ['backend'])
+WORKER_BUSY = REGISTRY.counter('graal_worker_busy_seconds_total',
+                               "Time spent by the workers analyzing files", ['backend'])
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+from contextlib import contextmanager
+import threading
+import time
+
+STAGE_LOG = 'log'
+STAGE_CHECKOUT = 'checkout'
+STAGE_FILES = 'files'
+STAGE_ANALYZE = 'analyze'
+STAGE_POST = 'post'
+
+# Timings where the stages run by each thread are recorded,
+# when instrumentation is on
+_local = threading.local()
+
+
+def cpu_clock():
+    """Return the clock of the CPU time of the current thread. Before
+    Python 3.7 there is no such clock, thus the CPU time of the whole
+    process is used instead."""
+
+    return getattr(time, 'thread_time', time.process_time)
+
+
+_cpu_time = cpu_clock()
+
+
+class Timings:
+    """Wall and CPU time spent in the stages of an analysis.
+
+    For each stage (e.g., `checkout`, `cloc`), the number of calls and
+    the seconds of wall and CPU time are summed. CPU time is the one of
+    the thread which runs the stage, plus the one of the external tools
+    it launched, thus stages running on several threads are accounted
+    correctly (on Python 3.7 or later, see `cpu_clock`). Stages can be nested (e.g., `analyze` includes the time
+    spent by the analyzers), thus their times do not add up to the total.
+    """
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, wall, cpu, calls=1):
+        """Add the time spent in a stage
+
+        :param name: name of the stage
+        :param wall: seconds of wall time
+        :param cpu: seconds of CPU time
+        :param calls: number of calls
+        """
+        with self._lock:
+            stage = self.stages.setdefault(name, [0, 0.0, 0.0])
+            stage[0] += calls
+            stage[1] += wall
+            stage[2] += cpu
+
+    def merge(self, other):
+        """Add the stages of another `Timings` object"""
+
+        for name, (calls, wall, cpu) in other.stages.items():
+            self.add(name, wall, cpu, calls=calls)
+
+    @contextmanager
+    def stage(self, name):
+        """Record the time spent in the block as a stage. The object
+        returned has an attribute `cpu`, where the CPU time of
+        external tools can be added."""
+
+        timer = _Timer()
+        wall = time.perf_counter()
+        cpu = _cpu_time()
+        try:
+            yield timer
+        finally:
+            self.add(name, time.perf_counter() - wall, _cpu_time() - cpu + timer.cpu)
+
+    def to_dict(self):
+        """Return the stages as a dict of dicts with `calls`, `wall` and `cpu`"""
+
+        with self._lock:
+            return {name: {'calls': calls, 'wall': wall, 'cpu': cpu}
+                    for name, (calls, wall, cpu) in sorted(self.stages.items())}
+
+
+class _Timer:
+    def __init__(self):
+        self.cpu = 0.0
+
+
+def active():
+    """Return the timings active on the current thread, if any"""
+
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def activate(timings):
+    """Record the stages run within the block, on the current thread,
+    in `timings`. Nothing is recorded when `timings` is None. The stages
+    run on other threads are recorded in the timings active on them,
+    thus the tasks dispatched to them are wrapped with `propagate`."""
+
+    previous = active()
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+def propagate(func):
+    """Wrap `func` to run with the timings active on the current thread,
+    thus the stages it runs on another thread (e.g., a worker of a pool)
+    are recorded with the ones of the caller"""
+
+    timings = active()
+
+    def run(*args, **kwargs):
+        with activate(timings):
+            return func(*args, **kwargs)
+
+    return run
+
+
+@contextmanager
+def stage(name):
+    """Record the time spent in the block as a stage of the timings
+    active on the current thread, if any (see `Timings.stage`)"""
+
+    with record(active(), name) as timer:
+        yield timer
+
+
+@contextmanager
+def record(timings, name):
+    """Record the time spent in the block as a stage of `timings`.
+    Nothing is recorded, nor timed, when `timings` is None."""
+
+    if timings is None:
+        yield _Timer()
+        return
+
+    with timings.stage(name) as timer:
+        yield timer
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import heapq
+
+
+class Plan:
+    """Estimate of the cost of analyzing the commits of a repository.
+
+    The estimate is built commit by commit, from the files each commit
+    targets, with their sizes, and the files changed since the previous
+    commit analyzed. A commit analyzes all its files, unless the results
+    of the files not changed are reused (`incremental`); in that case,
+    each file looked up in the results of the previous commit is either
+    a cache hit, when reused, or a miss, when analyzed again.
+
+    When a `cost_model` is given, the seconds spent analyzing each file
+    are predicted from the costs recorded by past runs, and the wall time
+    of each commit is the makespan of its files dispatched longest-first
+    to `workers` workers, as done by CoCom. The wall time is also estimated
+    for the pools of `WORKERS` workers, to ease sizing the one to use.
+
+    :param cost_model: `CostModel` which predicts the seconds spent
+        analyzing each file; the time is not estimated when None
+    :param workers: number of workers analyzing the files of a commit
+    :param incremental: whether the results of the files not changed are reused
+    """
+    WORKERS = [1, 2, 4, 8, 16]
+
+    def __init__(self, cost_model=None, workers=1, incremental=False):
+        self.cost_model = cost_model
+        self.workers = workers
+        self.incremental = incremental
+
+        self.commits = 0
+        self.skipped = 0
+        self.files = 0
+        self.changed = 0
+        self.recorded = 0
+        self.seconds = 0.0
+        self.changed_seconds = 0.0
+        self.wall = {n: 0.0 for n in sorted(set(self.WORKERS + [workers]))}
+
+    def add_commit(self, files, changed=None):
+        """Add a commit to the estimate
+
+        :param files: list of tuples with the path and the size
+            of the files targeted by the commit
+        :param changed: paths changed since the previous commit
+            analyzed, None when all the files are analyzed
+        """
+        targets = files if changed is None else [f for f in files if f[0] in changed]
+
+        self.commits += 1
+        self.files += len(files)
+        self.changed += len(targets)
+
+        if self.cost_model is None:
+            return
+
+        costs = {path: self.cost_model.predict(path, size) for path, size in files}
+        self.recorded += sum(1 for path in costs if path in self.cost_model.files)
+        self.seconds += sum(costs.values())
+
+        target_costs = [costs[path] for path, _ in targets]
+        self.changed_seconds += sum(target_costs)
+
+        run = target_costs if self.incremental else list(costs.values())
+        for n in self.wall:
+            self.wall[n] += makespan(run, n)
+
+    def skip_commit(self):
+        """Add a commit which is not analyzed to the estimate"""
+
+        self.skipped += 1
+
+    def to_dict(self):
+        """Return the estimate as a dict.
+
+        The file analyses are reported with (`incremental`) and without
+        (`full`) reusing the results of the files not changed, while the
+        cache hits and misses are the ones of the run as configured. The
+        seconds, the wall time of each pool of workers and the
+        `estimated_wall` time of the run are None without a cost model.
+        """
+        lookups = self.files if self.incremental else 0
+
+        estimate = {
+            'commits': self.commits + self.skipped,
+            'analyzed_commits': self.commits,
+            'skipped_commits': self.skipped,
+            'incremental': self.incremental,
+            'workers': self.workers,
+            'analyses': {
+                'full': self.files,
+                'incremental': self.changed
+            },
+            'cache': {
+                'hits': lookups - self.changed if lookups else 0,
+                'misses': self.changed if lookups else 0
+            },
+            'recorded_analyses': self.recorded,
+            'seconds': None,
+            'wall': None,
+            'estimated_wall': None
+        }
+
+        if self.cost_model is not None:
+            estimate['seconds'] = {
+                'full': self.seconds,
+                'incremental': self.changed_seconds
+            }
+            estimate['wall'] = dict(self.wall)
+            estimate['estimated_wall'] = self.wall[self.workers]
+
+        return estimate
+
+
+def makespan(costs, workers):
+    """Return the time needed to run tasks on a pool of workers, when
+    dispatched from the longest to the shortest one to the first worker
+    available (Longest Processing Time first rule)
+
+    :param costs: seconds needed by each task
+    :param workers: number of workers
+
+    :returns: the seconds until the last task is over
+    """
+    if not costs:
+        return 0.0
+
+    if workers <= 1:
+        return sum(costs)
+
+    loads = [0.0] * min(workers, len(costs))
+    for cost in sorted(costs, reverse=True):
+        heapq.heappush(loads, heapq.heappop(loads) + cost)
+
+    return max(loads)
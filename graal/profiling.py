@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import cProfile
+import heapq
+import io
+import itertools
+import pstats
+import threading
+
+DEFAULT_PROFILE_PATH = 'graal.pstats'
+
+# Profiler where the commits and the runs of the analyzers are recorded
+_active = None
+
+
+class Profiler:
+    """Profile of an execution of Graal.
+
+    While the profiler is running, the Python code of the calling thread
+    is profiled with cProfile; the statistics are saved to `path` when it
+    is stopped, and can be loaded with `pstats`. Code running on other
+    threads (e.g., the workers of CoCom) is not profiled, but the time
+    spent by the analyzers and by each commit is recorded on any thread.
+
+    For each analyzer, the number of runs, their wall time and the CPU
+    time of the external tools (e.g., cloc, bandit, pylint, pyreverse)
+    are summed. The slowest commits and the slowest targets of the
+    analyzers (i.e., files or folders) are kept, up to `top` of them.
+
+    :param path: path of the file where the statistics are saved
+    :param top: number of functions, commits and targets reported
+    """
+    TOP = 20
+
+    def __init__(self, path=DEFAULT_PROFILE_PATH, top=TOP):
+        self.path = path
+        self.top = top
+        self.analyzers = {}
+        self.commits = []
+        self.targets = []
+
+        self._profile = cProfile.Profile()
+        self._counter = itertools.count()
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Start profiling"""
+
+        global _active
+
+        self._previous = _active
+        _active = self
+        self._profile.enable()
+
+    def stop(self):
+        """Stop profiling and save the statistics to `path`"""
+
+        global _active
+
+        self._profile.disable()
+        _active = self._previous
+        self._profile.dump_stats(self.path)
+
+    def record_commit(self, commit, seconds):
+        """Record the time spent analyzing a commit
+
+        :param commit: hash of the commit
+        :param seconds: seconds of wall time
+        """
+        with self._lock:
+            self.__keep(self.commits, (seconds, next(self._counter), commit))
+
+    def record_run(self, analyzer, target, wall, cpu):
+        """Record a run of an analyzer
+
+        :param analyzer: name of the analyzer
+        :param target: file or folder analyzed
+        :param wall: seconds of wall time
+        :param cpu: seconds of CPU time of the external tools launched
+        """
+        with self._lock:
+            runs = self.analyzers.setdefault(analyzer, [0, 0.0, 0.0, 0.0])
+            runs[0] += 1
+            runs[1] += wall
+            runs[2] += cpu
+            runs[3] = max(runs[3], wall)
+
+            if target is not None:
+                self.__keep(self.targets, (wall, next(self._counter), analyzer, target))
+
+    def report(self):
+        """Return the report of the profile, with the functions with the
+        highest cumulative time, the runs of the analyzers and the slowest
+        commits and targets"""
+
+        stream = io.StringIO()
+        stream.write("Profile saved to %s\n\n" % self.path)
+
+        stream.write("Top %s functions by cumulative time:\n" % self.top)
+        stats = pstats.Stats(self._profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(self.top)
+
+        stream.write("Analyzers:\n")
+        stream.write("  %-12s %8s %10s %10s %10s\n" % ('name', 'runs', 'wall', 'cpu', 'max'))
+        for name, (runs, wall, cpu, slowest) in sorted(self.analyzers.items(), key=lambda a: a[1][1], reverse=True):
+            stream.write("  %-12s %8d %9.3fs %9.3fs %9.3fs\n" % (name, runs, wall, cpu, slowest))
+
+        stream.write("\nSlowest commits:\n")
+        for seconds, _, commit in sorted(self.commits, reverse=True):
+            stream.write("  %9.3fs %s\n" % (seconds, commit))
+
+        stream.write("\nSlowest targets:\n")
+        for seconds, _, analyzer, target in sorted(self.targets, reverse=True):
+            stream.write("  %9.3fs %-12s %s\n" % (seconds, analyzer, target))
+
+        return stream.getvalue()
+
+    def __keep(self, heap, entry):
+        """Add an entry to a heap which keeps the `top` largest ones"""
+
+        if len(heap) < self.top:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+
+def record_commit(commit, seconds):
+    """Record the time spent analyzing a commit in the
+    active profiler, if any (see `Profiler.record_commit`)"""
+
+    profiler = _active
+    if profiler is not None:
+        profiler.record_commit(commit, seconds)
+
+
+def record_run(analyzer, target, wall, cpu):
+    """Record a run of an analyzer in the active
+    profiler, if any (see `Profiler.record_run`)"""
+
+    profiler = _active
+    if profiler is not None:
+        profiler.record_run(analyzer, target, wall, cpu)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+from collections import deque
+import datetime
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+STATE_RUNNING = 'running'
+STATE_COMPLETED = 'completed'
+STATE_FAILED = 'failed'
+
+logger = logging.getLogger(__name__)
+
+
+class Progress:
+    """Progress of the analysis of a repository.
+
+    The commits to process (`total`) are usually counted up front, while
+    the ones processed so far, the current stage and commit are updated
+    as the analysis goes on. Every `interval` seconds, a background thread
+    logs the percentage of commits done, the commits per second over the
+    last `window` seconds, the estimated time to finish (ETA) and the
+    current stage, and rewrites the JSON `status_path`, if given. The
+    status file is replaced atomically, thus it can be polled at any time.
+
+    When `total` is unknown (e.g., when fetching the latest items), the
+    percentage and the ETA are not available.
+
+    :param name: name of the execution (e.g., the backend and the URI)
+    :param interval: seconds between two reports
+    :param status_path: path of the JSON file where the status is written
+    :param window: seconds over which the rate is computed
+    """
+    INTERVAL = 30
+    WINDOW = 300
+
+    def __init__(self, name, interval=INTERVAL, status_path=None, window=WINDOW):
+        self.name = name
+        self.interval = interval
+        self.status_path = status_path
+        self.window = window
+
+        self.total = None
+        self.done = 0
+        self.stage = None
+        self.commit = None
+        self.state = STATE_RUNNING
+
+        self._started_at = time.monotonic()
+        self._samples = deque([(self._started_at, 0)])
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start reporting the progress"""
+
+        self.report()
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+        self._thread.start()
+
+    def stop(self, state=STATE_COMPLETED):
+        """Stop reporting the progress, after a last report
+
+        :param state: final state of the execution
+        """
+        with self._lock:
+            self.state = state
+            self.stage = None
+            self.commit = None
+
+        if self._thread:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+        self.report()
+
+    def set_total(self, total):
+        """Set the number of commits to process"""
+
+        with self._lock:
+            self.total = total
+
+    def set_stage(self, stage, commit=None):
+        """Set the current stage and the commit it works on"""
+
+        with self._lock:
+            self.stage = stage
+            self.commit = commit
+
+    def update(self, done):
+        """Set the number of commits processed so far"""
+
+        now = time.monotonic()
+        with self._lock:
+            self.done = done
+            self._samples.append((now, done))
+            while len(self._samples) > 1 and self._samples[1][0] <= now - self.window:
+                self._samples.popleft()
+
+    def status(self):
+        """Return the status of the execution
+
+        :returns: a dict with the commits processed (`done`) out of the
+            `total`, the `percent` done, the `rate` in commits per second,
+            the `eta` and the `elapsed` time in seconds, the `state`, and
+            the current `stage` and `commit`
+        """
+        now = time.monotonic()
+        with self._lock:
+            total, done = self.total, self.done
+            since, done_since = self._samples[0]
+
+            status = {
+                'name': self.name,
+                'state': self.state,
+                'stage': self.stage,
+                'commit': self.commit
+            }
+
+        elapsed = now - self._started_at
+        rate = (done - done_since) / (now - since) if now > since else 0.0
+
+        percent = None
+        eta = None
+        if total is not None:
+            percent = 100.0 * min(done, total) / total if total else 100.0
+            if rate > 0:
+                eta = max(total - done, 0) / rate
+
+        status.update({
+            'total': total,
+            'done': done,
+            'percent': percent,
+            'rate': rate,
+            'eta': eta,
+            'elapsed': elapsed,
+            'updated_on': time.time()
+        })
+
+        return status
+
+    def report(self):
+        """Log the status and write it to the status file, if any"""
+
+        status = self.status()
+
+        if status['total'] is None:
+            done = "%s commits" % status['done']
+        else:
+            done = "%s/%s commits (%.1f%%)" % (status['done'], status['total'], status['percent'])
+
+        eta = "unknown" if status['eta'] is None else str(datetime.timedelta(seconds=int(status['eta'])))
+        stage = status['state'] if status['stage'] is None else status['stage']
+        if status['commit']:
+            stage += " " + status['commit']
+
+        logger.info("Progress of %s: %s, %.2f commits/s, ETA %s, %s",
+                    self.name, done, status['rate'], eta, stage)
+
+        if self.status_path:
+            try:
+                self.__write(status)
+            except OSError as e:
+                logger.warning("Status not written to %s, %s", self.status_path, e)
+
+    def __write(self, status):
+        dirpath = os.path.dirname(os.path.abspath(self.status_path))
+        fd, tmp_path = tempfile.mkstemp(dir=dirpath, prefix='.graal-status-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(status, f, indent=4, sort_keys=True)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.status_path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+    def __run(self):
+        while not self._stopped.wait(self.interval):
+            self.report()
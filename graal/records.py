@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import sys
+
+# Tuples of the keys of the records converted so far. Records with
+# the same keys share the same tuple, which sets the order of
+# the keys in the dicts emitted.
+_SHAPES = {}
+
+
+def _shape(keys):
+    keys = tuple(keys)
+    return _SHAPES.setdefault(keys, keys)
+
+
+class Record:
+    """Compact representation of the results of an analysis.
+
+    Results are dicts whose keys are repeated for every file and function,
+    thus keeping them in memory (e.g., across commits) is expensive. Records
+    store the values in `__slots__` and the keys in a tuple shared by all
+    the records with the same keys. The dict is rebuilt only when the results
+    are emitted, with the same keys and order of the original one.
+
+    Derived classes list the keys allowed in `__slots__` and can redefine
+    `_pack(key, value)` and `_unpack(key, value)`, which convert the values
+    when the record is created and emitted.
+    """
+    __slots__ = ('_keys',)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from the results of an analysis
+
+        :param data: dict of results, whose keys are in `__slots__`
+
+        :returns: a record object
+        """
+        record = cls()
+        record._keys = _shape(data.keys())
+
+        for key, value in data.items():
+            setattr(record, key, record._pack(key, value))
+
+        return record
+
+    def to_dict(self):
+        """Convert the record to a new dict of results"""
+
+        return {key: self._unpack(key, getattr(self, key)) for key in self._keys}
+
+    def _pack(self, key, value):
+        return value
+
+    def _unpack(self, key, value):
+        return value
+
+
+class FunctionMetrics(Record):
+    """Metrics of a function, as returned by Lizard"""
+
+    __slots__ = ('ccn', 'tokens', 'loc', 'lines', 'name', 'args', 'start', 'end')
+
+    def _pack(self, key, value):
+        if key == 'name':
+            return sys.intern(value)
+
+        return value
+
+
+class FileMetrics(Record):
+    """Metrics of a file, as returned by CoCom. The metrics
+    of the functions are kept as `FunctionMetrics` objects"""
+
+    __slots__ = ('file_path', 'ext', 'ccn', 'avg_ccn', 'avg_loc', 'avg_tokens',
+                 'num_funs', 'loc', 'tokens', 'blanks', 'comments', 'funs')
+
+    def _pack(self, key, value):
+        if key in ('file_path', 'ext'):
+            return sys.intern(value)
+        if key == 'funs':
+            return tuple(FunctionMetrics.from_dict(fun) for fun in value)
+
+        return value
+
+    def _unpack(self, key, value):
+        if key == 'funs':
+            return [fun.to_dict() for fun in value]
+
+        return value
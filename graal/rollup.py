@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import sys
+import threading
+
+ROOT_DIRECTORY = '.'
+
+
+class DirectoryTree:
+    """Rollup of the metrics of the files by directory.
+
+    Each directory of the tree holds the number of files below it and
+    the sums of their metrics (see `METRICS`). When a file is added,
+    replaced or removed, only the directories on its path up to the
+    root (`.`) are updated, thus each change costs O(depth) and the
+    rollup of a commit can be updated from the one of the previous
+    commit by applying the files modified. Directories left without
+    files are removed. Metrics missing in a file (e.g., `ccn` for the
+    files analyzed only by Cloc) count as 0.
+    """
+    METRICS = ['loc', 'ccn', 'num_funs', 'tokens', 'comments', 'blanks']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Remove all the files"""
+
+        self._files = {}
+        self._nodes = {}
+
+    @property
+    def paths(self):
+        """Paths of the files in the tree"""
+
+        return set(self._files.keys())
+
+    def set(self, file_info):
+        """Add the metrics of a file, replacing the previous ones if any
+
+        :param file_info: dict with the results of the file (see CoCom)
+        """
+        file_path = sys.intern(file_info['file_path'])
+        values = tuple(file_info.get(metric, 0) for metric in self.METRICS)
+
+        with self._lock:
+            previous = self._files.get(file_path, None)
+            if previous is not None:
+                self.__update(file_path, previous, -1)
+
+            self._files[file_path] = values
+            self.__update(file_path, values, 1)
+
+    def remove(self, file_path):
+        """Remove the metrics of a file, if any
+
+        :param file_path: path of the file
+        """
+        with self._lock:
+            values = self._files.pop(file_path, None)
+            if values is not None:
+                self.__update(file_path, values, -1)
+
+    def rollup(self, depth=None):
+        """Return the metrics of the directories
+
+        :param depth: max depth of the directories returned, where the
+            root is at depth 0 and its subdirectories at depth 1; all the
+            directories are returned when None
+
+        :returns: a dict which maps the directories to the number of
+            files and the sums of the metrics
+        """
+        with self._lock:
+            nodes = [(path, list(node)) for path, node in self._nodes.items()
+                     if depth is None or self.depth(path) <= depth]
+
+        rollup = {}
+        for path, node in sorted(nodes):
+            rollup[path] = {'files': node[0]}
+            rollup[path].update(zip(self.METRICS, node[1:]))
+
+        return rollup
+
+    @staticmethod
+    def depth(path):
+        """Return the depth of a directory"""
+
+        return 0 if path == ROOT_DIRECTORY else path.count('/') + 1
+
+    @staticmethod
+    def ancestors(file_path):
+        """Return the directories which contain a file, from
+        the innermost to the root"""
+
+        parts = file_path.split('/')[:-1]
+        for i in range(len(parts), 0, -1):
+            yield '/'.join(parts[:i])
+
+        yield ROOT_DIRECTORY
+
+    def __update(self, file_path, values, sign):
+        for path in self.ancestors(file_path):
+            node = self._nodes.get(path, None)
+            if node is None:
+                node = [0] * (len(self.METRICS) + 1)
+                self._nodes[sys.intern(path)] = node
+
+            node[0] += sign
+            for i, value in enumerate(values, 1):
+                node[i] += sign * value
+
+            if not node[0]:
+                del self._nodes[path]
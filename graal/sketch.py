@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+from array import array
+import math
+import random
+
+
+class KLLSketch:
+    """Mergeable quantile sketch, as described by Karnin, Lang and Liberty
+    in "Optimal Quantile Approximation in Streams" (KLL).
+
+    The sketch keeps a hierarchy of compactors. Values are added to the
+    first one; when a compactor is full, its values are sorted and every
+    other value (starting at a random offset) is promoted to the next
+    compactor, where it weighs twice as much. Compactors get smaller
+    towards the bottom of the hierarchy, thus the sketch keeps about
+    `3 * k` values, no matter how many were added, and the error on
+    the rank of the quantiles is about `1.7 / k`. Until the first
+    compactor is full, quantiles are exact.
+
+    Sketches built over different values (e.g., on different threads)
+    can be merged, which gives a sketch of all the values. The random
+    offsets are drawn from a generator initialized with `seed`, thus the
+    same sequence of updates and merges always gives the same sketch. The
+    generator is created at the first compaction, thus small sketches
+    (e.g., the ones of the functions of a file) take little memory.
+
+    :param k: size of the largest compactor, which sets the accuracy
+    :param seed: seed of the random offsets
+    """
+    DEFAULT_K = 200
+    COMPACTION_RATIO = 2 / 3
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.k = k
+        self.count = 0
+        self.min = None
+        self.max = None
+
+        self._seed = seed
+        self._random = None
+        self._compactors = []
+        self._size = 0
+        self._max_size = 0
+        self.__grow()
+
+    def __len__(self):
+        return self.count
+
+    def update(self, value):
+        """Add a value to the sketch
+
+        :param value: a number
+        """
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        self._compactors[0].append(value)
+        self._size += 1
+        if self._size >= self._max_size:
+            self.__compress()
+
+    def merge(self, other):
+        """Add the values of another sketch to this one
+
+        :param other: a `KLLSketch` object
+        """
+        if not other.count:
+            return
+
+        while len(self._compactors) < len(other._compactors):
+            self.__grow()
+
+        for compactor, values in zip(self._compactors, other._compactors):
+            compactor.extend(values)
+
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+        self._size = sum(len(compactor) for compactor in self._compactors)
+        while self._size >= self._max_size:
+            self.__compress()
+
+    def quantile(self, q):
+        """Estimate a quantile of the values added
+
+        :param q: the quantile, between 0 and 1
+
+        :returns: the value estimated, None if the sketch is empty
+        """
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs):
+        """Estimate several quantiles of the values added
+
+        :param qs: list of quantiles, between 0 and 1
+
+        :returns: the list of values estimated
+        """
+        if not self.count:
+            return [None for _ in qs]
+
+        weighted = sorted((value, 1 << level)
+                          for level, compactor in enumerate(self._compactors)
+                          for value in compactor)
+        total = sum(weight for _, weight in weighted)
+
+        values = []
+        for q in qs:
+            target = q * total
+            cumulative = 0
+            value = weighted[-1][0]
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    break
+            values.append(value)
+
+        return values
+
+    def summary(self, percentiles):
+        """Return a fixed-size summary of the values added
+
+        :param percentiles: list of percentiles to estimate, between 0 and 100
+
+        :returns: a dict with the count, min, max and the percentiles
+            (e.g., `p50`) of the values
+        """
+        summary = {'count': self.count, 'min': self.min, 'max': self.max}
+        estimated = self.quantiles([p / 100 for p in percentiles])
+
+        for p, value in zip(percentiles, estimated):
+            summary['p%s' % p] = value
+
+        return summary
+
+    def __capacity(self, level):
+        height = len(self._compactors)
+        return int(math.ceil(self.k * self.COMPACTION_RATIO ** (height - level - 1))) + 1
+
+    def __grow(self):
+        self._compactors.append(array('d'))
+        self._max_size = sum(self.__capacity(level) for level in range(len(self._compactors)))
+
+    def __compress(self):
+        """Compact the first full compactor, promoting half of its
+        values to the next one. The value left over, if any, stays"""
+
+        for level, compactor in enumerate(self._compactors):
+            if len(compactor) < self.__capacity(level):
+                continue
+
+            if level + 1 >= len(self._compactors):
+                self.__grow()
+
+            values = sorted(compactor)
+            leftover = values.pop() if len(values) % 2 else None
+            if self._random is None:
+                self._random = random.Random(self._seed)
+            offset = self._random.randint(0, 1)
+
+            self._compactors[level + 1].extend(values[offset::2])
+            self._compactors[level] = array('d', [] if leftover is None else [leftover])
+
+            self._size = sum(len(compactor) for compactor in self._compactors)
+            if self._size < self._max_size:
+                break
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from graal.graal import GraalError
+
+ROOT_DIRECTORY = '.'
+
+
+class Summary:
+    """Repository-level aggregates of the metrics of the files.
+
+    The metrics of each file (see `METRICS`) are stored in a row of a NumPy
+    table, together with the codes of the extension and of the top-level
+    directory of the file (`.` for the files in the root). Files are added,
+    replaced and removed one at a time with `set` and `remove`, which also
+    update by delta the sums of the metrics of the groups the file belongs
+    to; thus, when only a few files change between two commits, the other
+    rows and sums are kept as they are.
+
+    `summarize` returns the number of files and, for each metric, the sum,
+    the mean and the `percentiles` over all the files, for each extension
+    and for each top-level directory. Means and percentiles only take into
+    account the files which have the metric (e.g., `ccn` is not available
+    for the files analyzed only by Cloc). The CCN per function is included
+    as well.
+
+    :param percentiles: percentiles of the metrics computed
+
+    :raises GraalError: raised when NumPy is not installed
+    """
+    METRICS = ['loc', 'ccn', 'num_funs', 'tokens', 'comments', 'blanks']
+    PERCENTILES = (50, 90, 99)
+    INITIAL_ROWS = 1024
+
+    def __init__(self, percentiles=PERCENTILES):
+        if numpy is None:
+            raise GraalError(cause="NumPy is required to summarize the metrics, install it with `pip install numpy`")
+
+        self.percentiles = list(percentiles)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Remove all the files"""
+
+        self._rows = {}
+        self._free = []
+        self._values = numpy.full((self.INITIAL_ROWS, len(self.METRICS)), numpy.nan)
+        self._exts = numpy.zeros(self.INITIAL_ROWS, dtype=numpy.int32)
+        self._dirs = numpy.zeros(self.INITIAL_ROWS, dtype=numpy.int32)
+
+        self._groups = {'ext': _Groups(len(self.METRICS)), 'dir': _Groups(len(self.METRICS))}
+        self._total = _Groups(len(self.METRICS))
+        self._total.code(None)
+
+    @property
+    def paths(self):
+        """Paths of the files summarized"""
+
+        return set(self._rows.keys())
+
+    def set(self, file_info):
+        """Add the metrics of a file, replacing the previous ones if any
+
+        :param file_info: dict with the results of the file (see CoCom)
+        """
+        file_path = file_info['file_path']
+        values = numpy.array([file_info.get(metric, numpy.nan) for metric in self.METRICS], dtype=float)
+        ext = file_info.get('ext', file_path.split('.')[-1])
+        top = file_path.split('/')[0] if '/' in file_path else ROOT_DIRECTORY
+
+        with self._lock:
+            row = self._rows.get(file_path, None)
+            if row is None:
+                row = self.__allocate()
+                self._rows[file_path] = row
+            else:
+                self.__update(row, -1)
+
+            self._values[row] = values
+            self._exts[row] = self._groups['ext'].code(ext)
+            self._dirs[row] = self._groups['dir'].code(top)
+            self.__update(row, 1)
+
+    def remove(self, file_path):
+        """Remove the metrics of a file, if any
+
+        :param file_path: path of the file
+        """
+        with self._lock:
+            row = self._rows.pop(file_path, None)
+            if row is None:
+                return
+
+            self.__update(row, -1)
+            self._values[row] = numpy.nan
+            self._free.append(row)
+
+    def summarize(self):
+        """Compute the aggregates of the files
+
+        :returns: a dict with the aggregates of all the files (`total`),
+            and the ones of each extension (`ext`) and top-level directory (`dir`)
+        """
+        with self._lock:
+            rows = numpy.fromiter(self._rows.values(), dtype=numpy.int64, count=len(self._rows))
+            rows.sort()
+            values = self._values[rows]
+
+            summary = {'total': self.__stats(self._total, 0, values)}
+            summary['ext'] = self.__aggregate(self._groups['ext'], self._exts[rows], values)
+            summary['dir'] = self.__aggregate(self._groups['dir'], self._dirs[rows], values)
+
+        return summary
+
+    def __aggregate(self, groups, codes, values):
+        """Aggregate the values of the rows by group. Rows are sorted by
+        group, thus the percentiles of each group are computed on a slice"""
+
+        order = numpy.argsort(codes, kind='stable')
+        codes = codes[order]
+        values = values[order]
+        bounds = numpy.flatnonzero(numpy.diff(codes)) + 1
+
+        aggregates = {}
+        for segment in numpy.split(numpy.arange(len(codes)), bounds):
+            if not len(segment):
+                continue
+
+            code = codes[segment[0]]
+            aggregates[groups.names[code]] = self.__stats(groups, code, values[segment])
+
+        return aggregates
+
+    def __stats(self, groups, code, values):
+        sums = groups.sums[code]
+        counts = groups.counts[code]
+
+        stats = {'files': int(groups.files[code])}
+        for i, metric in enumerate(self.METRICS):
+            if not counts[i]:
+                continue
+
+            column = values[:, i]
+            column = column[~numpy.isnan(column)]
+            percentiles = numpy.percentile(column, self.percentiles)
+
+            stats[metric] = {'sum': int(sums[i]), 'mean': float(sums[i] / counts[i])}
+            for q, value in zip(self.percentiles, percentiles):
+                stats[metric]['p%s' % q] = float(value)
+
+        ccn, num_funs = self.METRICS.index('ccn'), self.METRICS.index('num_funs')
+        if sums[num_funs]:
+            stats['ccn_per_fun'] = float(sums[ccn] / sums[num_funs])
+
+        return stats
+
+    def __update(self, row, sign):
+        """Add (or subtract) the values of a row to the sums of its groups"""
+
+        values = self._values[row]
+        present = ~numpy.isnan(values)
+        values = numpy.where(present, values, 0)
+
+        for groups, code in [(self._total, 0),
+                             (self._groups['ext'], self._exts[row]),
+                             (self._groups['dir'], self._dirs[row])]:
+            groups.sums[code] += sign * values
+            groups.counts[code] += sign * present
+            groups.files[code] += sign
+
+    def __allocate(self):
+        if self._free:
+            return self._free.pop()
+
+        row = len(self._rows)
+        if row == len(self._values):
+            size = 2 * len(self._values)
+            self._values = numpy.resize(self._values, (size, len(self.METRICS)))
+            self._values[row:] = numpy.nan
+            self._exts = numpy.resize(self._exts, size)
+            self._dirs = numpy.resize(self._dirs, size)
+
+        return row
+
+
+class _Groups:
+    """Names of a set of groups (e.g., the extensions) and
+    the sums of the metrics of their files"""
+
+    def __init__(self, nmetrics):
+        self.names = []
+        self.index = {}
+        self.sums = numpy.zeros((0, nmetrics))
+        self.counts = numpy.zeros((0, nmetrics), dtype=numpy.int64)
+        self.files = numpy.zeros(0, dtype=numpy.int64)
+
+    def code(self, name):
+        """Return the code of a group, which is added if new"""
+
+        code = self.index.get(name, None)
+        if code is not None:
+            return code
+
+        code = len(self.names)
+        self.index[name] = code
+        self.names.append(name)
+        self.sums = numpy.vstack([self.sums, numpy.zeros(self.sums.shape[1])])
+        self.counts = numpy.vstack([self.counts, numpy.zeros(self.counts.shape[1], dtype=numpy.int64)])
+        self.files = numpy.append(self.files, 0)
+
+        return code
@@ -107,6 +107,9 @@ setup(name="graal",
           'bandit>=1.4.0',
           'grimoirelab-toolkit>=0.1.4'
       ],
+      extras_require={
+          'summary': ['numpy']
+      },
       scripts=[
           'bin/graal'
       ],
@@ -21,9 +21,13 @@
 #     Valerio Cosentino <valcos@bitergia.com>
 #
 
+import sys
 import unittest
 
+from graal.graal import (SKIP_TIMEOUT,
+                         AnalysisSkippedError)
 from graal.backends.core.analyzers.analyzer import Analyzer
+from graal.backends.core.analyzers.runner import LineParser
 
 
 class TestAnalyzer(unittest.TestCase):
@@ -37,6 +41,23 @@ class TestAnalyzer(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             analyzer.analyze()
 
+    def test_run_tool(self):
+        """Test whether tools are executed and time outs are reported as skipped analyses"""
+
+        analyzer = Analyzer()
+
+        run = analyzer._run_tool([sys.executable, '-c', 'print(1)'], LineParser(), 'target')
+        self.assertEqual(run.returncode, 0)
+        self.assertEqual(run.output, '1')
+
+        with self.assertRaises(AnalysisSkippedError) as e:
+            analyzer._run_tool([sys.executable, '-c', 'import time; time.sleep(60)'], LineParser(),
+                               'target', timeout=0.5)
+
+        self.assertEqual(e.exception.target, 'target')
+        self.assertEqual(e.exception.reason, SKIP_TIMEOUT)
+        self.assertEqual(e.exception.analyzer, 'analyzer')
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -30,6 +30,7 @@ import unittest
 from base_analyzer import (TestCaseAnalyzer,
                            ANALYZER_TEST_FILE)
 
+from graal.graal import SKIP_TOO_LARGE
 from graal.backends.core.analyzers.bandit import Bandit
 
 
@@ -143,6 +144,54 @@ class TestBandit(TestCaseAnalyzer):
 
         self.assertNotIn('vulns', result)
 
+    def test_analyze_max_file_size(self):
+        """Test whether bandit excludes the files exceeding the size limit"""
+
+        bandit = Bandit()
+        kwargs = {
+            'folder_path': self.repo_path,
+            'details': True
+        }
+        expected = bandit.analyze(**kwargs)
+
+        skipped = []
+        result = bandit.analyze(max_file_size={'bandit': 1}, skipped=skipped, **kwargs)
+
+        self.assertEqual(result['loc_analyzed'], 0)
+        self.assertEqual(result['num_vulns'], 0)
+        self.assertGreater(len(skipped), 0)
+
+        for error in skipped:
+            self.assertEqual(error.reason, SKIP_TOO_LARGE)
+            self.assertEqual(error.analyzer, 'bandit')
+            self.assertTrue(error.target.endswith('.py'))
+
+        result = bandit.analyze(max_file_size={'lizard': 1}, **kwargs)
+        self.assertDictEqual(result, expected)
+
+    def test_analyze_max_file_size_comma(self):
+        """Test whether bandit excludes only the large files whose path contains commas"""
+
+        bandit = Bandit()
+        kwargs = {
+            'folder_path': self.repo_path,
+            'details': True
+        }
+        expected = bandit.analyze(**kwargs)
+
+        large_path = os.path.join(self.repo_path, 'perceval', 'large,.py')
+        with open(large_path, 'w') as fd:
+            fd.write('import pickle\n' + 'pickle.loads(data)\n' * 5000)
+        self.addCleanup(os.remove, large_path)
+
+        skipped = []
+        result = bandit.analyze(max_file_size={'bandit': 50000}, skipped=skipped, **kwargs)
+        self.assertDictEqual(result, expected)
+
+        self.assertEqual(len(skipped), 1)
+        self.assertEqual(skipped[0].reason, SKIP_TOO_LARGE)
+        self.assertEqual(skipped[0].target, large_path)
+
 
 if __name__ == "__main__":
     unittest.main()
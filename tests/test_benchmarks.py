@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+# The benchmarks are not installed with Graal, thus they are
+# imported from the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks import engines
+from benchmarks.engines import (ENGINES,
+                                EngineBenchmark,
+                                size_class,
+                                summarize)
+from benchmarks.generator import RepositoryGenerator
+from benchmarks.runner import report, run, run_backend
+
+
+def git(path, *args):
+    return subprocess.check_output(['git'] + list(args), cwd=path).decode('utf-8')
+
+
+class TestRepositoryGenerator(unittest.TestCase):
+    """RepositoryGenerator tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_generate(self):
+        """Test whether a repository is generated with the given parameters"""
+
+        generator = RepositoryGenerator(commits=20, files=30, languages={'py': 0.5, 'java': 0.5},
+                                        median_lines=50, rename_rate=0.5, merge_rate=0.3, seed=1)
+        path = os.path.join(self.tmp_path, 'repo')
+        manifest = generator.generate(path)
+
+        self.assertEqual(manifest['path'], path)
+        self.assertEqual(manifest['commits'], 20)
+        self.assertGreater(manifest['merges'], 0)
+        self.assertGreater(manifest['renames'], 0)
+        self.assertEqual(manifest['files'], 31)
+        self.assertGreater(manifest['lines'], 0)
+        self.assertGreater(manifest['analyses']['*'], manifest['analyses']['py'])
+
+        self.assertEqual(git(path, 'rev-list', '--count', '--all').strip(), '20')
+        self.assertEqual(len(git(path, 'rev-list', '--merges', 'master').split()), manifest['merges'])
+
+        files = git(path, 'ls-tree', '-r', '--name-only', 'master').split()
+        self.assertEqual(len(files), 31)
+        self.assertIn('pkg/__init__.py', files)
+        for f in files:
+            self.assertTrue(f.startswith('pkg/') or f.startswith('src/java/'))
+            self.assertIn(os.path.splitext(f)[1], ['.py', '.java'])
+
+        analyses = 0
+        for commit in git(path, 'rev-list', '--all').split():
+            analyses += len(git(path, 'ls-tree', '-r', '--name-only', commit).split())
+        self.assertEqual(manifest['analyses']['*'], analyses)
+
+        java = [f for f in files if f.endswith('.java')][0]
+        name = os.path.splitext(os.path.basename(java))[0]
+        self.assertIn('public class %s {' % name, git(path, 'show', 'master:' + java))
+
+    def test_deterministic(self):
+        """Test whether the same repository is generated with the same seed"""
+
+        heads = []
+        for seed in [0, 0, 1]:
+            path = os.path.join(self.tmp_path, 'repo%s' % len(heads))
+            RepositoryGenerator(commits=5, files=10, seed=seed).generate(path)
+            heads.append(git(path, 'rev-parse', 'master'))
+
+        self.assertEqual(heads[0], heads[1])
+        self.assertNotEqual(heads[0], heads[2])
+
+    def test_invalid_parameters(self):
+        """Test whether an exception is thrown when the parameters are not valid"""
+
+        with self.assertRaises(ValueError):
+            RepositoryGenerator(commits=0)
+
+        with self.assertRaises(ValueError):
+            RepositoryGenerator(languages={'cobol': 1})
+
+
+class TestRun(unittest.TestCase):
+    """Benchmark runner tests"""
+
+    def test_run(self):
+        """Test whether a backend is measured on a generated repository"""
+
+        generator = RepositoryGenerator(commits=3, files=5, languages={'py': 1}, median_lines=20)
+        benchmark = run(generator, backends=['cocom'], options={'cocom': {'workers': 2}})
+
+        self.assertEqual(benchmark['backend_versions'], {'cocom': '0.2.15'})
+        self.assertEqual(benchmark['generator']['commits'], 3)
+        self.assertEqual(benchmark['options'], {'cocom': {'workers': 2}})
+        self.assertEqual(benchmark['repository']['commits'], 3)
+        self.assertNotIn('path', benchmark['repository'])
+
+        result = benchmark['results']['cocom']
+        self.assertEqual(result['commits'], 3)
+        self.assertEqual(result['items'], 3)
+        self.assertGreater(result['commits_per_second'], 0)
+        self.assertGreater(result['files_per_second'], result['commits_per_second'])
+        self.assertGreater(result['peak_rss'], 0)
+        self.assertEqual(result['stages']['checkout']['calls'], 3)
+        self.assertEqual(result['stages']['lizard']['calls'], 18)
+
+        table = report(benchmark)
+        self.assertTrue(table.startswith('backend'))
+        self.assertIn('lizard', table)
+
+    def test_run_error(self):
+        """Test whether the errors of a backend are reported"""
+
+        generator = RepositoryGenerator(commits=1, files=1, languages={'java': 1})
+        workdir = tempfile.mkdtemp(prefix='graal_')
+        try:
+            benchmark = run(generator, backends=['coqua'], options={'coqua': {'entrypoint': None}}, workdir=workdir)
+            self.assertTrue(os.path.exists(os.path.join(workdir, 'repository')))
+        finally:
+            shutil.rmtree(workdir)
+
+        self.assertEqual(benchmark['results']['coqua'], {'error': 'GraalError: Entrypoint cannot be null'})
+        self.assertIn('coqua    GraalError', report(benchmark))
+
+    def test_run_backend_exit(self):
+        """Test whether an error is raised when a backend exits without a result"""
+
+        generator = RepositoryGenerator(commits=1, files=1)
+        workdir = tempfile.mkdtemp(prefix='graal_')
+        try:
+            manifest = generator.generate(os.path.join(workdir, 'repository'))
+            with unittest.mock.patch('benchmarks.runner._measure_backend', side_effect=lambda *args: os._exit(3)):
+                with self.assertRaisesRegex(RuntimeError, 'benchmark of cocom exited with code 3 without a result'):
+                    run_backend('cocom', manifest, workdir)
+        finally:
+            shutil.rmtree(workdir)
+
+
+class TestEngineBenchmark(unittest.TestCase):
+    """EngineBenchmark tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_path = tempfile.mkdtemp(prefix='graal_')
+        cls.repo_path = os.path.join(cls.tmp_path, 'repo')
+        RepositoryGenerator(commits=10, files=20, changes=3, seed=2).generate(cls.repo_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_path)
+
+    def test_commits(self):
+        """Test whether the commits are sampled from the oldest to the newest"""
+
+        commits = EngineBenchmark(self.repo_path).commits()
+        expected = git(self.repo_path, 'rev-list', '--reverse', '--topo-order', 'master').split()
+        self.assertListEqual(commits, expected)
+
+        commits = EngineBenchmark(self.repo_path, max_commits=4).commits()
+        self.assertEqual(len(commits), 4)
+        self.assertEqual(commits[0], expected[0])
+        self.assertEqual(commits[-1], expected[-1])
+
+    def test_run(self):
+        """Test whether the snapshots are prepared with each engine"""
+
+        workdir = os.path.join(self.tmp_path, 'workdir')
+        os.mkdir(workdir)
+
+        rows = EngineBenchmark(self.repo_path, max_commits=5).run(workdir)
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['changed'], rows[0]['files'])
+        self.assertEqual(rows[0]['files'], 21)
+        for row in rows:
+            self.assertGreater(row['bytes'], 0)
+            for engine in ENGINES:
+                self.assertGreater(row[engine], 0)
+
+        self.assertListEqual(os.listdir(workdir), [])
+        self.assertNotIn('worktree', git(self.repo_path, 'worktree', 'list'))
+
+    def test_read_tree(self):
+        """Test whether the contents of the files are read from the object store"""
+
+        reader = engines._BlobReader(EngineBenchmark(self.repo_path).repo)
+        try:
+            contents = reader.read_tree('master')
+            again = reader.read_tree('master~1')
+        finally:
+            reader.close()
+
+        files = git(self.repo_path, 'ls-tree', '-r', '--name-only', 'master').split()
+        self.assertListEqual(sorted(contents), sorted(files))
+        self.assertEqual(contents['pkg/__init__.py'].decode('utf-8'),
+                         git(self.repo_path, 'show', 'master:pkg/__init__.py'))
+        self.assertGreater(len(again), 0)
+
+    def test_summarize(self):
+        """Test whether the commits are grouped by size"""
+
+        self.assertEqual(size_class(0), '0')
+        self.assertEqual(size_class(1), '1-9')
+        self.assertEqual(size_class(99), '10-99')
+        self.assertEqual(size_class(1000), '1000-9999')
+
+        rows = [
+            {'files': 50, 'changed': 50, 'worktree': 0.3, 'archive': 0.2, 'blobs': 0.1},
+            {'files': 60, 'changed': 2, 'worktree': 0.01, 'archive': 0.2, 'blobs': 0.1},
+            {'files': 120, 'changed': 3, 'worktree': 0.03, 'archive': 0.4, 'blobs': 0.2}
+        ]
+
+        summary = summarize(rows, 'files')
+        self.assertListEqual(list(summary), ['10-99', '100-999'])
+        self.assertEqual(summary['10-99']['commits'], 2)
+        self.assertAlmostEqual(summary['10-99']['worktree']['mean'], 0.155)
+        self.assertAlmostEqual(summary['10-99']['blobs']['median'], 0.1)
+        self.assertEqual(summary['10-99']['fastest'], 'blobs')
+        self.assertEqual(summary['100-999']['fastest'], 'worktree')
+
+        summary = summarize(rows, 'changed')
+        self.assertListEqual(list(summary), ['1-9', '10-99'])
+        self.assertEqual(summary['1-9']['fastest'], 'worktree')
+        self.assertEqual(summary['10-99']['fastest'], 'blobs')
+
+    def test_report(self):
+        """Test whether the results are reported by tree and change size"""
+
+        benchmark = engines.run(self.repo_path, max_commits=3)
+
+        self.assertEqual(len(benchmark['commits']), 3)
+        self.assertEqual(benchmark['repository'], self.repo_path)
+        self.assertIn('10-99', benchmark['by_tree_size'])
+
+        table = engines.report(benchmark)
+        self.assertTrue(table.startswith('Files in the tree'))
+        self.assertIn('Files changed', table)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
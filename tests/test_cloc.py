@@ -27,7 +27,10 @@ import unittest
 from base_analyzer import (TestCaseAnalyzer,
                            ANALYZER_TEST_FILE)
 
-from graal.backends.core.analyzers.cloc import Cloc
+from graal.graal import (SKIP_TOO_LARGE,
+                         AnalysisSkippedError)
+from graal.backends.core.analyzers.cloc import (Cloc,
+                                                ClocParser)
 
 
 class TestCloc(TestCaseAnalyzer):
@@ -47,6 +50,50 @@ class TestCloc(TestCaseAnalyzer):
         self.assertIn('loc', result)
         self.assertTrue(type(result['loc']), int)
 
+    def test_analyze_max_file_size(self):
+        """Test whether cloc skips the files exceeding the size limit"""
+
+        cloc = Cloc()
+        kwargs = {'file_path': os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE),
+                  'max_file_size': {'cloc': 1}}
+
+        with self.assertRaises(AnalysisSkippedError) as e:
+            cloc.analyze(**kwargs)
+
+        self.assertEqual(e.exception.reason, SKIP_TOO_LARGE)
+        self.assertEqual(e.exception.analyzer, 'cloc')
+        self.assertEqual(e.exception.target, kwargs['file_path'])
+
+
+class TestClocParser(unittest.TestCase):
+    """ClocParser tests"""
+
+    def test_feed(self):
+        """Test whether the first row of the table of languages is parsed"""
+
+        output = [
+            "       1 text file.",
+            "       1 unique file.",
+            "       0 files ignored.",
+            "",
+            "-------------------------------------------------------------------------------",
+            "Language                     files          blank        comment           code",
+            "-------------------------------------------------------------------------------",
+            "Python                           1             21             19             49",
+            "-------------------------------------------------------------------------------"
+        ]
+
+        parser = ClocParser()
+        for line in output:
+            if parser.done:
+                break
+            parser.feed(line)
+
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.blanks, 21)
+        self.assertEqual(parser.comments, 19)
+        self.assertEqual(parser.loc, 49)
+
 
 if __name__ == "__main__":
     unittest.main()
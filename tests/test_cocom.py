@@ -27,6 +27,12 @@ import subprocess
 import tempfile
 import unittest.mock
 
+import graal.summary
+from graal.sketch import KLLSketch
+from graal.metrics import CACHE_LOOKUPS, FILES
+from graal.graal import (SKIP_COMMIT_TIMEOUT,
+                         SKIP_TOO_LARGE,
+                         AnalysisSkippedError)
 from graal.backends.core.analyzers.cloc import Cloc
 from graal.backends.core.analyzers.lizard import Lizard
 from graal.backends.core.cocom import (CATEGORY_COCOM,
@@ -79,6 +85,17 @@ class TestCoComBackend(TestCaseGraal):
         self.assertEqual(cc.origin, 'http://example.com')
         self.assertEqual(cc.tag, 'test')
         self.assertEqual(cc.file_analyzer.details, False)
+        self.assertEqual(cc.workers, 1)
+        self.assertIsNone(cc.cost_model.store_path)
+        self.assertIsNone(cc.file_timeout)
+        self.assertIsNone(cc.commit_timeout)
+        self.assertIsNone(cc.max_file_size)
+        self.assertIsNone(cc.chunk_size)
+        self.assertIsNone(cc.funs_filter)
+        self.assertFalse(cc.incremental)
+        self.assertIsNone(cc.summary)
+        self.assertFalse(cc.distributions)
+        self.assertIsNone(cc.rollup)
 
         cc = CoCom('http://example.com', self.git_path, self.worktree_path, details=True, tag='test')
         self.assertEqual(cc.uri, 'http://example.com')
@@ -117,6 +134,325 @@ class TestCoComBackend(TestCaseGraal):
             self.assertFalse('parents' in commit['data'])
             self.assertFalse('refs' in commit['data'])
 
+    def test_fetch_workers(self):
+        """Test whether files are analyzed in parallel and the cost model is learned"""
+
+        cost_model = os.path.join(self.tmp_path, 'costs.json')
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path)
+        expected = [commit['data']['analysis'] for commit in cc.fetch()]
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, workers=4, cost_model=cost_model)
+        commits = [commit for commit in cc.fetch()]
+
+        self.assertEqual(len(commits), len(expected))
+        for commit, analysis in zip(commits, expected):
+            self.assertListEqual([f['file_path'] for f in commit['data']['analysis']],
+                                 [f['file_path'] for f in analysis])
+            self.assertListEqual([f['loc'] for f in commit['data']['analysis']],
+                                 [f['loc'] for f in analysis])
+
+        self.assertTrue(os.path.exists(cost_model))
+        self.assertIn('perceval/backends/core/git.py', cc.cost_model.files)
+
+    def test_fetch_chunks(self):
+        """Test whether the files of a commit are split over several items"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path)
+        expected = [commit['data'] for commit in cc.fetch()]
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, chunk_size=2)
+        items = [item for item in cc.fetch()]
+
+        self.assertEqual(len(set(item['uuid'] for item in items)), len(items))
+
+        for commit in expected:
+            chunks = [item['data'] for item in items if item['data']['commit'] == commit['commit']]
+            self.assertEqual(len(chunks), (len(commit['analysis']) + 1) // 2)
+
+            analysis = []
+            for index, chunk in enumerate(chunks):
+                self.assertEqual(chunk['chunk'], index)
+                self.assertEqual(chunk['chunks'], len(chunks))
+                self.assertLessEqual(len(chunk['analysis']), 2)
+                self.assertEqual(chunk['Author'], commit['Author'])
+                self.assertFalse('files' in chunk)
+                analysis.extend(chunk['analysis'])
+
+            self.assertListEqual([f['file_path'] for f in analysis],
+                                 [f['file_path'] for f in commit['analysis']])
+
+    def test_fetch_top_funs(self):
+        """Test whether only the top functions of each commit are returned"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, details=True,
+                   top_funs=3, top_funs_scope='commit')
+        self.assertEqual(cc.funs_filter.top, 3)
+        self.assertEqual(cc.funs_filter.scope, 'commit')
+
+        commits = [commit for commit in cc.fetch()]
+
+        for commit in commits:
+            funs = [fd for file_info in commit['data']['analysis'] for fd in file_info.get('funs', [])]
+            self.assertLessEqual(len(funs), 3)
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, details=True, min_ccn=5)
+        commits = [commit for commit in cc.fetch()]
+
+        for commit in commits:
+            for file_info in commit['data']['analysis']:
+                for fd in file_info.get('funs', []):
+                    self.assertGreaterEqual(fd['ccn'], 5)
+
+    def test_fetch_incremental(self):
+        """Test whether the results of the files not modified are reused"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, details=True)
+        expected = [commit['data']['analysis'] for commit in cc.fetch()]
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, details=True, incremental=True)
+
+        files = FILES.labels('CoCom').value
+        hits = CACHE_LOOKUPS.labels('CoCom', 'hit').value
+        misses = CACHE_LOOKUPS.labels('CoCom', 'miss').value
+
+        analyze = FileAnalyzer.analyze
+        analyzed = []
+
+        def count(file_analyzer, file_path, **kwargs):
+            analyzed.append(file_path)
+            return analyze(file_analyzer, file_path, **kwargs)
+
+        with unittest.mock.patch.object(FileAnalyzer, 'analyze', autospec=True, side_effect=count):
+            commits = [commit['data']['analysis'] for commit in cc.fetch()]
+
+        self.assertListEqual(commits, expected)
+
+        # the files of the first commit are analyzed once, while the
+        # next commits only analyze the files they add
+        self.assertEqual(len(analyzed), len(expected[-1]))
+        self.assertEqual(len(cc._results), len(expected[-1]))
+
+        self.assertEqual(FILES.labels('CoCom').value - files, sum(len(analysis) for analysis in expected))
+        self.assertEqual(CACHE_LOOKUPS.labels('CoCom', 'miss').value - misses, len(analyzed))
+        self.assertEqual(CACHE_LOOKUPS.labels('CoCom', 'hit').value - hits,
+                         sum(len(analysis) for analysis in expected) - len(analyzed))
+
+    def test_plan(self):
+        """Test whether the plan estimates the file analyses and the cache hits of a run"""
+
+        cost_model = os.path.join(self.tmp_path, 'plan_costs.json')
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path,
+                   workers=2, cost_model=cost_model, incremental=True)
+        estimate = cc.plan()
+
+        self.assertEqual(estimate['backend_name'], 'CoCom')
+        self.assertEqual(estimate['commits'], 3)
+        self.assertTrue(estimate['incremental'])
+        self.assertEqual(estimate['workers'], 2)
+        self.assertEqual(estimate['recorded_analyses'], 0)
+        self.assertFalse(os.path.exists(cc.worktreepath))
+
+        hits = CACHE_LOOKUPS.labels('CoCom', 'hit').value
+        misses = CACHE_LOOKUPS.labels('CoCom', 'miss').value
+        commits = [commit['data']['analysis'] for commit in cc.fetch()]
+
+        # hidden files are not analyzed, as done by the run
+        self.assertEqual(estimate['analyses']['full'], sum(len(analysis) for analysis in commits))
+        self.assertEqual(estimate['cache']['hits'], CACHE_LOOKUPS.labels('CoCom', 'hit').value - hits)
+        self.assertEqual(estimate['cache']['misses'], CACHE_LOOKUPS.labels('CoCom', 'miss').value - misses)
+        self.assertEqual(estimate['analyses']['incremental'], estimate['cache']['misses'])
+
+        # the costs recorded by the run are used by the next plans
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path,
+                   workers=2, cost_model=cost_model, incremental=True)
+        estimate = cc.plan()
+
+        self.assertEqual(estimate['recorded_analyses'], estimate['analyses']['full'])
+        self.assertGreater(estimate['seconds']['full'], estimate['seconds']['incremental'])
+        self.assertLessEqual(estimate['estimated_wall'], estimate['seconds']['incremental'])
+        self.assertEqual(estimate['estimated_wall'], estimate['wall'][2])
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path,
+                   in_paths=['perceval/backends/core/github.py'])
+        estimate = cc.plan()
+
+        self.assertEqual(estimate['analyzed_commits'], 1)
+        self.assertEqual(estimate['skipped_commits'], 2)
+        self.assertDictEqual(estimate['analyses'], {'full': 1, 'incremental': 1})
+
+    def test_fetch_memory_spill(self):
+        """Test whether the results kept across commits are dropped when spilling"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, rollup_depth=0)
+        expected = [commit['data'] for commit in cc.fetch()]
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, rollup_depth=0, incremental=True,
+                   memory=True, memory_limit=1, memory_spill=True)
+
+        analyze = FileAnalyzer.analyze
+        analyzed = []
+
+        def count(file_analyzer, file_path, **kwargs):
+            analyzed.append(file_path)
+            return analyze(file_analyzer, file_path, **kwargs)
+
+        with unittest.mock.patch.object(FileAnalyzer, 'analyze', autospec=True, side_effect=count):
+            commits = [commit for commit in cc.fetch()]
+
+        self.assertListEqual([commit['data']['analysis'] for commit in commits],
+                             [commit['analysis'] for commit in expected])
+        self.assertListEqual([commit['data']['rollup'] for commit in commits],
+                             [commit['rollup'] for commit in expected])
+        self.assertTrue(all('memory' in commit for commit in commits))
+
+        # every commit is fully analyzed, since the results are dropped
+        self.assertEqual(len(analyzed), sum(len(commit['analysis']) for commit in expected))
+        self.assertDictEqual(cc._results, {})
+
+    @unittest.skipIf(graal.summary.numpy is None, "NumPy not installed")
+    def test_fetch_summary(self):
+        """Test whether the aggregates of the files are added to the items"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, summary=True)
+        commits = [commit['data'] for commit in cc.fetch()]
+
+        for commit in commits:
+            summary = commit['summary']
+            self.assertEqual(summary['total']['files'], len(commit['analysis']))
+            self.assertEqual(summary['total']['loc']['sum'],
+                             sum(file_info['loc'] for file_info in commit['analysis']))
+            self.assertEqual(sum(group['files'] for group in summary['ext'].values()),
+                             len(commit['analysis']))
+            self.assertEqual(sum(group['files'] for group in summary['dir'].values()),
+                             len(commit['analysis']))
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, summary=True, incremental=True)
+        incremental = [commit['data']['summary'] for commit in cc.fetch()]
+        self.assertListEqual(incremental, [commit['summary'] for commit in commits])
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, summary=True, chunk_size=4)
+        items = [item['data'] for item in cc.fetch()]
+        chunked = [item['summary'] for item in items if 'summary' in item]
+        self.assertListEqual(chunked, [commit['summary'] for commit in commits])
+
+        for item in items:
+            self.assertEqual('summary' in item, item['chunk'] == item['chunks'] - 1)
+
+    def test_fetch_distributions(self):
+        """Test whether the distributions of the metrics of the functions are added to the items"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, details=True, distributions=True)
+        commits = [commit['data'] for commit in cc.fetch()]
+
+        for commit in commits:
+            ccns = sorted(fd['ccn'] for file_info in commit['analysis'] for fd in file_info.get('funs', []))
+            distribution = commit['distributions']['ccn']
+
+            self.assertEqual(distribution['count'], len(ccns))
+            self.assertEqual(distribution['min'], ccns[0])
+            self.assertEqual(distribution['max'], ccns[-1])
+            self.assertEqual(distribution['p50'], ccns[(len(ccns) - 1) // 2])
+            self.assertEqual(commit['distributions']['loc']['count'], len(ccns))
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, distributions=True, incremental=True)
+        incremental = [commit['data']['distributions'] for commit in cc.fetch()]
+        self.assertListEqual(incremental, [commit['distributions'] for commit in commits])
+
+    def test_fetch_distributions_merged(self):
+        """Test whether the sketches of the files are merged once in incremental mode"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, distributions=True)
+        with unittest.mock.patch.object(KLLSketch, 'merge', autospec=True, side_effect=KLLSketch.merge) as merge:
+            commits = [commit['data']['distributions'] for commit in cc.fetch()]
+        merges = merge.call_count
+        self.assertDictEqual(cc._sketches, {})
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, distributions=True, incremental=True)
+        with unittest.mock.patch.object(KLLSketch, 'merge', autospec=True, side_effect=KLLSketch.merge) as merge:
+            incremental = [commit['data']['distributions'] for commit in cc.fetch()]
+        self.assertListEqual(incremental, commits)
+        self.assertLess(merge.call_count, merges)
+        self.assertEqual(merge.call_count, 2 * len(cc._sketches))
+
+    def test_fetch_rollup(self):
+        """Test whether the metrics of the directories are added to the items"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, rollup_depth=1)
+        commits = [commit['data'] for commit in cc.fetch()]
+
+        for commit in commits:
+            rollup = commit['rollup']
+            self.assertEqual(rollup['.']['files'], len(commit['analysis']))
+            self.assertEqual(rollup['.']['loc'], sum(file_info['loc'] for file_info in commit['analysis']))
+            self.assertTrue(all(path.count('/') == 0 for path in rollup))
+
+        self.assertEqual(commits[-1]['rollup']['perceval']['files'],
+                         len([f for f in commits[-1]['analysis'] if f['file_path'].startswith('perceval/')]))
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, rollup_depth=1, incremental=True)
+        incremental = [commit['data']['rollup'] for commit in cc.fetch()]
+        self.assertListEqual(incremental, [commit['rollup'] for commit in commits])
+
+    def test_fetch_perf(self):
+        """Test whether the time spent by each analyzer is added to the metadata"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, workers=2, perf=True)
+        commits = [commit for commit in cc.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        for commit in commits:
+            perf = commit['perf']
+            self.assertListEqual(sorted(perf.keys()),
+                                 ['analyze', 'checkout', 'cloc', 'files', 'lizard', 'log', 'post'])
+
+            files = len(commit['data']['analysis'])
+            self.assertEqual(perf['cloc']['calls'], files)
+            self.assertEqual(perf['lizard']['calls'], files)
+            self.assertGreater(perf['cloc']['cpu'], 0)
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, chunk_size=5, perf=True)
+        commits = [commit for commit in cc.fetch()]
+
+        for commit in commits:
+            self.assertIn('analyze', commit['perf'])
+            self.assertEqual(commit['perf']['lizard']['calls'], len(commit['data']['analysis']))
+
+    def test_fetch_max_file_size(self):
+        """Test whether the files too large for Lizard keep the results of Cloc"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path,
+                   in_paths=['perceval/backends/core/github.py'], max_file_size={'lizard': 1})
+        commits = [commit for commit in cc.fetch()]
+
+        self.assertEqual(len(commits), 1)
+
+        commit = commits[0]
+        file_info = commit['data']['analysis'][0]
+        self.assertEqual(file_info['file_path'], 'perceval/backends/core/github.py')
+        self.assertIn('loc', file_info)
+        self.assertNotIn('ccn', file_info)
+        self.assertListEqual(commit['data']['skipped'],
+                             [{'file_path': 'perceval/backends/core/github.py',
+                               'analyzer': 'lizard',
+                               'reason': SKIP_TOO_LARGE}])
+
+    def test_fetch_commit_timeout(self):
+        """Test whether the files are skipped once the time to analyze the commit is over"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path,
+                   in_paths=['perceval/backends/core/github.py'], commit_timeout=1e-9)
+        commits = [commit for commit in cc.fetch()]
+
+        self.assertEqual(len(commits), 1)
+
+        commit = commits[0]
+        self.assertListEqual(commit['data']['analysis'], [])
+        self.assertListEqual(commit['data']['skipped'],
+                             [{'file_path': 'perceval/backends/core/github.py',
+                               'analyzer': None,
+                               'reason': SKIP_COMMIT_TIMEOUT}])
+
 
 class TestFileAnalyzer(TestCaseAnalyzer):
     """FileAnalyzer tests"""
@@ -180,6 +516,29 @@ class TestFileAnalyzer(TestCaseAnalyzer):
             self.assertIn('start', fd)
             self.assertIn('end', fd)
 
+    def test_analyze_skipped(self):
+        """Test whether the analyze method keeps the results of Cloc when Lizard is skipped"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        file_analyzer = FileAnalyzer()
+
+        with self.assertRaises(AnalysisSkippedError):
+            file_analyzer.analyze(file_path, max_file_size={'lizard': 1})
+
+        skipped = []
+        analysis = file_analyzer.analyze(file_path, max_file_size={'lizard': 1}, skipped=skipped)
+
+        self.assertIn('loc', analysis)
+        self.assertIn('blanks', analysis)
+        self.assertIn('comments', analysis)
+        self.assertNotIn('ccn', analysis)
+        self.assertEqual(len(skipped), 1)
+        self.assertEqual(skipped[0].analyzer, 'lizard')
+        self.assertEqual(skipped[0].reason, SKIP_TOO_LARGE)
+
+        with self.assertRaises(AnalysisSkippedError):
+            file_analyzer.analyze(file_path, max_file_size=1, skipped=skipped)
+
 
 class TestCoComCommand(unittest.TestCase):
     """CoComCommand tests"""
@@ -189,6 +548,55 @@ class TestCoComCommand(unittest.TestCase):
 
         self.assertIs(CoComCommand.BACKEND, CoCom)
 
+    def test_setup_cmd_parser(self):
+        """Test if the parser object is correctly initialized"""
+
+        parser = CoComCommand.setup_cmd_parser()
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath']
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.workers, 1)
+        self.assertIsNone(parsed_args.cost_model)
+        self.assertIsNone(parsed_args.chunk_size)
+        self.assertIsNone(parsed_args.top_funs)
+        self.assertEqual(parsed_args.rank_funs_by, 'ccn')
+        self.assertEqual(parsed_args.top_funs_scope, 'file')
+        self.assertIsNone(parsed_args.min_ccn)
+        self.assertIsNone(parsed_args.min_loc)
+        self.assertFalse(parsed_args.incremental)
+        self.assertFalse(parsed_args.summary)
+        self.assertFalse(parsed_args.distributions)
+        self.assertIsNone(parsed_args.rollup_depth)
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath',
+                '--workers', '4',
+                '--cost-model', '/tmp/costs.json',
+                '--chunk-size', '100',
+                '--top-funs', '10',
+                '--rank-funs-by', 'loc',
+                '--top-funs-scope', 'commit',
+                '--min-ccn', '2',
+                '--min-loc', '5',
+                '--incremental',
+                '--summary',
+                '--distributions',
+                '--rollup-depth', '2']
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.workers, 4)
+        self.assertEqual(parsed_args.cost_model, '/tmp/costs.json')
+        self.assertEqual(parsed_args.chunk_size, 100)
+        self.assertEqual(parsed_args.top_funs, 10)
+        self.assertEqual(parsed_args.rank_funs_by, 'loc')
+        self.assertEqual(parsed_args.top_funs_scope, 'commit')
+        self.assertEqual(parsed_args.min_ccn, 2)
+        self.assertEqual(parsed_args.min_loc, 5)
+        self.assertTrue(parsed_args.incremental)
+        self.assertTrue(parsed_args.summary)
+        self.assertTrue(parsed_args.distributions)
+        self.assertEqual(parsed_args.rollup_depth, 2)
+
 
 if __name__ == "__main__":
     unittest.main()
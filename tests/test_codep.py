@@ -107,6 +107,23 @@ class TestCoDepBackend(TestCaseGraal):
         self.assertIn('links', result['packages'])
         self.assertTrue(type(result['packages']['links']), list)
 
+    def test_fetch_entrypoints(self):
+        """Test whether several entrypoints are analyzed on the same commits"""
+
+        cd = CoDep('http://example.com', self.git_path, self.worktree_path, entrypoint="perceval")
+        expected = [commit['data']['analysis'] for commit in cd.fetch()]
+
+        entrypoints = ["perceval", "perceval/backends"]
+        cd = CoDep('http://example.com', self.git_path, self.worktree_path, entrypoint=entrypoints)
+        commits = [commit for commit in cd.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        for commit, analysis in zip(commits, expected):
+            result = commit['data']['analysis']
+            self.assertListEqual(sorted(result.keys()), entrypoints)
+            self.assertDictEqual(result['perceval'], analysis)
+            self.assertIn('classes', result['perceval/backends'])
+
 
 class TestDependencyAnalyzer(TestCaseAnalyzer):
     """DependencyAnalyzer tests"""
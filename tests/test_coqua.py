@@ -103,6 +103,23 @@ class TestCoQuaBackend(TestCaseGraal):
         self.assertIn('warnings', result)
         self.assertTrue(type(result['warnings']), int)
 
+    def test_fetch_entrypoints(self):
+        """Test whether several entrypoints are analyzed on the same commits"""
+
+        cd = CoQua('http://example.com', self.git_path, self.worktree_path, entrypoint="perceval")
+        expected = [commit['data']['analysis'] for commit in cd.fetch()]
+
+        entrypoints = ["perceval", "perceval/backends"]
+        cd = CoQua('http://example.com', self.git_path, self.worktree_path, entrypoint=entrypoints)
+        commits = [commit for commit in cd.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        for commit, analysis in zip(commits, expected):
+            result = commit['data']['analysis']
+            self.assertListEqual(sorted(result.keys()), entrypoints)
+            self.assertDictEqual(result['perceval'], analysis)
+            self.assertIn('quality', result['perceval/backends'])
+
 
 class TestModuleAnalyzer(TestCaseAnalyzer):
     """ModuleAnalyzer tests"""
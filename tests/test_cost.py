@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from graal.cost import CostModel
+
+
+class TestCostModel(unittest.TestCase):
+    """CostModel tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+        self.store_path = os.path.join(self.tmp_path, 'costs', 'costs.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_init(self):
+        """Test initialization"""
+
+        model = CostModel()
+        self.assertIsNone(model.store_path)
+        self.assertEqual(model.scope, 'default')
+        self.assertDictEqual(model.files, {})
+        self.assertDictEqual(model.extensions, {})
+
+        model = CostModel(self.store_path, scope='http://example.com')
+        self.assertEqual(model.store_path, self.store_path)
+        self.assertEqual(model.scope, 'http://example.com')
+
+    def test_predict_no_history(self):
+        """Test whether predictions without history depend on the size of the files"""
+
+        model = CostModel()
+
+        small = model.predict('a.c', 100)
+        big = model.predict('b.c', 10 ** 7)
+        self.assertGreater(big, small)
+        self.assertAlmostEqual(small, CostModel.DEFAULT_OVERHEAD + 100 * CostModel.DEFAULT_RATE)
+
+    def test_predict_extension(self):
+        """Test whether unseen files are predicted with the model of their extension"""
+
+        model = CostModel()
+        model.record('a.c', 1000, 1.1)
+        model.record('b.c', 2000, 2.1)
+        model.record('c.c', 3000, 3.1)
+
+        self.assertAlmostEqual(model.predict('d.c', 4000), 4.1)
+        self.assertAlmostEqual(model.predict('e.c', 0), 0.1)
+
+        # unknown extensions rely on the model of all files
+        self.assertAlmostEqual(model.predict('f.java', 4000), 4.1)
+
+    def test_predict_file(self):
+        """Test whether known files are predicted with their history"""
+
+        model = CostModel()
+        model.record('a.py', 1000, 0.5)
+        model.record('b.py', 1000, 0.1)
+
+        self.assertGreater(model.predict('a.py', 1000), model.predict('b.py', 1000))
+
+        model.record('a.py', 1000, 0.1)
+        self.assertAlmostEqual(model.files['a.py']['seconds'], 0.3)
+        self.assertEqual(model.files['a.py']['runs'], 2)
+
+    def test_schedule(self):
+        """Test whether files are sorted from the most to the least expensive"""
+
+        model = CostModel()
+        model.record('slow.c', 10, 5.0)
+        model.record('fast.c', 10, 0.01)
+
+        files = [('fast.c', 10), ('new.c', 10 ** 6), ('slow.c', 10)]
+        schedule = model.schedule(files)
+
+        self.assertListEqual([f[0] for f in schedule], ['slow.c', 'new.c', 'fast.c'])
+
+    def test_dump(self):
+        """Test whether the model is dumped from the most to the least expensive file"""
+
+        model = CostModel()
+        model.record('a.c', 10, 1.0)
+        model.record('b.c', 10, 3.0)
+        model.record('c.py', 10, 2.0)
+
+        dump = model.dump()
+        self.assertListEqual([e['path'] for e in dump], ['b.c', 'c.py', 'a.c'])
+        self.assertDictEqual(dump[1], {'path': 'c.py', 'ext': 'py', 'size': 10, 'seconds': 2.0, 'runs': 1})
+
+        dump = model.dump(top=1)
+        self.assertListEqual([e['path'] for e in dump], ['b.c'])
+
+    def test_save_load(self):
+        """Test whether the model is persisted and restored"""
+
+        model = CostModel(self.store_path, scope='repo-a')
+        model.record('a.c', 10, 1.0)
+        model.save()
+
+        other = CostModel(self.store_path, scope='repo-b')
+        other.record('b.c', 10, 2.0)
+        other.save()
+
+        with open(self.store_path, 'r') as f:
+            content = json.load(f)
+        self.assertListEqual(sorted(content.keys()), ['repo-a', 'repo-b'])
+
+        model = CostModel(self.store_path, scope='repo-a')
+        self.assertListEqual(list(model.files.keys()), ['a.c'])
+        self.assertAlmostEqual(model.predict('a.c', 10), 1.0)
+
+    def test_save_no_store(self):
+        """Test whether nothing is saved when the store is not set"""
+
+        model = CostModel()
+        model.record('a.c', 10, 1.0)
+        model.save()
+
+        self.assertFalse(os.path.exists(self.store_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
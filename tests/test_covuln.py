@@ -32,7 +32,9 @@ from graal.backends.core.covuln import (CATEGORY_COVULN,
                                         CoVuln,
                                         VulnAnalyzer,
                                         CoVulnCommand)
-from graal.graal import GraalError
+from graal.graal import (SKIP_TIMEOUT,
+                         SKIP_TOO_LARGE,
+                         GraalError)
 from test_graal import TestCaseGraal
 from base_analyzer import TestCaseAnalyzer
 
@@ -122,6 +124,50 @@ class TestCoVulnBackend(TestCaseGraal):
         self.assertIn('high', result['by_confidence'])
         self.assertTrue(type(result['by_confidence']['high']), int)
 
+    def test_fetch_limits(self):
+        """Test whether the files too large and the timed out scans are listed as skipped"""
+
+        cd = CoVuln('http://example.com', self.git_path, self.worktree_path, entrypoint="perceval",
+                    max_file_size=1)
+        commits = [commit for commit in cd.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        for commit in commits:
+            self.assertEqual(commit['data']['analysis']['num_vulns'], 0)
+            self.assertGreater(len(commit['data']['skipped']), 0)
+
+            for skipped in commit['data']['skipped']:
+                self.assertTrue(skipped['file_path'].startswith('perceval/'))
+                self.assertEqual(skipped['analyzer'], 'bandit')
+                self.assertEqual(skipped['reason'], SKIP_TOO_LARGE)
+
+        cd = CoVuln('http://example.com', self.git_path, self.worktree_path, entrypoint="perceval",
+                    file_timeout=1e-9)
+        commits = [commit for commit in cd.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        for commit in commits:
+            self.assertDictEqual(commit['data']['analysis'], {})
+            self.assertListEqual(commit['data']['skipped'],
+                                 [{'file_path': 'perceval', 'analyzer': 'bandit', 'reason': SKIP_TIMEOUT}])
+
+    def test_fetch_entrypoints(self):
+        """Test whether several entrypoints are analyzed on the same commits"""
+
+        cd = CoVuln('http://example.com', self.git_path, self.worktree_path, entrypoint="perceval")
+        expected = [commit['data']['analysis'] for commit in cd.fetch()]
+
+        entrypoints = ["perceval", "perceval/backends"]
+        cd = CoVuln('http://example.com', self.git_path, self.worktree_path, entrypoint=entrypoints)
+        commits = [commit for commit in cd.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        for commit, analysis in zip(commits, expected):
+            result = commit['data']['analysis']
+            self.assertListEqual(sorted(result.keys()), entrypoints)
+            self.assertDictEqual(result['perceval'], analysis)
+            self.assertIn('num_vulns', result['perceval/backends'])
+
 
 class TestModuleAnalyzer(TestCaseAnalyzer):
     """ModuleAnalyzer tests"""
@@ -21,7 +21,10 @@
 #     Valerio Cosentino <valcos@bitergia.com>
 #
 
+import argparse
+import fcntl
 import io
+import json
 import os
 import shutil
 import subprocess
@@ -36,11 +39,22 @@ from perceval.errors import RepositoryError
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
 
 import graal
+from graal.memory import MemoryTracker
+from graal.metrics import COMMITS, ITEMS
+from graal.perf import Timings
 from graal.graal import (DEFAULT_WORKTREE_PATH,
                          CATEGORY_GRAAL,
+                         SKIP_COMMIT_TIMEOUT,
+                         SKIP_TIMEOUT,
+                         AnalysisSkippedError,
                          Graal,
                          GraalCommand,
-                         GraalRepository)
+                         GraalError,
+                         GraalRepository,
+                         SnapshotPipeline,
+                         SnapshotSequence,
+                         WorktreePool,
+                         size_limit)
 
 
 CATEGORY_MOCKED = 'mocked'
@@ -75,9 +89,12 @@ class MockedGraal(Graal):
 
     def __init__(self, uri, gitpath, worktreepath=DEFAULT_WORKTREE_PATH,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
-                 tag=None, archive=None, raise_exception=False):
+                 pipeline=False, perf=False, memory=False, memory_limit=None, memory_spill=False,
+                 progress=False, status_file=None, tag=None, archive=None, raise_exception=False):
         super().__init__(uri, gitpath, worktreepath=worktreepath, entrypoint=entrypoint,
                          in_paths=in_paths, out_paths=out_paths, details=details,
+                         pipeline=pipeline, perf=perf, memory=memory, memory_limit=memory_limit,
+                         memory_spill=memory_spill, progress=progress, status_file=status_file,
                          tag=tag, archive=archive)
         self.raise_exception = raise_exception
 
@@ -212,6 +229,12 @@ class TestGraalBackend(TestCaseGraal):
         self.assertIsNone(graal.in_paths)
         self.assertIsNone(graal.out_paths)
         self.assertFalse(graal.details)
+        self.assertFalse(graal.recycle_worktree)
+        self.assertIsNone(graal.tmpfs_path)
+        self.assertFalse(graal.pipeline)
+        self.assertIsNone(graal.file_timeout)
+        self.assertIsNone(graal.commit_timeout)
+        self.assertIsNone(graal.max_file_size)
 
         # When tag is empty or None it will be set to the value in uri
         graal = Graal('http://example.com', self.git_path, self.worktree_path)
@@ -283,6 +306,430 @@ class TestGraalBackend(TestCaseGraal):
         self.assertFalse('parents' in commit['data'])
         self.assertFalse('refs' in commit['data'])
 
+    def test_fetch_memory(self):
+        """Test whether the memory used by each commit is added to the metadata"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        commits = [commit for commit in mocked.fetch()]
+
+        for commit in commits:
+            self.assertNotIn('memory', commit)
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             perf=True, memory=True)
+        commits = [commit for commit in mocked.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        for commit in commits:
+            keys = list(commit.keys())
+            self.assertEqual(keys.index('memory'), keys.index('perf') + 1)
+            self.assertNotIn('__memory', commit['data'])
+
+            memory = commit['memory']
+            self.assertGreater(memory['peak'], 0)
+            self.assertGreater(len(memory['top']), 0)
+            self.assertIn('children', memory)
+            self.assertIn('children_max_rss', memory)
+
+    def test_fetch_memory_limit(self):
+        """Test whether the commits above the memory limit are reported and spilled"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             memory=True, memory_limit=1)
+        with unittest.mock.patch.object(MockedGraal, '_spill') as mock_spill:
+            with self.assertLogs('graal.graal', level='WARNING') as cm:
+                commits = [commit for commit in mocked.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        self.assertEqual(len(cm.output), 3)
+        self.assertIn('above the limit of 1 bytes', cm.output[0])
+        self.assertEqual(mock_spill.call_count, 0)
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             memory=True, memory_limit=1, memory_spill=True)
+        with unittest.mock.patch.object(MockedGraal, '_spill') as mock_spill:
+            commits = [commit for commit in mocked.fetch()]
+
+        self.assertEqual(mock_spill.call_count, 3)
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             memory=True, memory_limit=2 ** 40, memory_spill=True)
+        with unittest.mock.patch.object(MockedGraal, '_spill') as mock_spill:
+            commits = [commit for commit in mocked.fetch()]
+
+        self.assertEqual(mock_spill.call_count, 0)
+
+    def test_fetch_memory_spill_error(self):
+        """Test whether spilling is refused by the backends which hold no memory across commits"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             memory=True, memory_limit=1, memory_spill=True)
+        with self.assertRaisesRegex(GraalError, 'MockedGraal holds no memory across commits'):
+            _ = [commit for commit in mocked.fetch()]
+
+    def test_fetch_memory_begin(self):
+        """Test whether the memory of a commit is measured before parsing and checking it out"""
+
+        events = []
+        begin_commit = MemoryTracker.begin_commit
+        checkout = GraalRepository.checkout
+
+        def record_begin(tracker):
+            events.append('begin')
+            begin_commit(tracker)
+
+        def record_checkout(repo, hash):
+            events.append('checkout')
+            checkout(repo, hash)
+
+        for pipeline in [False, True]:
+            events.clear()
+            mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                 pipeline=pipeline, memory=True)
+            with unittest.mock.patch.object(MemoryTracker, 'begin_commit', autospec=True, side_effect=record_begin), \
+                    unittest.mock.patch.object(GraalRepository, 'checkout', autospec=True, side_effect=record_checkout):
+                commits = [commit for commit in mocked.fetch()]
+
+            self.assertEqual(len(commits), 3)
+            self.assertEqual(events[0], 'begin')
+            self.assertEqual(events.count('begin'), 4)
+
+    def test_fetch_progress(self):
+        """Test whether the progress of the analysis is reported"""
+
+        status_path = os.path.join(self.tmp_path, 'status.json')
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             progress=True, status_file=status_path)
+        with self.assertLogs('graal', level='INFO') as cm:
+            commits = [commit for commit in mocked.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        self.assertIn('INFO:graal.graal:3 commits to process', cm.output)
+
+        reports = [line for line in cm.output if line.startswith('INFO:graal.progress:Progress')]
+        self.assertGreaterEqual(len(reports), 2)
+        self.assertTrue(reports[0].endswith(': 0 commits, 0.00 commits/s, ETA unknown, log'))
+        self.assertIn('3/3 commits (100.0%)', reports[-1])
+        self.assertTrue(reports[-1].endswith(', completed'))
+
+        with open(status_path) as f:
+            status = json.load(f)
+
+        self.assertEqual(status['name'], 'MockedGraal http://example.com')
+        self.assertEqual(status['state'], 'completed')
+        self.assertEqual(status['total'], 3)
+        self.assertEqual(status['done'], 3)
+        self.assertEqual(status['percent'], 100.0)
+        self.assertIsNone(status['stage'])
+
+    def test_fetch_progress_failed(self):
+        """Test whether a failed analysis is written to the status file"""
+
+        status_path = os.path.join(self.tmp_path, 'status_failed.json')
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             status_file=status_path, raise_exception=True)
+        with self.assertRaises(Exception):
+            _ = [commit for commit in mocked.fetch()]
+
+        with open(status_path) as f:
+            status = json.load(f)
+
+        self.assertEqual(status['state'], 'failed')
+        self.assertEqual(status['done'], 0)
+
+    def test_fetch_metrics(self):
+        """Test whether the commits and items fetched are counted"""
+
+        commits = COMMITS.labels('MockedGraal').value
+        items = ITEMS.labels('MockedGraal').value
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        _ = [commit for commit in mocked.fetch()]
+
+        self.assertEqual(COMMITS.labels('MockedGraal').value - commits, 3)
+        self.assertEqual(ITEMS.labels('MockedGraal').value - items, 3)
+
+    def test_fetch_recycle_worktree(self):
+        """Test whether the working tree is kept and reused across executions"""
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path, recycle_worktree=True)
+        commits = [commit for commit in graal.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        self.assertTrue(os.path.exists(graal.worktreepath))
+        self.assertTrue(os.path.exists(os.path.join(self.git_path, 'worktrees', 'graaltest', 'locked')))
+
+        marker = os.path.join(graal.worktreepath, 'untracked_file')
+        with open(marker, 'w') as f:
+            f.write('leftover')
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path, recycle_worktree=True)
+        commits = [commit for commit in graal.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        self.assertTrue(os.path.exists(graal.worktreepath))
+        self.assertFalse(os.path.exists(marker))
+
+        graal.graalRepo.prune()
+        self.assertFalse(os.path.exists(graal.worktreepath))
+        self.assertFalse(os.path.exists(os.path.join(self.git_path, 'worktrees', 'graaltest')))
+
+    def test_fetch_tmpfs(self):
+        """Test whether the working tree is placed on the memory-backed path when it fits"""
+
+        tmpfs_path = os.path.join(self.tmp_path, 'tmpfs')
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path, tmpfs_path=tmpfs_path)
+        items = graal.fetch()
+        commits = [next(items)]
+
+        self.assertEqual(graal.worktreepath, os.path.join(tmpfs_path, 'graaltest'))
+        self.assertTrue(os.path.exists(graal.worktreepath))
+
+        commits.extend([commit for commit in items])
+        self.assertEqual(len(commits), 3)
+        self.assertFalse(os.path.exists(graal.worktreepath))
+
+    @unittest.mock.patch('graal.graal.GraalRepository.tree_size')
+    def test_fetch_tmpfs_fallback(self, mock_tree_size):
+        """Test whether the working tree is placed on disk when it does not fit on the memory-backed path"""
+
+        mock_tree_size.return_value = (2 ** 62, 1)
+        tmpfs_path = os.path.join(self.tmp_path, 'tmpfs')
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path, tmpfs_path=tmpfs_path)
+        items = graal.fetch()
+        commits = [next(items)]
+
+        self.assertEqual(graal.worktreepath, os.path.join(self.worktree_path, 'graaltest'))
+        self.assertTrue(os.path.exists(graal.worktreepath))
+
+        commits.extend([commit for commit in items])
+        self.assertEqual(len(commits), 3)
+
+    @unittest.mock.patch('os.statvfs')
+    @unittest.mock.patch('graal.graal.GraalRepository.tree_size')
+    def test_fetch_tmpfs_pipeline(self, mock_tree_size, mock_statvfs):
+        """Test whether the working trees of the pipeline are placed together, when all of them fit"""
+
+        mock_tree_size.return_value = (1000, 1)
+        tmpfs_path = os.path.join(self.tmp_path, 'tmpfs')
+
+        # 1500 bytes are needed for each working tree
+        for available, expected in [(2000, self.worktree_path), (3000, tmpfs_path)]:
+            mock_statvfs.return_value = unittest.mock.Mock(f_bavail=available, f_frsize=1)
+
+            graal = Graal('http://example.com', self.git_path, self.worktree_path,
+                          tmpfs_path=tmpfs_path, pipeline=True)
+            items = graal.fetch()
+            commits = [next(items)]
+
+            self.assertEqual(graal.worktreepool.worktreepath, expected)
+            self.assertListEqual(graal.worktreepool.slots(), [os.path.join(expected, 'graaltest'),
+                                                              os.path.join(expected, 'graaltest-1')])
+            other = tmpfs_path if expected == self.worktree_path else self.worktree_path
+            self.assertListEqual(graal.worktreepool.slots(other), [])
+
+            commits.extend([commit for commit in items])
+            self.assertEqual(len(commits), 3)
+
+    def test_fetch_pipeline(self):
+        """Test whether the pipelined fetch returns the same commits in the same order"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        expected = [commit['data'] for commit in mocked.fetch()]
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, pipeline=True)
+        commits = [commit['data'] for commit in mocked.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        self.assertListEqual([c['commit'] for c in commits], [c['commit'] for c in expected])
+        self.assertListEqual([c['analysis'] for c in commits], [c['analysis'] for c in expected])
+        self.assertFalse(os.path.exists(os.path.join(self.worktree_path, 'graaltest')))
+        self.assertFalse(os.path.exists(os.path.join(self.worktree_path, 'graaltest-1')))
+
+    def test_fetch_perf(self):
+        """Test whether the time spent in each stage is added to the metadata"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        commits = [commit for commit in mocked.fetch()]
+
+        for commit in commits:
+            self.assertNotIn('perf', commit)
+            self.assertNotIn('__perf', commit['data'])
+
+        for pipeline in [False, True]:
+            mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                 pipeline=pipeline, perf=True)
+            with self.assertLogs('graal.graal', level='INFO') as cm:
+                commits = [commit for commit in mocked.fetch()]
+
+            self.assertEqual(len(commits), 3)
+            for commit in commits:
+                keys = list(commit.keys())
+                self.assertEqual(keys.index('perf'), keys.index('backend_version') + 1)
+                self.assertNotIn('__perf', commit['data'])
+
+                perf = commit['perf']
+                self.assertListEqual(sorted(perf.keys()), ['analyze', 'checkout', 'log', 'post'])
+                for timing in perf.values():
+                    self.assertEqual(timing['calls'], 1)
+                    self.assertGreaterEqual(timing['wall'], 0)
+                    self.assertGreaterEqual(timing['cpu'], 0)
+
+            self.assertIn('Time spent in 3 commits:', '\n'.join(cm.output))
+
+    def test_fetch_pipeline_on_error(self):
+        """Test whether errors raised during the pipelined fetch are propagated"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             pipeline=True, raise_exception=True)
+        with self.assertRaises(Exception):
+            _ = [commit for commit in mocked.fetch()]
+
+        pool = WorktreePool(self.git_path, self.worktree_path)
+        self.assertFalse(pool.is_leased(pool.slot(0)))
+        self.assertFalse(pool.is_leased(pool.slot(1)))
+
+    def test_fetch_concurrent(self):
+        """Test whether executions on the same mirror do not interfere"""
+
+        graal_a = Graal('http://example.com', self.git_path, self.worktree_path)
+        graal_b = Graal('http://example.com', self.git_path, self.worktree_path)
+
+        items_a = graal_a.fetch()
+        items_b = graal_b.fetch()
+
+        commits_a = [next(items_a)]
+        commits_b = [next(items_b)]
+        self.assertNotEqual(graal_a.worktreepath, graal_b.worktreepath)
+        self.assertTrue(os.path.exists(graal_a.worktreepath))
+        self.assertTrue(os.path.exists(graal_b.worktreepath))
+
+        commits_a.extend([commit for commit in items_a])
+        self.assertFalse(os.path.exists(graal_a.worktreepath))
+        self.assertTrue(os.path.exists(graal_b.worktreepath))
+
+        commits_b.extend([commit for commit in items_b])
+        self.assertFalse(os.path.exists(graal_b.worktreepath))
+
+        self.assertEqual(len(commits_a), 3)
+        self.assertEqual(len(commits_b), 3)
+        self.assertListEqual([c['data']['commit'] for c in commits_a],
+                             [c['data']['commit'] for c in commits_b])
+
+    def test_analyze_entrypoints(self):
+        """Test whether each entrypoint is analyzed"""
+
+        def analyze(commit, entrypoint):
+            return {'commit': commit, 'entrypoint': entrypoint}
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path, entrypoint='module')
+        self.assertDictEqual(graal._analyze_entrypoints('sha', analyze),
+                             {'commit': 'sha', 'entrypoint': 'module'})
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path, entrypoint=['module', 'other'])
+        self.assertDictEqual(graal._analyze_entrypoints('sha', analyze),
+                             {'module': {'commit': 'sha', 'entrypoint': 'module'},
+                              'other': {'commit': 'sha', 'entrypoint': 'other'}})
+
+    def test_timeout(self):
+        """Test whether the timeout of the analyzers is bounded by the commit deadline"""
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path)
+        graal._start_commit()
+        self.assertIsNone(graal._timeout('file'))
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path, file_timeout=10)
+        graal._start_commit()
+        self.assertEqual(graal._timeout('file'), 10)
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path,
+                      file_timeout=10, commit_timeout=5)
+        graal._start_commit()
+        self.assertLessEqual(graal._timeout('file'), 5)
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path,
+                      file_timeout=10, commit_timeout=1e-9)
+        graal._start_commit()
+        with self.assertRaises(AnalysisSkippedError) as e:
+            graal._timeout('file')
+
+        self.assertEqual(e.exception.reason, SKIP_COMMIT_TIMEOUT)
+        self.assertEqual(e.exception.target, 'file')
+        self.assertIsNone(e.exception.analyzer)
+
+    def test_fetch_skipped(self):
+        """Test whether the skipped targets are listed in the items"""
+
+        class SkippingGraal(MockedGraal):
+            def _analyze(self, commit, paths=None):
+                target = os.path.join(self.worktreepath, 'big.py')
+                self._skip(AnalysisSkippedError(cause="timeout", target=target,
+                                                reason=SKIP_TIMEOUT, analyzer='lizard'))
+                return super()._analyze(commit, paths=paths)
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        commits = [commit for commit in mocked.fetch()]
+
+        for commit in commits:
+            self.assertNotIn('skipped', commit['data'])
+
+        mocked = SkippingGraal('http://example.com', self.git_path, self.worktree_path)
+        commits = [commit for commit in mocked.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        for commit in commits:
+            self.assertIn('lines_modified', commit['data']['analysis'])
+            self.assertListEqual(commit['data']['skipped'],
+                                 [{'file_path': 'big.py', 'analyzer': 'lizard', 'reason': SKIP_TIMEOUT}])
+
+    def test_plan(self):
+        """Test whether the cost of the analysis is estimated without checking out the commits"""
+
+        git_path = os.path.join(self.tmp_path, 'plan_mirror')
+        graal = Graal(os.path.join(self.tmp_repo_path, 'graaltest'), git_path, self.worktree_path)
+        estimate = graal.plan()
+
+        self.assertEqual(estimate['backend_name'], 'Graal')
+        self.assertEqual(estimate['origin'], os.path.join(self.tmp_repo_path, 'graaltest'))
+        self.assertEqual(estimate['commits'], 3)
+        self.assertEqual(estimate['analyzed_commits'], 3)
+        self.assertEqual(estimate['skipped_commits'], 0)
+        self.assertFalse(estimate['incremental'])
+
+        # the commits have 12, 13 and 15 files, while the
+        # next commits change 1 and 2 files respectively
+        self.assertDictEqual(estimate['analyses'], {'full': 40, 'incremental': 15})
+        self.assertDictEqual(estimate['cache'], {'hits': 0, 'misses': 0})
+        self.assertIsNone(estimate['seconds'])
+        self.assertIsNone(estimate['estimated_wall'])
+
+        self.assertTrue(os.path.exists(git_path))
+        self.assertFalse(os.path.exists(graal.worktreepath))
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path, entrypoint='perceval')
+        estimate = graal.plan(from_date=str_to_datetime('2018-05-18 16:27:00 +0000'))
+        self.assertEqual(estimate['commits'], 2)
+        self.assertDictEqual(estimate['analyses'], {'full': 24, 'incremental': 12})
+
+    def test_plan_filter(self):
+        """Test whether the commits filtered are not estimated"""
+
+        def filter_commit(commit):
+            return commit['commit'] == '4f3b403d47fb291a9a942a62d62c24faa79244c8'
+
+        graal = Graal('http://example.com', self.git_path, self.worktree_path)
+        with unittest.mock.patch.object(graal, '_filter_commit', side_effect=filter_commit):
+            estimate = graal.plan()
+
+        self.assertEqual(estimate['commits'], 3)
+        self.assertEqual(estimate['analyzed_commits'], 2)
+        self.assertEqual(estimate['skipped_commits'], 1)
+        self.assertDictEqual(estimate['analyses'], {'full': 27, 'incremental': 15})
+
     def test_fetch_analysis_on_error(self):
         mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, raise_exception=True)
         with self.assertRaises(Exception):
@@ -351,6 +798,76 @@ class TestGraalRepository(TestCaseGraal):
         repo.prune()
         self.assertFalse(os.path.exists(repo.worktreepath))
 
+    def test_is_worktree(self):
+        """Test whether the working trees of the repository are recognized"""
+
+        new_path = os.path.join(self.tmp_path, 'testworktree')
+
+        repo = GraalRepository('http://example.git', self.git_path)
+        self.assertFalse(repo.is_worktree(new_path))
+        self.assertFalse(repo.is_worktree(self.tmp_path))
+
+        repo.worktree(new_path)
+        self.assertTrue(repo.is_worktree(new_path))
+
+        repo.prune()
+        self.assertFalse(repo.is_worktree(new_path))
+
+    def test_reuse_worktree(self):
+        """Test whether an existing working tree is cleaned and reused"""
+
+        new_path = os.path.join(self.tmp_path, 'testworktree')
+
+        repo = GraalRepository('http://example.git', self.git_path)
+        repo.worktree(new_path)
+        repo.lock()
+        repo.checkout("075f0c6161db5a3b1c8eca45e08b88469bb148b9")
+
+        modified = os.path.join(new_path, 'perceval/_version.py')
+        untracked = os.path.join(new_path, 'untracked_file')
+        with open(modified, 'w') as f:
+            f.write('modified')
+        with open(untracked, 'w') as f:
+            f.write('untracked')
+
+        repo = GraalRepository('http://example.git', self.git_path)
+        repo.reuse_worktree(new_path)
+        self.assertEqual(repo.worktreepath, new_path)
+        self.assertFalse(os.path.exists(untracked))
+        with open(modified, 'r') as f:
+            self.assertNotEqual(f.read(), 'modified')
+
+        repo.checkout("825b4da7ca740f7f2abbae1b3402908a44d130cd")
+        current_commit_hash = self.__git_show_hash(repo)
+        self.assertEqual("825b4da7ca740f7f2abbae1b3402908a44d130cd", current_commit_hash)
+
+        repo.prune()
+        self.assertFalse(os.path.exists(repo.worktreepath))
+        self.assertFalse(repo.is_worktree(new_path))
+
+    def test_lock(self):
+        """Test whether a working tree is locked and unlocked"""
+
+        new_path = os.path.join(self.tmp_path, 'testworktree')
+        locked = os.path.join(self.git_path, 'worktrees', 'testworktree', 'locked')
+
+        repo = GraalRepository('http://example.git', self.git_path)
+        repo.worktree(new_path)
+        self.assertFalse(os.path.exists(locked))
+
+        repo.lock()
+        self.assertTrue(os.path.exists(locked))
+
+        # locking twice has no effect
+        repo.lock()
+        self.assertTrue(os.path.exists(locked))
+
+        repo.unlock()
+        self.assertFalse(os.path.exists(locked))
+
+        repo.prune()
+        self.assertFalse(os.path.exists(repo.worktreepath))
+
     def test_worktree_on_error(self):
         """Test whether a RepositoryError is thrown in case of error"""
 
@@ -427,6 +944,140 @@ class TestGraalRepository(TestCaseGraal):
         file_obj = repo.archive("825b4da7ca740f7f2abbae1b3402908a44d130cd")
         self.assertIsNone(file_obj)
 
+    def test_tree_size(self):
+        """Test whether the size of a checkout is estimated"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        size, nfiles = repo.tree_size("825b4da7ca740f7f2abbae1b3402908a44d130cd")
+        self.assertEqual(nfiles, 15)
+        self.assertEqual(size % GraalRepository.PAGE_SIZE, 0)
+        self.assertGreaterEqual(size, nfiles * GraalRepository.PAGE_SIZE)
+
+        size_head, _ = repo.tree_size()
+        self.assertGreater(size_head, 0)
+
+    def test_tree_size_on_error(self):
+        """Test whether a RepositoryError is thrown in case of error"""
+
+        repo = MockedGraalRepository('http://example.git', self.git_path, raise_exception=True)
+        with self.assertRaises(RepositoryError):
+            repo.tree_size("825b4da7ca740f7f2abbae1b3402908a44d130cd")
+
+    def test_changed_files(self):
+        """Test whether the files modified between two commits are listed"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        changed = repo.changed_files("075f0c6161db5a3b1c8eca45e08b88469bb148b9",
+                                     "825b4da7ca740f7f2abbae1b3402908a44d130cd")
+        self.assertSetEqual(changed, {'.travis.yml', '.gitattributes', '.gitignore'})
+
+        changed = repo.changed_files("825b4da7ca740f7f2abbae1b3402908a44d130cd",
+                                     "825b4da7ca740f7f2abbae1b3402908a44d130cd")
+        self.assertSetEqual(changed, set())
+
+    def test_changed_files_on_error(self):
+        """Test whether a RepositoryError is thrown in case of error"""
+
+        repo = MockedGraalRepository('http://example.git', self.git_path, raise_exception=True)
+        with self.assertRaises(RepositoryError):
+            repo.changed_files("075f0c6161db5a3b1c8eca45e08b88469bb148b9",
+                               "825b4da7ca740f7f2abbae1b3402908a44d130cd")
+
+    def test_file_sizes(self):
+        """Test whether the files of a commit are listed with their size"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        sizes = repo.file_sizes("075f0c6161db5a3b1c8eca45e08b88469bb148b9")
+        self.assertEqual(len(sizes), 12)
+        self.assertEqual(sizes['perceval/__init__.py'], 879)
+        self.assertEqual(sizes['perceval/archive.py'], 16663)
+
+        sizes = repo.file_sizes()
+        self.assertEqual(len(sizes), 15)
+        self.assertEqual(sizes['.gitignore'], 121)
+
+    def test_file_sizes_on_error(self):
+        """Test whether a RepositoryError is thrown in case of error"""
+
+        repo = MockedGraalRepository('http://example.git', self.git_path, raise_exception=True)
+        with self.assertRaises(RepositoryError):
+            repo.file_sizes("075f0c6161db5a3b1c8eca45e08b88469bb148b9")
+
+    def test_file_blobs(self):
+        """Test whether the files of a commit are listed with their blobs"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        blobs = repo.file_blobs("075f0c6161db5a3b1c8eca45e08b88469bb148b9")
+        self.assertListEqual(sorted(blobs), sorted(repo.file_sizes("075f0c6161db5a3b1c8eca45e08b88469bb148b9")))
+
+        blobs = repo.file_blobs()
+        self.assertEqual(len(blobs), 15)
+        self.assertEqual(blobs['.gitignore'], 'e6b98b9063d838831678d8e2d834c46d808dbcd0')
+
+    def test_file_blobs_on_error(self):
+        """Test whether a RepositoryError is thrown in case of error"""
+
+        repo = MockedGraalRepository('http://example.git', self.git_path, raise_exception=True)
+        with self.assertRaises(RepositoryError):
+            repo.file_blobs("075f0c6161db5a3b1c8eca45e08b88469bb148b9")
+
+    def test_changed_blobs(self):
+        """Test whether the files modified between two commits are listed with their blobs"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        blobs = repo.changed_blobs("075f0c6161db5a3b1c8eca45e08b88469bb148b9",
+                                   "825b4da7ca740f7f2abbae1b3402908a44d130cd")
+        expected = {
+            '.gitattributes': '7811596e5875baae3ab31f84559e99c3174ca26a',
+            '.gitignore': 'e6b98b9063d838831678d8e2d834c46d808dbcd0',
+            '.travis.yml': '6db8fb8ad11c710b7a60982ef6627ee2f4559018'
+        }
+        self.assertDictEqual(blobs, expected)
+
+        blobs = repo.changed_blobs("825b4da7ca740f7f2abbae1b3402908a44d130cd",
+                                   "075f0c6161db5a3b1c8eca45e08b88469bb148b9")
+        self.assertDictEqual(blobs, {path: None for path in expected})
+
+        blobs = repo.changed_blobs("825b4da7ca740f7f2abbae1b3402908a44d130cd",
+                                   "825b4da7ca740f7f2abbae1b3402908a44d130cd")
+        self.assertDictEqual(blobs, {})
+
+    def test_changed_blobs_on_error(self):
+        """Test whether a RepositoryError is thrown in case of error"""
+
+        repo = MockedGraalRepository('http://example.git', self.git_path, raise_exception=True)
+        with self.assertRaises(RepositoryError):
+            repo.changed_blobs("075f0c6161db5a3b1c8eca45e08b88469bb148b9",
+                               "825b4da7ca740f7f2abbae1b3402908a44d130cd")
+
+    def test_blob_sizes(self):
+        """Test whether the size of the blobs is returned"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        sizes = repo.blob_sizes(['e6b98b9063d838831678d8e2d834c46d808dbcd0',
+                                 '7811596e5875baae3ab31f84559e99c3174ca26a',
+                                 '0000000000000000000000000000000000000001'])
+        expected = {
+            'e6b98b9063d838831678d8e2d834c46d808dbcd0': 121,
+            '7811596e5875baae3ab31f84559e99c3174ca26a': 31
+        }
+        self.assertDictEqual(sizes, expected)
+        self.assertDictEqual(repo.blob_sizes([]), {})
+
+    @unittest.mock.patch('subprocess.Popen', side_effect=OSError)
+    def test_blob_sizes_on_error(self, mock_popen):
+        """Test whether a RepositoryError is thrown in case of error"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+        with self.assertRaises(RepositoryError):
+            repo.blob_sizes(['e6b98b9063d838831678d8e2d834c46d808dbcd0'])
+
     def test_tar_obj(self):
         """Test whether a BytesIO object is converted to a tar object"""
 
@@ -506,6 +1157,25 @@ class TestGraalRepository(TestCaseGraal):
         self.assertEqual(GraalRepository.extension('tests/requirements.txt'), 'txt')
         self.assertEqual(GraalRepository.extension('LICENSE'), 'LICENSE')
 
+    def test_count_commits(self):
+        """Test whether the commits in a range are counted"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        self.assertEqual(repo.count_commits(), 3)
+        self.assertEqual(repo.count_commits(branches=['master']), 3)
+        self.assertEqual(repo.count_commits(branches=[]), 0)
+        self.assertEqual(repo.count_commits(from_date=str_to_datetime('2018-05-18 16:27:00 +0000')), 2)
+        self.assertEqual(repo.count_commits(to_date=str_to_datetime('2018-05-18 16:27:00 +0000')), 1)
+        self.assertEqual(repo.count_commits(from_date=str_to_datetime('2018-05-19')), 0)
+
+    def test_count_commits_on_error(self):
+        """Test whether an exception is thrown when the commits cannot be counted"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+        with self.assertRaises(RepositoryError):
+            repo.count_commits(branches=['unknown'])
+
     def test_files(self):
         """Test whether all files in a directory and its sub-directories are shown"""
 
@@ -579,6 +1249,290 @@ class TestGraalRepository(TestCaseGraal):
         return hash
 
 
+class MockedSnapshotRepository:
+    """Repository which records the checkouts performed"""
+
+    def __init__(self, name, log, fail_at=None):
+        self.worktreepath = name
+        self.log = log
+        self.fail_at = fail_at
+
+    def checkout(self, hash):
+        if hash == self.fail_at:
+            raise RepositoryError(cause="checkout failed")
+
+        self.log.append((self.worktreepath, hash))
+
+
+class TestSnapshotPipeline(unittest.TestCase):
+    """SnapshotPipeline tests"""
+
+    def test_order(self):
+        """Test whether snapshots are returned in the order of the commits"""
+
+        log = []
+        commits = [{'commit': str(i)} for i in range(20)]
+        repos = [MockedSnapshotRepository('a', log), MockedSnapshotRepository('b', log)]
+
+        pipeline = SnapshotPipeline(iter(commits), repos, lambda c: c['commit'] == '5')
+        hashes = []
+        in_use = set()
+        for commit, repo in pipeline:
+            self.assertNotIn(repo.worktreepath, in_use)
+            in_use.add(repo.worktreepath)
+            hashes.append(commit['commit'])
+            in_use.remove(repo.worktreepath)
+            pipeline.release(repo)
+        pipeline.close()
+
+        expected = [str(i) for i in range(20) if i != 5]
+        self.assertListEqual(hashes, expected)
+        self.assertListEqual([h for _, h in log], expected)
+
+    def test_backpressure(self):
+        """Test whether no working tree is checked out before being released"""
+
+        log = []
+        commits = [{'commit': str(i)} for i in range(5)]
+        repos = [MockedSnapshotRepository('a', log), MockedSnapshotRepository('b', log)]
+
+        pipeline = SnapshotPipeline(iter(commits), repos, lambda c: False)
+        snapshots = iter(pipeline)
+        commit, repo = next(snapshots)
+        self.assertEqual(commit['commit'], '0')
+
+        # the second working tree is prepared, the first one is still in use
+        commit, repo_next = next(snapshots)
+        self.assertEqual(commit['commit'], '1')
+        self.assertEqual(len(log), 2)
+
+        pipeline.release(repo)
+        pipeline.release(repo_next)
+
+        hashes = []
+        for commit, repo in snapshots:
+            hashes.append(commit['commit'])
+            pipeline.release(repo)
+        self.assertListEqual(hashes, ['2', '3', '4'])
+        pipeline.close()
+
+    def test_close(self):
+        """Test whether the stages are stopped when the pipeline is closed"""
+
+        log = []
+        commits = ({'commit': str(i)} for i in range(1000))
+        repos = [MockedSnapshotRepository('a', log), MockedSnapshotRepository('b', log)]
+
+        pipeline = SnapshotPipeline(commits, repos, lambda c: False)
+        commit, repo = next(iter(pipeline))
+        pipeline.close()
+
+        for thread in pipeline.threads:
+            self.assertFalse(thread.is_alive())
+        self.assertLessEqual(len(log), 2)
+
+    def test_timed(self):
+        """Test whether the stages of the snapshots are timed"""
+
+        log = []
+        commits = [{'commit': str(i)} for i in range(5)]
+        repos = [MockedSnapshotRepository('a', log), MockedSnapshotRepository('b', log)]
+
+        pipeline = SnapshotPipeline(iter(commits), repos, lambda c: c['commit'] == '2', timed=True)
+        timings = []
+        for commit, repo in pipeline:
+            timings.append(pipeline.timings.pop(commit['commit']).to_dict())
+            pipeline.release(repo)
+        pipeline.close()
+
+        self.assertEqual(len(timings), 4)
+        self.assertDictEqual(pipeline.timings, {})
+        for timing in timings:
+            self.assertListEqual(sorted(timing.keys()), ['checkout', 'log'])
+            self.assertEqual(timing['checkout']['calls'], 1)
+
+        # the commit discarded is accounted to the following one
+        self.assertListEqual([timing['log']['calls'] for timing in timings], [1, 1, 2, 1])
+
+        # the stages are not timed at all when timing is off
+        with unittest.mock.patch.object(Timings, 'stage', side_effect=AssertionError):
+            pipeline = SnapshotPipeline(iter(commits), repos, lambda c: False)
+            for commit, repo in pipeline:
+                pipeline.release(repo)
+            pipeline.close()
+
+            sequence = SnapshotSequence(iter(commits), repos[0], lambda c: False)
+            hashes = [commit['commit'] for commit, _ in sequence]
+
+        self.assertDictEqual(pipeline.timings, {})
+        self.assertDictEqual(sequence.timings, {})
+        self.assertListEqual(hashes, [commit['commit'] for commit in commits])
+
+    def test_failure(self):
+        """Test whether errors are raised in order"""
+
+        log = []
+        commits = [{'commit': str(i)} for i in range(5)]
+        repos = [MockedSnapshotRepository('a', log, fail_at='3'),
+                 MockedSnapshotRepository('b', log, fail_at='3')]
+
+        pipeline = SnapshotPipeline(iter(commits), repos, lambda c: False)
+        hashes = []
+        with self.assertRaises(RepositoryError):
+            for commit, repo in pipeline:
+                hashes.append(commit['commit'])
+                pipeline.release(repo)
+        pipeline.close()
+
+        self.assertListEqual(hashes, ['0', '1', '2'])
+
+
+class TestWorktreePool(TestCaseGraal):
+    """WorktreePool tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_path = tempfile.mkdtemp(prefix='graal_')
+        cls.tmp_repo_path = os.path.join(cls.tmp_path, 'repos')
+        os.mkdir(cls.tmp_repo_path)
+
+        cls.git_path = os.path.join(cls.tmp_path, 'graaltest')
+        cls.worktree_path = os.path.join(cls.tmp_path, 'graal_worktrees')
+
+        data_path = os.path.dirname(os.path.abspath(__file__))
+        data_path = os.path.join(data_path, 'data')
+
+        repo_name = 'graaltest'
+        repo_path = cls.git_path
+
+        fdout, _ = tempfile.mkstemp(dir=cls.tmp_path)
+
+        zip_path = os.path.join(data_path, repo_name + '.zip')
+        subprocess.check_call(['unzip', '-qq', zip_path, '-d', cls.tmp_repo_path])
+
+        origin_path = os.path.join(cls.tmp_repo_path, repo_name)
+        subprocess.check_call(['git', 'clone', '-q', '--bare', origin_path, repo_path],
+                              stderr=fdout)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_path)
+
+    def test_acquire_release(self):
+        """Test whether slots are leased once at a time"""
+
+        pool_a = WorktreePool(self.git_path, self.worktree_path)
+        pool_b = WorktreePool(self.git_path, self.worktree_path)
+
+        path_a = pool_a.acquire()
+        self.assertEqual(path_a, os.path.join(self.worktree_path, 'graaltest'))
+        self.assertTrue(pool_b.is_leased(path_a))
+
+        path_b = pool_b.acquire()
+        self.assertEqual(path_b, os.path.join(self.worktree_path, 'graaltest-1'))
+
+        pool_a.release(path_a)
+        self.assertFalse(pool_b.is_leased(path_a))
+
+        path_c = pool_b.acquire()
+        self.assertEqual(path_c, path_a)
+
+        pool_b.release(path_b)
+        pool_b.release(path_c)
+        self.assertFalse(pool_a.is_leased(path_b))
+        self.assertFalse(pool_a.is_leased(path_c))
+
+    def test_slots(self):
+        """Test whether the slots of the mirror are listed"""
+
+        worktree_path = os.path.join(self.tmp_path, 'slots')
+        os.makedirs(os.path.join(worktree_path, 'graaltest'))
+        os.makedirs(os.path.join(worktree_path, 'graaltest-2'))
+        os.makedirs(os.path.join(worktree_path, 'graaltest-x'))
+        os.makedirs(os.path.join(worktree_path, 'other'))
+
+        pool = WorktreePool(self.git_path, worktree_path)
+        self.assertListEqual(pool.slots(), [os.path.join(worktree_path, 'graaltest'),
+                                            os.path.join(worktree_path, 'graaltest-2')])
+
+        shutil.rmtree(worktree_path)
+
+    def test_cleanup(self):
+        """Test whether stale working trees are deleted"""
+
+        pool = WorktreePool(self.git_path, self.worktree_path)
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        stale_path = pool.slot(1)
+        repo.worktree(stale_path)
+
+        kept_path = pool.slot(2)
+        kept_repo = GraalRepository('http://example.git', self.git_path)
+        kept_repo.worktree(kept_path)
+        kept_repo.lock()
+
+        leased_path = pool.acquire()
+        leased_repo = GraalRepository('http://example.git', self.git_path)
+        leased_repo.worktree(leased_path)
+
+        pool.cleanup(repo)
+
+        self.assertFalse(os.path.exists(stale_path))
+        self.assertFalse(os.path.exists(os.path.join(self.git_path, 'worktrees', 'graaltest-1')))
+        self.assertTrue(repo.is_worktree(kept_path))
+        self.assertTrue(repo.is_worktree(leased_path))
+
+        pool.release(leased_path)
+        leased_repo.prune()
+        kept_repo.prune()
+
+    def test_cleanup_locations(self):
+        """Test whether the working trees kept in the location not used are deleted"""
+
+        tmpfs_path = os.path.join(self.tmp_path, 'tmpfs')
+        pool = WorktreePool(self.git_path, self.worktree_path, tmpfs_path=tmpfs_path)
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        kept_path = pool.slot(0)
+        kept_repo = GraalRepository('http://example.git', self.git_path)
+        kept_repo.worktree(kept_path)
+        kept_repo.lock()
+
+        pool.worktreepath = tmpfs_path
+        other_path = pool.slot(0)
+        other_repo = GraalRepository('http://example.git', self.git_path)
+        other_repo.worktree(other_path)
+        other_repo.lock()
+
+        pool.worktreepath = self.worktree_path
+        pool.cleanup(repo)
+
+        self.assertTrue(repo.is_worktree(kept_path))
+        self.assertFalse(os.path.exists(other_path))
+        self.assertFalse(repo.is_worktree(other_path))
+
+        kept_repo.prune()
+
+    def test_mirror_lock(self):
+        """Test whether the mirror lock is exclusive and reentrant"""
+
+        pool_a = WorktreePool(self.git_path, self.worktree_path)
+
+        with pool_a.mirror_lock():
+            with pool_a.mirror_lock():
+                self.assertTrue(os.path.exists(self.git_path + WorktreePool.MIRROR_LOCK_SUFFIX))
+
+            fd = os.open(pool_a.mirror_lock_path, os.O_RDWR)
+            with self.assertRaises(BlockingIOError):
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.close(fd)
+
+        fd = os.open(pool_a.mirror_lock_path, os.O_RDWR)
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
 class TestGraalCommand(unittest.TestCase):
     """GraalCommand tests"""
 
@@ -604,6 +1558,67 @@ class TestGraalCommand(unittest.TestCase):
         cmd = GraalCommand(*args)
         self.assertEqual(cmd.parsed_args.gitpath, '/tmp/gitpath')
 
+    def test_max_file_size_init(self):
+        """Test max file size initialization"""
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath']
+
+        cmd = GraalCommand(*args)
+        self.assertIsNone(cmd.parsed_args.max_file_size)
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath',
+                '--max-file-size', '1000', 'lizard=10']
+
+        cmd = GraalCommand(*args)
+        self.assertDictEqual(cmd.parsed_args.max_file_size, {'*': 1000, 'lizard': 10})
+
+    @unittest.mock.patch('perceval.backend.BackendCommand.run')
+    def test_run_metrics(self, mock_run):
+        """Test whether the metrics are written while the command runs"""
+
+        textfile = os.path.join(self.tmp_path, 'graal.prom')
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath',
+                '--metrics-textfile', textfile]
+
+        cmd = GraalCommand(*args)
+        cmd.run()
+
+        self.assertEqual(mock_run.call_count, 1)
+        with open(textfile) as fd:
+            self.assertIn('# TYPE graal_commits_total counter', fd.read())
+
+    @unittest.mock.patch('perceval.backend.BackendCommand.run')
+    def test_run_plan(self, mock_run):
+        """Test whether the estimate of the cost is written instead of the items"""
+
+        repo_path = os.path.join(self.tmp_path, 'repos')
+        os.mkdir(repo_path)
+        data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'graaltest.zip')
+        subprocess.check_call(['unzip', '-qq', data_path, '-d', repo_path])
+
+        output = os.path.join(self.tmp_path, 'plan.json')
+        args = [os.path.join(repo_path, 'graaltest'),
+                '--git-path', os.path.join(self.tmp_path, 'mirror'),
+                '--worktree-path', os.path.join(self.tmp_path, 'worktrees'),
+                '--entrypoint', 'perceval',
+                '--plan',
+                '--output', output]
+
+        cmd = GraalCommand(*args)
+        cmd.run()
+        cmd.outfile.close()
+
+        self.assertEqual(mock_run.call_count, 0)
+        with open(output) as fd:
+            estimate = json.load(fd)
+
+        self.assertEqual(estimate['backend_name'], 'Graal')
+        self.assertEqual(estimate['commits'], 3)
+        self.assertDictEqual(estimate['analyses'], {'full': 36, 'incremental': 12})
+
     def test_setup_cmd_parser(self):
         """Test if it parser object is correctly initialized"""
 
@@ -627,6 +1642,23 @@ class TestGraalCommand(unittest.TestCase):
         self.assertEqual(parsed_args.out_paths, None)
         self.assertEqual(parsed_args.entrypoint, None)
         self.assertFalse(parsed_args.details)
+        self.assertFalse(parsed_args.recycle_worktree)
+        self.assertIsNone(parsed_args.tmpfs_path)
+        self.assertFalse(parsed_args.pipeline)
+        self.assertIsNone(parsed_args.file_timeout)
+        self.assertIsNone(parsed_args.commit_timeout)
+        self.assertIsNone(parsed_args.max_file_size)
+        self.assertFalse(parsed_args.perf)
+        self.assertFalse(parsed_args.memory)
+        self.assertIsNone(parsed_args.memory_limit)
+        self.assertFalse(parsed_args.memory_spill)
+        self.assertIsNone(parsed_args.metrics_port)
+        self.assertIsNone(parsed_args.metrics_textfile)
+        self.assertEqual(parsed_args.metrics_interval, 15)
+        self.assertFalse(parsed_args.progress)
+        self.assertEqual(parsed_args.progress_interval, 30)
+        self.assertIsNone(parsed_args.status_file)
+        self.assertFalse(parsed_args.plan)
 
         args = ['http://example.com/',
                 '--git-path', '/tmp/gitpath',
@@ -639,7 +1671,24 @@ class TestGraalCommand(unittest.TestCase):
                 '--in-paths', '*.py', '*.java',
                 '--out-paths', '*.c',
                 '--entrypoint', 'module',
-                '--details']
+                '--details',
+                '--recycle-worktree',
+                '--tmpfs-path', '/dev/shm/worktrees',
+                '--pipeline',
+                '--file-timeout', '30',
+                '--commit-timeout', '600',
+                '--max-file-size', 'lizard=500000', '1000000',
+                '--perf',
+                '--memory',
+                '--memory-limit', '1000000000',
+                '--memory-spill',
+                '--metrics-port', '9100',
+                '--metrics-textfile', '/tmp/graal.prom',
+                '--metrics-interval', '5',
+                '--progress',
+                '--progress-interval', '10',
+                '--status-file', '/tmp/graal-status.json',
+                '--plan']
 
         parsed_args = parser.parse(*args)
         self.assertEqual(parsed_args.uri, 'http://example.com/')
@@ -654,6 +1703,50 @@ class TestGraalCommand(unittest.TestCase):
         self.assertEqual(parsed_args.out_paths, ['*.c'])
         self.assertEqual(parsed_args.entrypoint, 'module')
         self.assertTrue(parsed_args.details)
+        self.assertTrue(parsed_args.recycle_worktree)
+        self.assertEqual(parsed_args.tmpfs_path, '/dev/shm/worktrees')
+        self.assertTrue(parsed_args.pipeline)
+        self.assertEqual(parsed_args.file_timeout, 30)
+        self.assertEqual(parsed_args.commit_timeout, 600)
+        self.assertListEqual(parsed_args.max_file_size, [('lizard', 500000), ('*', 1000000)])
+        self.assertTrue(parsed_args.perf)
+        self.assertTrue(parsed_args.memory)
+        self.assertEqual(parsed_args.memory_limit, 1000000000)
+        self.assertTrue(parsed_args.memory_spill)
+        self.assertEqual(parsed_args.metrics_port, 9100)
+        self.assertEqual(parsed_args.metrics_textfile, '/tmp/graal.prom')
+        self.assertEqual(parsed_args.metrics_interval, 5)
+        self.assertTrue(parsed_args.progress)
+        self.assertEqual(parsed_args.progress_interval, 10)
+        self.assertEqual(parsed_args.status_file, '/tmp/graal-status.json')
+        self.assertTrue(parsed_args.plan)
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath',
+                '--entrypoint', 'module',
+                '--entrypoint', 'other/module']
+
+        parsed_args = parser.parse(*args)
+        self.assertListEqual(parsed_args.entrypoint, ['module', 'other/module'])
+
+        args = ['--entrypoint', 'module',
+                '--entrypoint', 'other/module',
+                '--entrypoint', 'third',
+                'http://example.com/',
+                '--git-path', '/tmp/gitpath']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.uri, 'http://example.com/')
+        self.assertListEqual(parsed_args.entrypoint, ['module', 'other/module', 'third'])
+
+        args = ['--entrypoint', 'pkg',
+                'http://example.com/',
+                '--git-path', '/tmp/gitpath']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.uri, 'http://example.com/')
+        self.assertEqual(parsed_args.git_path, '/tmp/gitpath')
+        self.assertEqual(parsed_args.entrypoint, 'pkg')
 
 
 class TesGraalFunctions(unittest.TestCase):
@@ -664,6 +1757,15 @@ class TesGraalFunctions(unittest.TestCase):
         for b in backends.keys():
             self.assertTrue(issubclass(backends.get(b), Graal))
 
+    def test_size_limit(self):
+        """Test whether size limits are parsed"""
+
+        self.assertTupleEqual(size_limit('1000'), ('*', 1000))
+        self.assertTupleEqual(size_limit('lizard=500'), ('lizard', 500))
+
+        with self.assertRaises(argparse.ArgumentTypeError):
+            size_limit('lizard=big')
+
 
 class TestFetch(unittest.TestCase):
     """Unit tests for fetch function"""
@@ -27,7 +27,15 @@ import unittest
 from base_analyzer import (TestCaseAnalyzer,
                            ANALYZER_TEST_FILE)
 
-from graal.backends.core.analyzers.lizard import Lizard
+from graal.graal import (SKIP_TIMEOUT,
+                         SKIP_TOO_LARGE,
+                         AnalysisSkippedError,
+                         GraalError)
+from graal.backends.core.analyzers.lizard import (RANK_LOC,
+                                                  SCOPE_COMMIT,
+                                                  FunctionFilter,
+                                                  Lizard)
+from graal.sketch import KLLSketch
 
 
 class TestLizard(TestCaseAnalyzer):
@@ -100,6 +108,116 @@ class TestLizard(TestCaseAnalyzer):
             self.assertIn('end', fd)
             self.assertTrue(type(fd['end']), int)
 
+    def test_analyze_timeout(self):
+        """Test whether lizard gives up when the analysis takes too long"""
+
+        lizard = Lizard()
+        kwargs = {'file_path': os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE),
+                  'details': False}
+        expected = lizard.analyze(**kwargs)
+
+        result = lizard.analyze(timeout=60, **kwargs)
+        self.assertDictEqual(result, expected)
+
+        with self.assertRaises(AnalysisSkippedError) as e:
+            lizard.analyze(timeout=1e-9, **kwargs)
+
+        self.assertEqual(e.exception.reason, SKIP_TIMEOUT)
+        self.assertEqual(e.exception.analyzer, 'lizard')
+        self.assertEqual(e.exception.target, kwargs['file_path'])
+
+    def test_analyze_max_file_size(self):
+        """Test whether lizard skips the files exceeding the size limit"""
+
+        lizard = Lizard()
+        kwargs = {'file_path': os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE),
+                  'details': False}
+
+        result = lizard.analyze(max_file_size={'cloc': 1}, **kwargs)
+        self.assertIn('ccn', result)
+
+        for max_file_size in [1, {'lizard': 1}, {'*': 1}]:
+            with self.assertRaises(AnalysisSkippedError) as e:
+                lizard.analyze(max_file_size=max_file_size, **kwargs)
+
+            self.assertEqual(e.exception.reason, SKIP_TOO_LARGE)
+            self.assertEqual(e.exception.analyzer, 'lizard')
+
+    def test_analyze_funs_filter(self):
+        """Test whether lizard returns only the functions selected by the filter"""
+
+        lizard = Lizard()
+        kwargs = {'file_path': os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE),
+                  'details': True}
+        expected = lizard.analyze(**kwargs)
+
+        result = lizard.analyze(funs_filter=FunctionFilter(top=3), **kwargs)
+        self.assertListEqual([fd['ccn'] for fd in result['funs']], [6, 5, 3])
+
+        # aggregates are computed over all the functions
+        for field in ['ccn', 'avg_ccn', 'avg_loc', 'avg_tokens', 'num_funs', 'loc', 'tokens']:
+            self.assertEqual(result[field], expected[field])
+
+        result = lizard.analyze(funs_filter=FunctionFilter(top=2, rank_by=RANK_LOC), **kwargs)
+        self.assertListEqual([fd['loc'] for fd in result['funs']], [15, 10])
+
+        result = lizard.analyze(funs_filter=FunctionFilter(min_ccn=2), **kwargs)
+        self.assertListEqual([fd['ccn'] for fd in result['funs']], [5, 3, 6, 2])
+
+        result = lizard.analyze(funs_filter=FunctionFilter(min_ccn=2, min_loc=6), **kwargs)
+        self.assertListEqual([(fd['ccn'], fd['loc']) for fd in result['funs']], [(5, 15), (6, 6), (2, 10)])
+
+    def test_analyze_sketches(self):
+        """Test whether the metrics of all the functions are added to the sketches"""
+
+        lizard = Lizard()
+        kwargs = {'file_path': os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE),
+                  'details': False}
+
+        sketches = {'ccn': KLLSketch(), 'loc': KLLSketch()}
+        result = lizard.analyze(sketches=sketches, funs_filter=FunctionFilter(top=1), **kwargs)
+
+        self.assertEqual(len(sketches['ccn']), result['num_funs'])
+        self.assertEqual(sketches['ccn'].max, 6)
+        self.assertEqual(len(sketches['loc']), result['num_funs'])
+        self.assertEqual(sketches['loc'].max, 15)
+
+
+class TestFunctionFilter(unittest.TestCase):
+    """FunctionFilter tests"""
+
+    def test_init(self):
+        """Test whether invalid ranks and scopes are rejected"""
+
+        funs_filter = FunctionFilter()
+        self.assertIsNone(funs_filter.top)
+        self.assertEqual(funs_filter.rank_by, 'ccn')
+        self.assertEqual(funs_filter.scope, 'file')
+
+        with self.assertRaises(GraalError):
+            FunctionFilter(rank_by='tokens')
+
+        with self.assertRaises(GraalError):
+            FunctionFilter(scope='repository')
+
+    def test_trim(self):
+        """Test whether the top functions of a commit are kept"""
+
+        file_infos = [
+            {'file_path': 'a.py', 'funs': [{'name': 'a1', 'ccn': 7}, {'name': 'a2', 'ccn': 2}]},
+            {'file_path': 'b.py', 'funs': [{'name': 'b1', 'ccn': 5}, {'name': 'b2', 'ccn': 4}]},
+            {'file_path': 'c.txt', 'loc': 10}
+        ]
+
+        FunctionFilter(top=2).trim(file_infos)
+        self.assertEqual(len(file_infos[0]['funs']), 2)
+        self.assertEqual(len(file_infos[1]['funs']), 2)
+
+        FunctionFilter(top=2, scope=SCOPE_COMMIT).trim(file_infos)
+        self.assertListEqual([fd['name'] for fd in file_infos[0]['funs']], ['a1'])
+        self.assertListEqual([fd['name'] for fd in file_infos[1]['funs']], ['b1'])
+        self.assertNotIn('funs', file_infos[2])
+
 
 if __name__ == "__main__":
     unittest.main()
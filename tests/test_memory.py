@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import sys
+import tracemalloc
+import unittest
+import unittest.mock
+
+import graal.memory
+from graal.memory import (RSS_UNIT,
+                          MemoryTracker,
+                          record_child)
+from graal.backends.core.analyzers.analyzer import Analyzer
+from graal.backends.core.analyzers.runner import LineParser
+
+
+def allocate():
+    return [bytearray(1000) for _ in range(1000)]
+
+
+class TestMemoryTracker(unittest.TestCase):
+    """MemoryTracker tests"""
+
+    def test_commit(self):
+        """Test whether the memory used by a commit is reported"""
+
+        tracker = MemoryTracker(top=3)
+        tracker.start()
+        try:
+            self.assertTrue(tracemalloc.is_tracing())
+            self.assertIs(graal.memory._active, tracker)
+
+            tracker.begin_commit()
+            data = allocate()
+            memory = tracker.end_commit()
+        finally:
+            tracker.stop()
+
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertIsNone(graal.memory._active)
+
+        self.assertGreaterEqual(memory['peak'], 1000 * 1000)
+        self.assertGreaterEqual(memory['peak'], memory['current'])
+        self.assertLessEqual(len(memory['top']), 3)
+        self.assertTrue(memory['top'][0]['site'].startswith(__file__))
+        self.assertGreaterEqual(memory['top'][0]['size'], 1000 * 1000)
+        self.assertDictEqual(memory['children'], {})
+        self.assertGreaterEqual(memory['children_max_rss'], 0)
+
+        del data
+
+    def test_peak(self):
+        """Test whether the peak is reset at the beginning of each commit"""
+
+        tracker = MemoryTracker()
+        tracker.start()
+        try:
+            tracker.begin_commit()
+            allocate()
+            first = tracker.end_commit()
+
+            tracker.begin_commit()
+            second = tracker.end_commit()
+        finally:
+            tracker.stop()
+
+        self.assertGreaterEqual(first['peak'], 1000 * 1000)
+        self.assertLess(second['peak'], first['peak'])
+
+    def test_peak_no_reset(self):
+        """Test whether the peak of each commit is estimated when it cannot be reset"""
+
+        tracker = MemoryTracker()
+        tracker.start()
+        try:
+            with unittest.mock.patch('graal.memory._RESET_PEAK', False), \
+                    unittest.mock.patch('tracemalloc.reset_peak', side_effect=AssertionError, create=True):
+                tracker.begin_commit()
+                allocate()
+                first = tracker.end_commit()
+
+                tracker.begin_commit()
+                data = [bytearray(1000) for _ in range(100)]
+                second = tracker.end_commit()
+
+                tracker.begin_commit()
+                del data
+                third = tracker.end_commit()
+
+                tracker.begin_commit()
+                [allocate() for _ in range(2)]
+                fourth = tracker.end_commit()
+        finally:
+            tracker.stop()
+
+        self.assertGreaterEqual(first['peak'], 1000 * 1000)
+        self.assertLess(second['peak'], first['peak'])
+        self.assertGreaterEqual(second['peak'], max(second['current'], 100 * 1000))
+        self.assertGreaterEqual(third['peak'], second['current'])
+        self.assertLess(third['peak'], first['peak'])
+        self.assertGreaterEqual(fourth['peak'], 2 * 1000 * 1000)
+
+    def test_children(self):
+        """Test whether the peak RSS of the children is kept for each analyzer"""
+
+        tracker = MemoryTracker()
+        tracker.start()
+        try:
+            tracker.begin_commit()
+            record_child('cloc', 10)
+            record_child('cloc', 30)
+            record_child('bandit', 20)
+            memory = tracker.end_commit()
+
+            tracker.begin_commit()
+            Analyzer()._run_tool([sys.executable, '-c', 'pass'], LineParser(), 'target')
+            children = tracker.end_commit()['children']
+        finally:
+            tracker.stop()
+
+        self.assertDictEqual(memory['children'], {'bandit': 20 * RSS_UNIT, 'cloc': 30 * RSS_UNIT})
+        self.assertListEqual(list(children.keys()), ['analyzer'])
+        self.assertGreater(children['analyzer'], 0)
+
+        # nothing is recorded once the tracker is stopped
+        record_child('cloc', 50)
+        self.assertNotIn('cloc', tracker._children)
+
+    def test_already_tracing(self):
+        """Test whether tracing started elsewhere is not stopped"""
+
+        tracemalloc.start()
+        try:
+            tracker = MemoryTracker()
+            tracker.start()
+            tracker.stop()
+
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
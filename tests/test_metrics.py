@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+from graal.metrics import (EXPOSITION_CONTENT_TYPE,
+                           MetricsServer,
+                           MetricsTextfile,
+                           Registry)
+
+
+class TestRegistry(unittest.TestCase):
+    """Registry tests"""
+
+    def test_counter(self):
+        """Test whether counters are rendered by label"""
+
+        registry = Registry()
+        counter = registry.counter('graal_commits_total', "Commits analyzed", ['backend'])
+        counter.labels('CoCom').inc()
+        counter.labels('CoCom').inc(2)
+        counter.labels('CoQua').inc()
+
+        expected = ('# HELP graal_commits_total Commits analyzed\n'
+                    '# TYPE graal_commits_total counter\n'
+                    'graal_commits_total{backend="CoCom"} 3\n'
+                    'graal_commits_total{backend="CoQua"} 1\n')
+        self.assertEqual(registry.exposition(), expected)
+
+        with self.assertRaises(ValueError):
+            counter.labels('CoCom').inc(-1)
+
+    def test_gauge(self):
+        """Test whether gauges go up and down, also without labels"""
+
+        registry = Registry()
+        gauge = registry.gauge('graal_workers', "Workers")
+        gauge.set(4)
+        gauge.dec()
+        gauge.inc(0.5)
+
+        expected = ('# HELP graal_workers Workers\n'
+                    '# TYPE graal_workers gauge\n'
+                    'graal_workers 3.5\n')
+        self.assertEqual(registry.exposition(), expected)
+
+    def test_histogram(self):
+        """Test whether histograms have cumulative buckets, sum and count"""
+
+        registry = Registry()
+        histogram = registry.histogram('graal_analyzer_duration_seconds', "Time spent",
+                                       ['analyzer'], buckets=[1, 0.1])
+        child = histogram.labels('cloc')
+        child.observe(0.05)
+        child.observe(0.5)
+        child.observe(5)
+
+        expected = ('# HELP graal_analyzer_duration_seconds Time spent\n'
+                    '# TYPE graal_analyzer_duration_seconds histogram\n'
+                    'graal_analyzer_duration_seconds_bucket{analyzer="cloc",le="0.1"} 1\n'
+                    'graal_analyzer_duration_seconds_bucket{analyzer="cloc",le="1.0"} 2\n'
+                    'graal_analyzer_duration_seconds_bucket{analyzer="cloc",le="+Inf"} 3\n'
+                    'graal_analyzer_duration_seconds_sum{analyzer="cloc"} 5.55\n'
+                    'graal_analyzer_duration_seconds_count{analyzer="cloc"} 3\n')
+        self.assertEqual(registry.exposition(), expected)
+
+    def test_register(self):
+        """Test whether metrics are registered once and sorted by name"""
+
+        registry = Registry()
+        files = registry.counter('graal_files_total', "Files", ['backend'])
+        registry.counter('graal_commits_total', "Commits")
+
+        self.assertIs(registry.counter('graal_files_total', "Files", ['backend']), files)
+        with self.assertRaises(ValueError):
+            registry.gauge('graal_files_total', "Files", ['backend'])
+        with self.assertRaises(ValueError):
+            registry.counter('graal_files_total', "Files")
+
+        lines = registry.exposition().splitlines()
+        self.assertListEqual(lines, ['# HELP graal_commits_total Commits',
+                                     '# TYPE graal_commits_total counter',
+                                     '# HELP graal_files_total Files',
+                                     '# TYPE graal_files_total counter'])
+
+    def test_labels(self):
+        """Test whether label values are escaped and checked"""
+
+        registry = Registry()
+        counter = registry.counter('graal_files_total', "Files", ['path'])
+        counter.labels('a"b\\c\nd').inc()
+
+        self.assertIn('graal_files_total{path="a\\"b\\\\c\\nd"} 1', registry.exposition())
+
+        with self.assertRaises(ValueError):
+            counter.labels()
+        with self.assertRaises(AttributeError):
+            counter.inc()
+
+
+class TestExporters(unittest.TestCase):
+    """MetricsServer and MetricsTextfile tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+        self.registry = Registry()
+        self.registry.counter('graal_commits_total', "Commits").inc(3)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_server(self):
+        """Test whether the metrics are served over HTTP"""
+
+        server = MetricsServer(self.registry)
+        server.start()
+        try:
+            url = 'http://127.0.0.1:%s/metrics' % server.port
+            with urllib.request.urlopen(url) as response:
+                self.assertEqual(response.headers['Content-Type'], EXPOSITION_CONTENT_TYPE)
+                self.assertEqual(response.read().decode('utf-8'), self.registry.exposition())
+
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                urllib.request.urlopen('http://127.0.0.1:%s/other' % server.port)
+            self.assertEqual(cm.exception.code, 404)
+            cm.exception.close()
+        finally:
+            server.stop()
+
+    def test_textfile(self):
+        """Test whether the metrics are written to a file, a last time when stopped"""
+
+        path = os.path.join(self.tmp_path, 'graal.prom')
+        textfile = MetricsTextfile(self.registry, path, interval=60)
+        textfile.start()
+
+        self.registry.counter('graal_commits_total', "Commits").inc()
+        textfile.stop()
+
+        with open(path) as fd:
+            self.assertIn('graal_commits_total 4\n', fd.read())
+        self.assertListEqual(os.listdir(self.tmp_path), ['graal.prom'])
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+import unittest.mock
+
+from graal.backends.core.cocom import CoCom
+from graal.backends.core.covuln import CoVuln
+from graal.backends.core.multi import (CATEGORY_MULTI,
+                                       Multi,
+                                       MultiCommand)
+from graal.graal import GraalError
+from test_graal import TestCaseGraal
+
+
+class TestMultiBackend(TestCaseGraal):
+    """Multi backend tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_path = tempfile.mkdtemp(prefix='multi_')
+        cls.tmp_repo_path = os.path.join(cls.tmp_path, 'repos')
+        os.mkdir(cls.tmp_repo_path)
+
+        cls.git_path = os.path.join(cls.tmp_path, 'graaltest')
+        cls.worktree_path = os.path.join(cls.tmp_path, 'multi_worktrees')
+
+        data_path = os.path.dirname(os.path.abspath(__file__))
+        data_path = os.path.join(data_path, 'data')
+
+        repo_name = 'graaltest'
+        repo_path = cls.git_path
+
+        fdout, _ = tempfile.mkstemp(dir=cls.tmp_path)
+
+        zip_path = os.path.join(data_path, repo_name + '.zip')
+        subprocess.check_call(['unzip', '-qq', zip_path, '-d', cls.tmp_repo_path])
+
+        origin_path = os.path.join(cls.tmp_repo_path, repo_name)
+        subprocess.check_call(['git', 'clone', '-q', '--bare', origin_path, repo_path],
+                              stderr=fdout)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        mb = Multi('http://example.com', self.git_path, self.worktree_path,
+                   entrypoint='perceval', backends=['cocom', 'covuln'], workers=2, tag='test')
+        self.assertEqual(mb.uri, 'http://example.com')
+        self.assertEqual(mb.gitpath, self.git_path)
+        self.assertEqual(mb.worktreepath, os.path.join(self.worktree_path, os.path.split(mb.gitpath)[1]))
+        self.assertEqual(mb.origin, 'http://example.com')
+        self.assertEqual(mb.tag, 'test')
+        self.assertListEqual(sorted(mb.backends.keys()), ['cocom', 'covuln'])
+        self.assertIsInstance(mb.backends['cocom'], CoCom)
+        self.assertIsInstance(mb.backends['covuln'], CoVuln)
+        self.assertEqual(mb.backends['cocom'].workers, 2)
+        self.assertEqual(mb.backends['covuln'].entrypoint, 'perceval')
+
+        mb = Multi('http://example.com', self.git_path, self.worktree_path, entrypoint='perceval')
+        self.assertListEqual(sorted(mb.backends.keys()), ['cocom', 'codep', 'coqua', 'covuln'])
+
+        # without entrypoint, only the backends which do not need it are run
+        mb = Multi('http://example.com', self.git_path, self.worktree_path)
+        self.assertListEqual(sorted(mb.backends.keys()), ['cocom'])
+
+    def test_initialization_error(self):
+        """Test whether an exception is thrown when a backend is unknown or cannot be initialized"""
+
+        with self.assertRaises(GraalError):
+            _ = Multi('http://example.com', self.git_path, self.worktree_path,
+                      entrypoint='perceval', backends=['cocom', 'unknown'])
+
+        with self.assertRaisesRegex(GraalError, "Backends \\['covuln'\\] need an entrypoint"):
+            _ = Multi('http://example.com', self.git_path, self.worktree_path, backends=['cocom', 'covuln'])
+
+    def test_fetch(self):
+        """Test whether the analysis of each backend is added to the commits"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path)
+        expected_cocom = [commit['data']['analysis'] for commit in cc.fetch()]
+
+        cv = CoVuln('http://example.com', self.git_path, self.worktree_path, entrypoint='perceval')
+        expected_covuln = [commit['data']['analysis'] for commit in cv.fetch()]
+
+        mb = Multi('http://example.com', self.git_path, self.worktree_path,
+                   entrypoint='perceval', backends=['cocom', 'covuln'])
+        commits = [commit for commit in mb.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        self.assertFalse(os.path.exists(mb.worktreepath))
+
+        for commit, cocom, covuln in zip(commits, expected_cocom, expected_covuln):
+            self.assertEqual(commit['backend_name'], 'Multi')
+            self.assertEqual(commit['category'], CATEGORY_MULTI)
+            self.assertListEqual(sorted(commit['data']['analysis'].keys()), ['cocom', 'covuln'])
+            self.assertListEqual(commit['data']['analysis']['cocom'], cocom)
+            self.assertDictEqual(commit['data']['analysis']['covuln'], covuln)
+            self.assertTrue('Author' in commit['data'])
+            self.assertTrue('Commit' in commit['data'])
+            self.assertFalse('files' in commit['data'])
+            self.assertFalse('parents' in commit['data'])
+            self.assertFalse('refs' in commit['data'])
+
+    def test_fetch_skipped(self):
+        """Test whether the skipped targets are tagged with the backend which skipped them"""
+
+        mb = Multi('http://example.com', self.git_path, self.worktree_path,
+                   entrypoint='perceval', backends=['cocom', 'covuln'],
+                   in_paths=['perceval/backends/core/github.py'], max_file_size={'lizard': 1})
+        commits = [commit for commit in mb.fetch()]
+
+        skipped = [s for commit in commits for s in commit['data'].get('skipped', [])]
+        self.assertGreater(len(skipped), 0)
+        for target in skipped:
+            self.assertEqual(target['backend'], 'cocom')
+            self.assertEqual(target['analyzer'], 'lizard')
+            self.assertEqual(target['file_path'], 'perceval/backends/core/github.py')
+
+    def test_fetch_filter(self):
+        """Test whether commits are analyzed only by the backends which select them"""
+
+        mb = Multi('http://example.com', self.git_path, self.worktree_path,
+                   entrypoint='perceval', in_paths=['perceval/backends/core/github.py'],
+                   backends=['cocom'])
+        commits = [commit for commit in mb.fetch()]
+
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(commits[0]['data']['analysis']['cocom'][0]['file_path'],
+                         'perceval/backends/core/github.py')
+
+        mb = Multi('http://example.com', self.git_path, self.worktree_path,
+                   entrypoint='perceval', in_paths=['perceval/backends/core/github.py'],
+                   backends=['cocom', 'covuln'])
+        commits = [commit for commit in mb.fetch()]
+
+        self.assertEqual(len(commits), 3)
+        self.assertEqual(len([c for c in commits if 'cocom' in c['data']['analysis']]), 1)
+        self.assertEqual(len([c for c in commits if 'covuln' in c['data']['analysis']]), 3)
+
+    def test_fetch_memory_spill(self):
+        """Test whether spilling is refused when no backend holds memory across commits"""
+
+        mb = Multi('http://example.com', self.git_path, self.worktree_path,
+                   entrypoint='perceval', backends=['covuln'],
+                   memory=True, memory_limit=1, memory_spill=True)
+        with self.assertRaisesRegex(GraalError, 'Multi holds no memory across commits'):
+            _ = [commit for commit in mb.fetch()]
+
+        mb = Multi('http://example.com', self.git_path, self.worktree_path,
+                   entrypoint='perceval', backends=['cocom', 'covuln'],
+                   memory=True, memory_limit=1, memory_spill=True)
+        commits = [commit for commit in mb.fetch()]
+        self.assertEqual(len(commits), 3)
+
+    def test_plan(self):
+        """Test whether the cost is estimated on the files of CoCom, when run"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, workers=2)
+        expected = cc.plan()
+
+        mb = Multi('http://example.com', self.git_path, self.worktree_path,
+                   entrypoint='perceval', backends=['cocom', 'covuln'], workers=2)
+        estimate = mb.plan()
+
+        self.assertEqual(estimate['backend_name'], 'Multi')
+        self.assertEqual(estimate['workers'], 2)
+        self.assertDictEqual(estimate['analyses'], expected['analyses'])
+        self.assertDictEqual(estimate['wall'], expected['wall'])
+
+        mb = Multi('http://example.com', self.git_path, self.worktree_path,
+                   entrypoint='perceval', backends=['covuln'])
+        estimate = mb.plan()
+
+        self.assertDictEqual(estimate['analyses'], {'full': 36, 'incremental': 12})
+        self.assertIsNone(estimate['seconds'])
+
+
+class TestMultiCommand(unittest.TestCase):
+    """MultiCommand tests"""
+
+    def test_backend_class(self):
+        """Test if the backend class is Multi"""
+
+        self.assertIs(MultiCommand.BACKEND, Multi)
+
+    def test_setup_cmd_parser(self):
+        """Test if the parser object is correctly initialized"""
+
+        parser = MultiCommand.setup_cmd_parser()
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath']
+        parsed_args = parser.parse(*args)
+        self.assertIsNone(parsed_args.backends)
+        self.assertEqual(parsed_args.workers, 1)
+        self.assertIsNone(parsed_args.cost_model)
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath',
+                '--entrypoint', 'perceval',
+                '--with', 'cocom, CoVuln',
+                '--workers', '4']
+        parsed_args = parser.parse(*args)
+        self.assertListEqual(parsed_args.backends, ['cocom', 'covuln'])
+        self.assertEqual(parsed_args.workers, 4)
+
+    def test_entrypoint_init(self):
+        """Test whether the backends which need an entrypoint are refused without it"""
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath',
+                '--with', 'cocom,coqua,covuln']
+
+        with unittest.mock.patch('sys.stderr', new_callable=io.StringIO) as mock_stderr:
+            with self.assertRaises(SystemExit):
+                _ = MultiCommand(*args)
+        self.assertIn('--with coqua,covuln needs --entrypoint', mock_stderr.getvalue())
+
+        cmd = MultiCommand(*(args + ['--entrypoint', 'perceval']))
+        self.assertEqual(cmd.parsed_args.entrypoint, 'perceval')
+
+        cmd = MultiCommand('http://example.com/', '--git-path', '/tmp/gitpath')
+        self.assertIsNone(cmd.parsed_args.backends)
+
+
+if __name__ == "__main__":
+    unittest.main()
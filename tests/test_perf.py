@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import unittest
+import unittest.mock
+
+from graal.perf import (Timings,
+                        activate,
+                        active,
+                        cpu_clock,
+                        propagate,
+                        record,
+                        stage)
+
+
+class TestTimings(unittest.TestCase):
+    """Timings tests"""
+
+    def test_add(self):
+        """Test whether the times of a stage are summed"""
+
+        timings = Timings()
+        timings.add('cloc', 1.0, 0.5)
+        timings.add('cloc', 2.0, 1.0)
+        timings.add('checkout', 0.5, 0.25, calls=2)
+
+        expected = {
+            'checkout': {'calls': 2, 'wall': 0.5, 'cpu': 0.25},
+            'cloc': {'calls': 2, 'wall': 3.0, 'cpu': 1.5}
+        }
+        self.assertDictEqual(timings.to_dict(), expected)
+        self.assertListEqual(list(timings.to_dict().keys()), ['checkout', 'cloc'])
+
+    def test_merge(self):
+        """Test whether the stages of two timings are merged"""
+
+        timings = Timings()
+        timings.add('cloc', 1.0, 0.5)
+
+        other = Timings()
+        other.add('cloc', 1.0, 0.5)
+        other.add('lizard', 2.0, 2.0)
+
+        timings.merge(other)
+
+        expected = {
+            'cloc': {'calls': 2, 'wall': 2.0, 'cpu': 1.0},
+            'lizard': {'calls': 1, 'wall': 2.0, 'cpu': 2.0}
+        }
+        self.assertDictEqual(timings.to_dict(), expected)
+        self.assertEqual(other.to_dict()['cloc']['calls'], 1)
+
+    def test_stage(self):
+        """Test whether the time spent in a block is recorded"""
+
+        timings = Timings()
+        with timings.stage('lizard'):
+            sum(i * i for i in range(100000))
+
+        with timings.stage('cloc') as timer:
+            timer.cpu += 10
+
+        stages = timings.to_dict()
+        self.assertEqual(stages['lizard']['calls'], 1)
+        self.assertGreater(stages['lizard']['wall'], 0)
+        self.assertGreater(stages['lizard']['cpu'], 0)
+        self.assertGreaterEqual(stages['cloc']['cpu'], 10)
+
+    def test_stage_on_error(self):
+        """Test whether the time spent in a block is recorded when it fails"""
+
+        timings = Timings()
+        with self.assertRaises(ValueError):
+            with timings.stage('cloc'):
+                raise ValueError
+
+        self.assertEqual(timings.to_dict()['cloc']['calls'], 1)
+
+    def test_cpu_clock(self):
+        """Test whether the CPU time of the process is used when the one of the thread is not available"""
+
+        if hasattr(time, 'thread_time'):
+            self.assertIs(cpu_clock(), time.thread_time)
+
+        with unittest.mock.patch('graal.perf.time', spec=['perf_counter', 'process_time']) as mock_time:
+            self.assertIs(cpu_clock(), mock_time.process_time)
+
+    def test_record(self):
+        """Test whether a block is timed only when the timings are given"""
+
+        timings = Timings()
+        with record(timings, 'cloc') as timer:
+            timer.cpu += 1
+
+        self.assertEqual(timings.to_dict()['cloc']['calls'], 1)
+
+        with unittest.mock.patch.object(Timings, 'stage', side_effect=AssertionError):
+            with record(None, 'cloc') as timer:
+                timer.cpu += 1
+
+
+class TestActivate(unittest.TestCase):
+    """activate and stage tests"""
+
+    def test_not_active(self):
+        """Test whether nothing is recorded when no timings are active"""
+
+        self.assertIsNone(active())
+
+        with stage('cloc') as timer:
+            timer.cpu += 1
+
+    def test_activate(self):
+        """Test whether the stages are recorded in the timings active on the thread"""
+
+        timings = Timings()
+        with activate(timings):
+            self.assertIs(active(), timings)
+            with stage('cloc'):
+                pass
+
+            thread = threading.Thread(target=self.__run_stage)
+            thread.start()
+            thread.join()
+
+        with stage('cloc'):
+            pass
+
+        self.assertIsNone(active())
+        self.assertDictEqual({name: s['calls'] for name, s in timings.to_dict().items()}, {'cloc': 1})
+
+    def test_activate_threads(self):
+        """Test whether the threads record their stages in their own timings"""
+
+        barrier = threading.Barrier(2)
+        timings = [Timings(), Timings()]
+
+        def run(index):
+            with activate(timings[index]):
+                barrier.wait()
+                with stage('stage-%s' % index):
+                    barrier.wait()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertListEqual(list(timings[0].to_dict().keys()), ['stage-0'])
+        self.assertListEqual(list(timings[1].to_dict().keys()), ['stage-1'])
+
+    def test_propagate(self):
+        """Test whether the stages of the tasks run on other threads are recorded in the timings of the caller"""
+
+        timings = Timings()
+        with activate(timings):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [executor.submit(propagate(self.__run_stage)) for _ in range(4)]
+                for future in futures:
+                    future.result()
+
+            # tasks not wrapped are not recorded
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(self.__run_stage).result()
+
+        self.assertEqual(timings.to_dict()['lizard']['calls'], 4)
+
+    def test_activate_nested(self):
+        """Test whether the previous timings are restored"""
+
+        outer = Timings()
+        inner = Timings()
+        with activate(outer):
+            with activate(inner):
+                with stage('cloc'):
+                    pass
+
+            with stage('lizard'):
+                pass
+
+        self.assertListEqual(list(inner.to_dict().keys()), ['cloc'])
+        self.assertListEqual(list(outer.to_dict().keys()), ['lizard'])
+
+    @staticmethod
+    def __run_stage():
+        with stage('lizard'):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
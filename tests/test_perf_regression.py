@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+"""Performance regression tests.
+
+These tests run the backends and the parsers of the analyzers on fixed
+fixtures, larger than the ones of the other tests, and compare their
+time and the memory they allocate with the baseline stored in
+`data/perf_baseline.json`. A test fails when a measurement is worse
+than the baseline by more than the tolerance of the baseline file.
+
+Times are divided by the time of a fixed Python loop, run right before
+each measurement, thus they are comparable across machines and less
+sensitive to their load; their tolerance is 100%, thus only the runs
+at least twice as slow fail. Memory is measured as the number of blocks
+and the bytes still allocated, according to the `tracemalloc` snapshots
+taken before and after each run, by the results it returns (e.g., the
+items of a backend). Unlike the peak, they do not depend on when the
+garbage collector runs, thus their tolerance is 10%, plus a small slack.
+Their values depend on the version of Python, thus the measurements are
+compared only on the version the baseline was recorded with.
+
+The tests are skipped unless the environment variable `GRAAL_PERF_TESTS`
+is set, as done by the `perf` job of the CI:
+
+    GRAAL_PERF_TESTS=1 python -m pytest tests/test_perf_regression.py
+
+When it is set to `update`, the baseline file is rewritten with the
+measurements taken, instead of comparing them.
+"""
+
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import unittest
+
+# The benchmarks are not installed with Graal, thus they are
+# imported from the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.generator import PYTHON_PACKAGE, RepositoryGenerator
+from graal.backends.core.analyzers.bandit import BanditParser
+from graal.backends.core.analyzers.cloc import ClocParser
+from graal.backends.core.analyzers.lint import LintParser
+from graal.backends.core.analyzers.reverse import Reverse
+from graal.backends.core.cocom import CoCom
+from graal.backends.core.codep import CoDep
+from graal.backends.core.coqua import CoQua
+from graal.backends.core.covuln import CoVuln
+from graal.graal import GraalRepository
+
+PERF_TESTS_ENV = 'GRAAL_PERF_TESTS'
+PERF_TESTS = os.environ.get(PERF_TESTS_ENV, '')
+UPDATE_BASELINE = PERF_TESTS == 'update'
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'perf_baseline.json')
+DEFAULT_TOLERANCE = {'time': 1.0, 'memory': 0.1}
+PYTHON_VERSION = '%s.%s' % sys.version_info[:2]
+
+# Blocks and bytes allocated above the baseline which are always
+# tolerated, since small results vary with the state of the interpreter
+BLOCKS_SLACK = 256
+MEMORY_SLACK = 64 * 1024
+
+
+def calibrate(repeat=20):
+    """Return the seconds spent by a fixed Python loop, the best of `repeat` runs"""
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        total = 0
+        for i in range(500000):
+            total += i % 7
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def measure(func, repeat=10):
+    """Measure a function: the best time of `repeat` runs, and the
+    blocks and bytes allocated by the result of running it once more,
+    while tracing the allocations.
+
+    The garbage collector is disabled while timing, as done by `timeit`.
+    The snapshots are taken after a collection, thus the blocks and bytes
+    counted are the ones held by the result only."""
+
+    calibration = calibrate()
+
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = func()
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), 'filename')
+    del result
+
+    return {
+        'seconds': best,
+        'time': best / calibration,
+        'blocks': sum(stat.count_diff for stat in stats),
+        'bytes': sum(stat.size_diff for stat in stats)
+    }
+
+
+def feed(parser, lines):
+    for line in lines:
+        parser.feed(line)
+        if parser.done:
+            break
+
+    return parser
+
+
+def bandit_report(issues=20000):
+    """Return the lines of a Bandit text report with `issues` issues"""
+
+    severities = ['Low', 'Medium', 'High']
+    lines = ['Run started:2018-01-01 00:00:00.000000', '', 'Test results:']
+    for i in range(issues):
+        lines += ['>> Issue: [B101:assert_used] Use of assert detected. The enclosed code will be removed '
+                  'when compiling to optimised byte code.',
+                  '   Severity: %s   Confidence: %s' % (severities[i % 3], severities[(i // 3) % 3]),
+                  '   CWE: CWE-703 (https://cwe.mitre.org/data/definitions/703.html)',
+                  '   More Info: https://bandit.readthedocs.io/en/latest/plugins/b101_assert_used.html',
+                  '   Location: /tmp/worktree/pkg/module_%d.py:%d' % (i // 20, i % 200 + 1),
+                  '%d\t    assert total >= -value' % (i % 200 + 1),
+                  '',
+                  '-' * 50]
+    lines += ['', 'Code scanned:', '\tTotal lines of code: %d' % (issues * 10),
+              '\tTotal lines skipped (#nosec): 0']
+
+    return lines
+
+
+def lint_report(modules=5000, messages=20):
+    """Return the lines of a Pylint text report with `modules` modules
+    and `messages` messages for each one"""
+
+    lines = []
+    for m in range(modules):
+        lines.append('************* Module pkg.module_%d' % m)
+        for i in range(messages):
+            lines.append('pkg/module_%d.py:%d:0: C0116: Missing function or method docstring '
+                         '(missing-function-docstring)' % (m, i * 10 + 1))
+    lines += ['', '-' * 66, 'Your code has been rated at 7.50/10', '']
+
+    return lines
+
+
+def cloc_reports(files=50000):
+    """Return the lines of the reports of Cloc of `files` files"""
+
+    reports = []
+    for i in range(files):
+        reports.append(['       1 text file.',
+                        '-' * 79,
+                        'Language                     files          blank        comment           code',
+                        '-' * 79,
+                        'Python                           1            %d            %d            %d'
+                        % (i % 50, i % 30, i % 500 + 10),
+                        '-' * 79])
+
+    return reports
+
+
+def write_dot(path, nodes=100, edges=2):
+    """Write a class diagram of Pyreverse with `nodes` classes,
+    each one inheriting from `edges` of the previous ones"""
+
+    with open(path, 'w') as f:
+        f.write('digraph "classes" {\nrankdir=BT\ncharset="utf-8"\n')
+        for n in range(nodes):
+            f.write('"pkg.module_%d.Class%d" [color="black", fontcolor="black", label=<{Class%d|'
+                    'total : int<br ALIGN="LEFT"/>|fun_0(value)<br ALIGN="LEFT"/>fun_1(value)<br ALIGN="LEFT"/>}>, '
+                    'shape="record", style="solid"];\n' % (n, n, n))
+        for n in range(1, nodes):
+            for e in range(1, edges + 1):
+                if n - e >= 0:
+                    f.write('"pkg.module_%d.Class%d" -> "pkg.module_%d.Class%d" '
+                            '[arrowhead="empty", arrowtail="none"];\n' % (n, n, n - e, n - e))
+        f.write('}\n')
+
+
+@unittest.skipUnless(PERF_TESTS, "set %s=1 to run the performance regression tests" % PERF_TESTS_ENV)
+class TestPerfRegression(unittest.TestCase):
+    """Performance regression tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_path = tempfile.mkdtemp(prefix='graal_')
+
+        cls.baseline = {'python': PYTHON_VERSION, 'tolerance': DEFAULT_TOLERANCE, 'measurements': {}}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as f:
+                cls.baseline = json.load(f)
+        cls.measurements = {}
+
+        if not UPDATE_BASELINE and cls.baseline.get('python') != PYTHON_VERSION:
+            raise unittest.SkipTest("baseline recorded on Python %s, set %s=update to record it on Python %s" %
+                                    (cls.baseline.get('python'), PERF_TESTS_ENV, PYTHON_VERSION))
+
+        generator = RepositoryGenerator(commits=4, files=15, median_lines=60, seed=0)
+        cls.repo_path = generator.generate(os.path.join(cls.tmp_path, 'repository'))['path']
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_path)
+
+        if UPDATE_BASELINE and cls.measurements:
+            # the measurements taken on other versions of Python are not comparable
+            measurements = {}
+            if cls.baseline.get('python') == PYTHON_VERSION:
+                measurements.update(cls.baseline['measurements'])
+            measurements.update(cls.measurements)
+            baseline = {
+                'python': PYTHON_VERSION,
+                'tolerance': cls.baseline.get('tolerance', DEFAULT_TOLERANCE),
+                'measurements': measurements
+            }
+            with open(BASELINE_PATH, 'w') as f:
+                json.dump(baseline, f, indent=4, sort_keys=True)
+                f.write('\n')
+
+    def check(self, name, func, repeat=10):
+        """Measure `func`, which returns its results, and compare
+        it with the baseline `name`"""
+
+        measurement = measure(func, repeat=repeat)
+        self.measurements[name] = measurement
+
+        if UPDATE_BASELINE:
+            return
+
+        expected = self.baseline['measurements'].get(name, None)
+        if expected is None:
+            self.skipTest("no baseline for %s, set %s=update to record it" % (name, PERF_TESTS_ENV))
+
+        tolerance = self.baseline.get('tolerance', DEFAULT_TOLERANCE)
+        max_time = expected['time'] * (1 + tolerance['time'])
+        max_blocks = expected['blocks'] * (1 + tolerance['memory']) + BLOCKS_SLACK
+        max_bytes = expected['bytes'] * (1 + tolerance['memory']) + MEMORY_SLACK
+
+        self.assertLessEqual(measurement['time'], max_time,
+                             "%s is slower than the baseline: %.3fs (%.1f) against %.3fs (%.1f)" %
+                             (name, measurement['seconds'], measurement['time'],
+                              expected['seconds'], expected['time']))
+        self.assertLessEqual(measurement['blocks'], max_blocks,
+                             "%s allocates more blocks than the baseline: %s against %s" %
+                             (name, measurement['blocks'], expected['blocks']))
+        self.assertLessEqual(measurement['bytes'], max_bytes,
+                             "%s allocates more memory than the baseline: %s bytes against %s bytes" %
+                             (name, measurement['bytes'], expected['bytes']))
+
+    def check_backend(self, name, klass, **kwargs):
+        """Measure a fetch of a backend on the generated repository"""
+
+        git_path = os.path.join(self.tmp_path, name, 'mirror')
+        worktree_path = os.path.join(self.tmp_path, name, 'worktrees')
+        GraalRepository.clone(self.repo_path, git_path)
+
+        def fetch():
+            backend = klass(self.repo_path, git_path, worktree_path, **kwargs)
+            items = [item for item in backend.fetch()]
+            self.assertEqual(len(items), 4)
+            return items
+
+        self.check(name, fetch, repeat=3)
+
+    def test_bandit_parser(self):
+        """Test the performance of the parser of Bandit"""
+
+        lines = bandit_report()
+
+        def parse():
+            parser = feed(BanditParser('/tmp/worktree'), lines)
+            self.assertEqual(len(parser.vulns), 20000)
+            return parser
+
+        self.check('bandit_parser', parse)
+
+    def test_lint_parser(self):
+        """Test the performance of the parser of Pylint"""
+
+        lines = lint_report()
+
+        def parse():
+            parser = feed(LintParser(), lines)
+            self.assertEqual(len(parser.modules), 5000)
+            return parser
+
+        self.check('lint_parser', parse)
+
+    def test_cloc_parser(self):
+        """Test the performance of the parser of Cloc"""
+
+        reports = cloc_reports()
+
+        def parse():
+            parsers = [feed(ClocParser(), lines) for lines in reports]
+            self.assertGreater(sum(parser.loc for parser in parsers), 0)
+            return parsers
+
+        self.check('cloc_parser', parse)
+
+    def test_reverse_dotfile2json(self):
+        """Test the performance of the conversion of the diagrams of Pyreverse"""
+
+        dot_path = os.path.join(self.tmp_path, 'classes.dot')
+        write_dot(dot_path)
+
+        cwd = os.getcwd()
+        reverse = Reverse()
+        os.chdir(cwd)
+
+        def convert():
+            graph = reverse._Reverse__dotfile2json(dot_path)
+            self.assertEqual(len(graph['nodes']), 100)
+            return graph
+
+        try:
+            self.check('reverse_dotfile2json', convert)
+        finally:
+            shutil.rmtree(reverse.tmp_path)
+
+    def test_cocom(self):
+        """Test the performance of CoCom"""
+
+        self.check_backend('cocom', CoCom)
+
+    def test_coqua(self):
+        """Test the performance of CoQua"""
+
+        self.check_backend('coqua', CoQua, entrypoint=PYTHON_PACKAGE)
+
+    def test_covuln(self):
+        """Test the performance of CoVuln"""
+
+        self.check_backend('covuln', CoVuln, entrypoint=PYTHON_PACKAGE)
+
+    def test_codep(self):
+        """Test the performance of CoDep"""
+
+        cwd = os.getcwd()
+        try:
+            self.check_backend('codep', CoDep, entrypoint=PYTHON_PACKAGE)
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
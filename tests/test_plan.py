@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import unittest
+
+from graal.cost import CostModel
+from graal.plan import Plan, makespan
+
+
+class TestPlan(unittest.TestCase):
+    """Plan tests"""
+
+    def setUp(self):
+        self.cost_model = CostModel()
+        self.cost_model.record('a.py', 100, 4.0)
+        self.cost_model.record('b.py', 200, 2.0)
+        self.cost_model.record('c.py', 300, 1.0)
+
+    def test_init(self):
+        """Test initialization"""
+
+        plan = Plan()
+        self.assertIsNone(plan.cost_model)
+        self.assertEqual(plan.workers, 1)
+        self.assertFalse(plan.incremental)
+        self.assertListEqual(list(plan.wall), Plan.WORKERS)
+
+        plan = Plan(cost_model=self.cost_model, workers=3, incremental=True)
+        self.assertEqual(plan.cost_model, self.cost_model)
+        self.assertEqual(plan.workers, 3)
+        self.assertTrue(plan.incremental)
+        self.assertListEqual(list(plan.wall), [1, 2, 3, 4, 8, 16])
+
+    def test_no_cost_model(self):
+        """Test whether the analyses are estimated without a cost model"""
+
+        plan = Plan(incremental=True)
+        plan.add_commit([('a.py', 100), ('b.py', 200)])
+        plan.skip_commit()
+        plan.add_commit([('a.py', 100), ('b.py', 200), ('c.py', 300)], changed={'c.py', 'd.py'})
+
+        estimate = plan.to_dict()
+        self.assertEqual(estimate['commits'], 3)
+        self.assertEqual(estimate['analyzed_commits'], 2)
+        self.assertEqual(estimate['skipped_commits'], 1)
+        self.assertTrue(estimate['incremental'])
+        self.assertEqual(estimate['workers'], 1)
+        self.assertDictEqual(estimate['analyses'], {'full': 5, 'incremental': 3})
+        self.assertDictEqual(estimate['cache'], {'hits': 2, 'misses': 3})
+        self.assertEqual(estimate['recorded_analyses'], 0)
+        self.assertIsNone(estimate['seconds'])
+        self.assertIsNone(estimate['wall'])
+        self.assertIsNone(estimate['estimated_wall'])
+
+    def test_cost_model(self):
+        """Test whether the time is estimated with the cost model"""
+
+        plan = Plan(cost_model=self.cost_model, workers=2)
+        plan.add_commit([('a.py', 100), ('b.py', 200)])
+        plan.add_commit([('a.py', 100), ('b.py', 200), ('c.py', 300)], changed={'c.py'})
+
+        estimate = plan.to_dict()
+        self.assertFalse(estimate['incremental'])
+        self.assertDictEqual(estimate['analyses'], {'full': 5, 'incremental': 3})
+        self.assertDictEqual(estimate['cache'], {'hits': 0, 'misses': 0})
+        self.assertEqual(estimate['recorded_analyses'], 5)
+        self.assertAlmostEqual(estimate['seconds']['full'], 13.0)
+        self.assertAlmostEqual(estimate['seconds']['incremental'], 7.0)
+
+        # without reusing the results, all the files are analyzed
+        self.assertAlmostEqual(estimate['wall'][1], 13.0)
+        self.assertAlmostEqual(estimate['wall'][2], 8.0)
+        self.assertAlmostEqual(estimate['wall'][16], 8.0)
+        self.assertAlmostEqual(estimate['estimated_wall'], 8.0)
+
+    def test_cost_model_incremental(self):
+        """Test whether the time is estimated on the files changed in incremental mode"""
+
+        plan = Plan(cost_model=self.cost_model, workers=2, incremental=True)
+        plan.add_commit([('a.py', 100), ('b.py', 200)])
+        plan.add_commit([('a.py', 100), ('b.py', 200), ('c.py', 300)], changed={'c.py'})
+        plan.add_commit([('a.py', 100), ('b.py', 200), ('c.py', 300), ('d.py', 400)], changed={'d.py'})
+
+        estimate = plan.to_dict()
+        self.assertDictEqual(estimate['analyses'], {'full': 9, 'incremental': 4})
+        self.assertDictEqual(estimate['cache'], {'hits': 5, 'misses': 4})
+        self.assertEqual(estimate['recorded_analyses'], 8)
+
+        unseen = self.cost_model.predict('d.py', 400)
+        self.assertAlmostEqual(estimate['seconds']['incremental'], 7.0 + unseen)
+        self.assertAlmostEqual(estimate['wall'][1], 7.0 + unseen)
+        self.assertAlmostEqual(estimate['estimated_wall'], 4.0 + 1.0 + unseen)
+
+
+class TestMakespan(unittest.TestCase):
+    """Tests of the makespan of the tasks"""
+
+    def test_makespan(self):
+        """Test whether the tasks are dispatched longest-first"""
+
+        self.assertEqual(makespan([], 4), 0.0)
+        self.assertEqual(makespan([3.0, 1.0, 2.0], 1), 6.0)
+        self.assertEqual(makespan([3.0, 1.0, 2.0], 2), 3.0)
+        self.assertEqual(makespan([3.0, 1.0, 2.0], 8), 3.0)
+        self.assertEqual(makespan([5.0, 4.0, 3.0, 3.0, 3.0], 2), 10.0)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
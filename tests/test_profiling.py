@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+import graal.profiling
+from graal.backends.core.analyzers.lizard import Lizard
+from graal.profiling import (Profiler,
+                             record_commit,
+                             record_run)
+from base_analyzer import (ANALYZER_TEST_FILE,
+                           TestCaseAnalyzer)
+
+
+def busy():
+    return sum(i * i for i in range(10000))
+
+
+class TestProfiler(TestCaseAnalyzer):
+    """Profiler tests"""
+
+    def setUp(self):
+        self.tmp_profile_path = tempfile.mkdtemp(prefix='graal_')
+        self.path = os.path.join(self.tmp_profile_path, 'graal.pstats')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_profile_path)
+
+    def test_profile(self):
+        """Test whether the statistics of the functions are saved"""
+
+        with Profiler(self.path) as profiler:
+            self.assertIs(graal.profiling._active, profiler)
+            busy()
+
+        self.assertIsNone(graal.profiling._active)
+
+        stats = pstats.Stats(self.path)
+        functions = [function for _, _, function in stats.stats.keys()]
+        self.assertIn('busy', functions)
+
+    def test_record(self):
+        """Test whether the runs of the analyzers and the slowest commits and targets are kept"""
+
+        profiler = Profiler(self.path, top=2)
+        profiler.record_run('cloc', 'a.py', 1.0, 0.5)
+        profiler.record_run('cloc', 'b.py', 3.0, 1.5)
+        profiler.record_run('cloc', 'c.py', 2.0, 1.0)
+        profiler.record_run('bandit', None, 0.5, 0.5)
+        profiler.record_commit('0001', 1.0)
+        profiler.record_commit('0002', 5.0)
+        profiler.record_commit('0003', 2.0)
+
+        self.assertListEqual(profiler.analyzers['cloc'], [3, 6.0, 3.0, 3.0])
+        self.assertListEqual(profiler.analyzers['bandit'], [1, 0.5, 0.5, 0.5])
+        self.assertListEqual(sorted(commit for _, _, commit in profiler.commits), ['0002', '0003'])
+        self.assertListEqual(sorted(target for _, _, _, target in profiler.targets), ['b.py', 'c.py'])
+
+    def test_report(self):
+        """Test whether the report lists functions, analyzers, commits and targets"""
+
+        with Profiler(self.path, top=5) as profiler:
+            busy()
+            record_commit('0001', 1.5)
+            record_run('cloc', 'a.py', 0.25, 0.125)
+
+        report = profiler.report()
+
+        self.assertIn("Profile saved to %s" % self.path, report)
+        self.assertIn("Top 5 functions by cumulative time:", report)
+        self.assertIn("busy", report)
+        self.assertIn("  cloc                1     0.250s     0.125s     0.250s", report)
+        self.assertIn("      1.500s 0001", report)
+        self.assertIn("      0.250s cloc         a.py", report)
+
+    def test_not_active(self):
+        """Test whether nothing is recorded when no profiler is active"""
+
+        record_commit('0001', 1.0)
+        record_run('cloc', 'a.py', 1.0, 0.5)
+
+        self.assertIsNone(graal.profiling._active)
+
+    def test_analyzer(self):
+        """Test whether the runs of the analyzers are recorded"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+
+        with Profiler(self.path) as profiler:
+            Lizard().analyze(file_path=file_path, details=False)
+
+        self.assertEqual(profiler.analyzers['lizard'][0], 1)
+        self.assertEqual(profiler.targets[0][3], file_path)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from graal.progress import (STATE_COMPLETED,
+                            STATE_FAILED,
+                            STATE_RUNNING,
+                            Progress)
+
+
+class TestProgress(unittest.TestCase):
+    """Progress tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_status(self):
+        """Test whether the percentage, the rate and the ETA are computed"""
+
+        with unittest.mock.patch('graal.progress.time.monotonic', return_value=100.0):
+            progress = Progress('test', window=60)
+
+        progress.set_total(40)
+        progress.set_stage('analyze', 'abc')
+
+        with unittest.mock.patch('graal.progress.time.monotonic', return_value=110.0):
+            progress.update(10)
+            status = progress.status()
+
+        self.assertEqual(status['name'], 'test')
+        self.assertEqual(status['state'], STATE_RUNNING)
+        self.assertEqual(status['stage'], 'analyze')
+        self.assertEqual(status['commit'], 'abc')
+        self.assertEqual(status['total'], 40)
+        self.assertEqual(status['done'], 10)
+        self.assertEqual(status['percent'], 25.0)
+        self.assertEqual(status['rate'], 1.0)
+        self.assertEqual(status['eta'], 30.0)
+        self.assertEqual(status['elapsed'], 10.0)
+
+    def test_window(self):
+        """Test whether the rate is computed over the last window"""
+
+        with unittest.mock.patch('graal.progress.time.monotonic', return_value=0.0):
+            progress = Progress('test', window=60)
+
+        progress.set_total(1000)
+
+        # 100 commits in the first minute, then 10 commits per minute
+        with unittest.mock.patch('graal.progress.time.monotonic') as mock_time:
+            for now, done in [(60.0, 100), (90.0, 105), (120.0, 110), (150.0, 115)]:
+                mock_time.return_value = now
+                progress.update(done)
+
+            status = progress.status()
+
+        self.assertAlmostEqual(status['rate'], 10 / 60)
+        self.assertAlmostEqual(status['eta'], 885 * 6)
+
+    def test_unknown_total(self):
+        """Test whether the percentage and the ETA are not given without a total"""
+
+        progress = Progress('test')
+        progress.update(5)
+        status = progress.status()
+
+        self.assertIsNone(status['total'])
+        self.assertIsNone(status['percent'])
+        self.assertIsNone(status['eta'])
+
+        progress.set_total(0)
+        status = progress.status()
+        self.assertEqual(status['percent'], 100.0)
+
+    def test_report(self):
+        """Test whether the progress is logged and written to the status file"""
+
+        status_path = os.path.join(self.tmp_path, 'status.json')
+
+        progress = Progress('test', status_path=status_path)
+        progress.set_total(4)
+        progress.set_stage('checkout', 'abc')
+        progress.update(1)
+
+        with self.assertLogs('graal.progress', level='INFO') as cm:
+            progress.report()
+
+        self.assertEqual(len(cm.output), 1)
+        self.assertRegex(cm.output[0],
+                         r'^INFO:graal.progress:Progress of test: 1/4 commits \(25.0%\), '
+                         r'[0-9.]+ commits/s, ETA [0-9:]+, checkout abc$')
+
+        with open(status_path) as f:
+            status = json.load(f)
+
+        self.assertEqual(status['done'], 1)
+        self.assertEqual(status['total'], 4)
+        self.assertEqual(status['stage'], 'checkout')
+        self.assertEqual(os.listdir(self.tmp_path), ['status.json'])
+
+    def test_report_on_error(self):
+        """Test whether a warning is logged when the status file cannot be written"""
+
+        status_path = os.path.join(self.tmp_path, 'missing', 'status.json')
+
+        progress = Progress('test', status_path=status_path)
+        with self.assertLogs('graal.progress', level='WARNING') as cm:
+            progress.report()
+
+        self.assertIn('Status not written to %s' % status_path, cm.output[-1])
+
+    def test_start_stop(self):
+        """Test whether the progress is reported when started and stopped"""
+
+        status_path = os.path.join(self.tmp_path, 'status.json')
+
+        progress = Progress('test', interval=0.01, status_path=status_path)
+        with self.assertLogs('graal.progress', level='INFO') as cm:
+            progress.start()
+            progress.set_stage('analyze', 'abc')
+            progress.stop(STATE_FAILED)
+
+        self.assertGreaterEqual(len(cm.output), 2)
+        self.assertTrue(cm.output[0].endswith('0 commits, 0.00 commits/s, ETA unknown, running'))
+        self.assertTrue(cm.output[-1].endswith(', failed'))
+
+        with open(status_path) as f:
+            status = json.load(f)
+
+        self.assertEqual(status['state'], STATE_FAILED)
+        self.assertIsNone(status['stage'])
+        self.assertIsNone(progress._thread)
+
+        progress.stop(STATE_COMPLETED)
+        with open(status_path) as f:
+            status = json.load(f)
+
+        self.assertEqual(status['state'], STATE_COMPLETED)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
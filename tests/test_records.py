@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import unittest
+
+from graal.records import (FileMetrics,
+                           FunctionMetrics)
+
+
+FILE_INFO = {
+    'ccn': 18,
+    'avg_ccn': 2.0,
+    'avg_loc': 6.5,
+    'avg_tokens': 48.2,
+    'num_funs': 2,
+    'loc': 40,
+    'tokens': 300,
+    'ext': 'py',
+    'funs': [
+        {'ccn': 6, 'tokens': 60, 'loc': 6, 'lines': 8, 'name': 'parse',
+         'args': 2, 'start': 10, 'end': 17},
+        {'ccn': 1, 'tokens': 12, 'loc': 2, 'lines': 2, 'name': 'Parser.feed',
+         'args': 1, 'start': 20, 'end': 21}
+    ],
+    'blanks': 5,
+    'comments': 3,
+    'file_path': 'graal/parser.py'
+}
+
+
+class TestFileMetrics(unittest.TestCase):
+    """FileMetrics tests"""
+
+    def test_to_dict(self):
+        """Test whether records are converted back to the original dicts"""
+
+        record = FileMetrics.from_dict(FILE_INFO)
+        file_info = record.to_dict()
+
+        self.assertDictEqual(file_info, FILE_INFO)
+        self.assertListEqual(list(file_info.keys()), list(FILE_INFO.keys()))
+        self.assertListEqual(list(file_info['funs'][0].keys()), list(FILE_INFO['funs'][0].keys()))
+
+        # every conversion returns new dicts
+        self.assertIsNot(record.to_dict()['funs'], file_info['funs'])
+
+    def test_from_dict_cloc(self):
+        """Test whether records hold only the keys given"""
+
+        cloc_info = {'blanks': 1, 'comments': 2, 'loc': 3, 'ext': 'md', 'file_path': 'README.md'}
+        record = FileMetrics.from_dict(cloc_info)
+
+        self.assertListEqual(list(record.to_dict().items()), list(cloc_info.items()))
+        self.assertFalse(hasattr(record, 'ccn'))
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_shared_keys(self):
+        """Test whether records with the same keys share them, and strings are interned"""
+
+        record = FileMetrics.from_dict(FILE_INFO)
+        other = FileMetrics.from_dict(dict(FILE_INFO, file_path=''.join(['graal/', 'parser.py'])))
+
+        self.assertIs(record._keys, other._keys)
+        self.assertIs(record.file_path, other.file_path)
+        self.assertIsInstance(record.funs[0], FunctionMetrics)
+        self.assertIs(record.funs[1]._keys, other.funs[1]._keys)
+        self.assertIs(record.funs[1].name, other.funs[1].name)
+
+    def test_unknown_key(self):
+        """Test whether keys not listed in the slots are rejected"""
+
+        with self.assertRaises(AttributeError):
+            FileMetrics.from_dict({'file_path': 'README.md', 'unknown': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import unittest
+
+from graal.rollup import DirectoryTree
+
+
+FILES = [
+    {'file_path': 'README.md', 'ext': 'md', 'blanks': 4, 'comments': 0, 'loc': 20},
+    {'file_path': 'graal/graal.py', 'ext': 'py', 'blanks': 10, 'comments': 30, 'loc': 100,
+     'ccn': 20, 'num_funs': 10, 'tokens': 900},
+    {'file_path': 'graal/backends/core/cocom.py', 'ext': 'py', 'blanks': 5, 'comments': 10, 'loc': 50,
+     'ccn': 10, 'num_funs': 2, 'tokens': 400},
+    {'file_path': 'tests/test_cost.py', 'ext': 'py', 'blanks': 2, 'comments': 1, 'loc': 30,
+     'ccn': 3, 'num_funs': 3, 'tokens': 200}
+]
+
+
+class TestDirectoryTree(unittest.TestCase):
+    """DirectoryTree tests"""
+
+    def test_ancestors(self):
+        """Test whether the directories of a file are listed up to the root"""
+
+        self.assertListEqual(list(DirectoryTree.ancestors('a/b/c.py')), ['a/b', 'a', '.'])
+        self.assertListEqual(list(DirectoryTree.ancestors('c.py')), ['.'])
+        self.assertEqual(DirectoryTree.depth('.'), 0)
+        self.assertEqual(DirectoryTree.depth('a'), 1)
+        self.assertEqual(DirectoryTree.depth('a/b'), 2)
+
+    def test_rollup(self):
+        """Test whether the metrics are summed by directory"""
+
+        tree = DirectoryTree()
+        for file_info in FILES:
+            tree.set(file_info)
+
+        rollup = tree.rollup()
+        self.assertListEqual(list(rollup.keys()),
+                             ['.', 'graal', 'graal/backends', 'graal/backends/core', 'tests'])
+        self.assertDictEqual(rollup['.'], {'files': 4, 'loc': 200, 'ccn': 33, 'num_funs': 15,
+                                           'tokens': 1500, 'comments': 41, 'blanks': 21})
+        self.assertEqual(rollup['graal']['files'], 2)
+        self.assertEqual(rollup['graal']['loc'], 150)
+        self.assertEqual(rollup['graal/backends/core']['loc'], 50)
+
+        self.assertListEqual(list(tree.rollup(0).keys()), ['.'])
+        self.assertListEqual(list(tree.rollup(1).keys()), ['.', 'graal', 'tests'])
+
+    def test_update(self):
+        """Test whether replacing and removing files only updates their directories"""
+
+        tree = DirectoryTree()
+        for file_info in FILES:
+            tree.set(file_info)
+
+        tree.set(dict(FILES[2], loc=10))
+        tree.remove('tests/test_cost.py')
+        tree.remove('unknown.py')
+
+        expected = DirectoryTree()
+        for file_info in [FILES[0], FILES[1], dict(FILES[2], loc=10)]:
+            expected.set(file_info)
+
+        self.assertDictEqual(tree.rollup(), expected.rollup())
+        self.assertNotIn('tests', tree.rollup())
+        self.assertSetEqual(tree.paths, {'README.md', 'graal/graal.py', 'graal/backends/core/cocom.py'})
+
+        tree.reset()
+        self.assertDictEqual(tree.rollup(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import os
+import subprocess
+import sys
+import time
+import unittest
+import unittest.mock
+
+from graal.backends.core.analyzers import runner
+from graal.backends.core.analyzers.runner import (TAIL_LINES,
+                                                  LineParser,
+                                                  ToolRun,
+                                                  run_tool,
+                                                  spawn)
+
+
+class MockedParser(LineParser):
+    """Parser which collects the lines up to a given one"""
+
+    def __init__(self, last=None):
+        super().__init__()
+        self.lines = []
+        self.last = last
+
+    def feed(self, line):
+        self.lines.append(line)
+        if line == self.last:
+            self.done = True
+
+
+def python(code):
+    return [sys.executable, '-c', code]
+
+
+class TestRunTool(unittest.TestCase):
+    """run_tool tests"""
+
+    def test_run(self):
+        """Test whether the output is fed line by line to the parser"""
+
+        parser = MockedParser()
+        run = run_tool(python("for i in range(3): print('line %s' % i)"), parser)
+
+        self.assertIsInstance(run, ToolRun)
+        self.assertEqual(run.returncode, 0)
+        self.assertGreater(run.wall_time, 0)
+        self.assertGreater(run.max_rss, 0)
+        self.assertGreater(run.cpu_time, 0)
+        self.assertListEqual(parser.lines, ['line 0', 'line 1', 'line 2'])
+        self.assertEqual(run.output, "line 0\nline 1\nline 2")
+
+    def test_done(self):
+        """Test whether the lines after the parser is done are drained"""
+
+        parser = MockedParser(last='line 1')
+        run = run_tool(python("for i in range(10000): print('line %s' % i)"), parser)
+
+        self.assertEqual(run.returncode, 0)
+        self.assertListEqual(parser.lines, ['line 0', 'line 1'])
+        self.assertEqual(len(run.output.split("\n")), TAIL_LINES)
+        self.assertTrue(run.output.endswith('line 9999'))
+
+    def test_exit_status(self):
+        """Test whether the exit status of the tool is recorded"""
+
+        run = run_tool(python("import sys; print('failed'); sys.exit(3)"), LineParser())
+        self.assertEqual(run.returncode, 3)
+        self.assertEqual(run.output, 'failed')
+
+        run = run_tool(python("import os, signal; os.kill(os.getpid(), signal.SIGTERM)"), LineParser())
+        self.assertLess(run.returncode, 0)
+
+    def test_cwd(self):
+        """Test whether the tool runs in the given directory"""
+
+        parser = MockedParser()
+        run_tool(python("import os; print(os.getcwd())"), parser, cwd='/')
+
+        self.assertListEqual(parser.lines, ['/'])
+
+    def test_timeout(self):
+        """Test whether the tool is killed when it times out"""
+
+        with self.assertRaises(subprocess.TimeoutExpired):
+            run_tool(python("import time; print('start', flush=True); time.sleep(60)"),
+                     LineParser(), timeout=0.5)
+
+    def test_timeout_children(self):
+        """Test whether the processes launched by the tool are killed when it times out"""
+
+        code = "import subprocess, time; subprocess.Popen(['sleep', '60']); print('start', flush=True); time.sleep(60)"
+
+        start = time.perf_counter()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            run_tool(python(code), LineParser(), timeout=0.5)
+        self.assertLess(time.perf_counter() - start, 30)
+
+    def test_timeout_exited(self):
+        """Test whether a tool which exits in time is not reported as timed out"""
+
+        code = "import subprocess; subprocess.Popen(['sleep', '60']); print('done', flush=True)"
+        parser = MockedParser()
+
+        start = time.perf_counter()
+        run = run_tool(python(code), parser, timeout=0.5)
+        self.assertLess(time.perf_counter() - start, 30)
+
+        self.assertEqual(run.returncode, 0)
+        self.assertListEqual(parser.lines, ['done'])
+
+    def test_parser_error(self):
+        """Test whether the tool is killed when the parser fails"""
+
+        class FailingParser(LineParser):
+            def feed(self, line):
+                raise ValueError(line)
+
+        with self.assertRaises(ValueError):
+            run_tool(python("import time; print('start', flush=True); time.sleep(60)"),
+                     FailingParser())
+
+    def test_not_found(self):
+        """Test whether an error is raised when the tool does not exist"""
+
+        with self.assertRaises(FileNotFoundError):
+            run_tool(['graal-missing-tool'], LineParser())
+
+
+class TestRunToolPopen(TestRunTool):
+    """run_tool tests, launching tools with subprocess.Popen"""
+
+    def setUp(self):
+        patcher = unittest.mock.patch.object(runner, 'USE_POSIX_SPAWN', False)
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+
+@unittest.skipUnless(runner.USE_POSIX_SPAWN, "posix_spawn not available")
+class TestSpawn(unittest.TestCase):
+    """spawn tests"""
+
+    def test_posix_spawn(self):
+        """Test whether tools are launched with posix_spawn"""
+
+        with unittest.mock.patch('os.posix_spawnp', wraps=os.posix_spawnp) as mock_spawn:
+            proc = spawn(python("print('spawned')"))
+            output = proc.stdout.read()
+            proc.stdout.close()
+            runner._wait(proc)
+
+        self.assertEqual(mock_spawn.call_count, 1)
+        self.assertEqual(output, b'spawned\n')
+        self.assertEqual(proc.returncode, 0)
+
+        # the process is already reaped, thus it is not killed
+        proc.kill()
+
+    def test_fds_not_leaked(self):
+        """Test whether the pipes of other tools are not inherited"""
+
+        other = spawn(python("import time; time.sleep(60)"))
+        other_fd = other.stdout.fileno()
+
+        parser = MockedParser()
+        code = "import os, sys; print(os.path.exists('/proc/self/fd/' + sys.argv[1]))"
+        run_tool([sys.executable, '-c', code, str(other_fd)], parser)
+
+        other.kill()
+        other.stdout.close()
+        runner._wait(other)
+
+        self.assertListEqual(parser.lines, ['False'])
+
+
+if __name__ == "__main__":
+    unittest.main()
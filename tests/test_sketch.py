@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import random
+import unittest
+
+from graal.sketch import KLLSketch
+
+
+class TestKLLSketch(unittest.TestCase):
+    """KLLSketch tests"""
+
+    def test_empty(self):
+        """Test whether an empty sketch has no quantiles"""
+
+        sketch = KLLSketch()
+
+        self.assertEqual(len(sketch), 0)
+        self.assertIsNone(sketch.quantile(0.5))
+        self.assertDictEqual(sketch.summary([50]), {'count': 0, 'min': None, 'max': None, 'p50': None})
+
+    def test_exact(self):
+        """Test whether quantiles are exact until the sketch is compacted"""
+
+        sketch = KLLSketch()
+        for value in [5, 1, 4, 2, 3]:
+            sketch.update(value)
+
+        self.assertEqual(len(sketch), 5)
+        self.assertListEqual(sketch.quantiles([0, 0.2, 0.5, 1]), [1, 1, 3, 5])
+        self.assertDictEqual(sketch.summary([50, 100]),
+                             {'count': 5, 'min': 1, 'max': 5, 'p50': 3, 'p100': 5})
+
+    def test_bounded(self):
+        """Test whether the size of the sketch is bounded and quantiles are accurate"""
+
+        values = list(range(100000))
+        random.Random(1).shuffle(values)
+
+        sketch = KLLSketch()
+        for value in values:
+            sketch.update(value)
+
+        self.assertEqual(len(sketch), len(values))
+        self.assertLess(sum(len(compactor) for compactor in sketch._compactors), 4 * sketch.k)
+        self.assertEqual(sketch.min, 0)
+        self.assertEqual(sketch.max, len(values) - 1)
+
+        for q in [0.1, 0.5, 0.9, 0.99]:
+            self.assertAlmostEqual(sketch.quantile(q) / len(values), q, delta=0.02)
+
+    def test_merge(self):
+        """Test whether merged sketches estimate the quantiles of all the values"""
+
+        values = list(range(100000))
+        random.Random(2).shuffle(values)
+
+        sketches = [KLLSketch() for _ in range(8)]
+        for i, value in enumerate(values):
+            sketches[i % len(sketches)].update(value)
+
+        merged = KLLSketch()
+        merged.merge(KLLSketch())
+        for sketch in sketches:
+            merged.merge(sketch)
+
+        self.assertEqual(len(merged), len(values))
+        self.assertLess(sum(len(compactor) for compactor in merged._compactors), 4 * merged.k)
+        self.assertEqual(merged.min, 0)
+        self.assertEqual(merged.max, len(values) - 1)
+
+        for q in [0.1, 0.5, 0.9, 0.99]:
+            self.assertAlmostEqual(merged.quantile(q) / len(values), q, delta=0.02)
+
+    def test_deterministic(self):
+        """Test whether the same updates give the same sketch"""
+
+        first = KLLSketch(k=20)
+        second = KLLSketch(k=20)
+        for value in range(1000):
+            first.update(value)
+            second.update(value)
+
+        self.assertListEqual(first.quantiles([0.25, 0.5, 0.75]), second.quantiles([0.25, 0.5, 0.75]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import unittest
+import unittest.mock
+
+import graal.summary
+from graal.graal import GraalError
+from graal.summary import Summary
+
+
+FILES = [
+    {'file_path': 'README.md', 'ext': 'md', 'blanks': 4, 'comments': 0, 'loc': 20},
+    {'file_path': 'graal/graal.py', 'ext': 'py', 'blanks': 10, 'comments': 30, 'loc': 100,
+     'ccn': 20, 'num_funs': 10, 'tokens': 900},
+    {'file_path': 'graal/cost.py', 'ext': 'py', 'blanks': 5, 'comments': 10, 'loc': 50,
+     'ccn': 10, 'num_funs': 2, 'tokens': 400},
+    {'file_path': 'tests/test_cost.py', 'ext': 'py', 'blanks': 2, 'comments': 1, 'loc': 30,
+     'ccn': 3, 'num_funs': 3, 'tokens': 200}
+]
+
+
+@unittest.skipIf(graal.summary.numpy is None, "NumPy not installed")
+class TestSummary(unittest.TestCase):
+    """Summary tests"""
+
+    def test_summarize(self):
+        """Test whether the aggregates are computed for all the files, extensions and directories"""
+
+        summary = Summary()
+        for file_info in FILES:
+            summary.set(file_info)
+
+        result = summary.summarize()
+
+        total = result['total']
+        self.assertEqual(total['files'], 4)
+        self.assertEqual(total['loc']['sum'], 200)
+        self.assertEqual(total['loc']['mean'], 50.0)
+        self.assertEqual(total['loc']['p50'], 40.0)
+        self.assertEqual(total['ccn']['sum'], 33)
+        self.assertEqual(total['ccn']['mean'], 11.0)
+        self.assertEqual(total['ccn_per_fun'], 33 / 15)
+
+        self.assertListEqual(sorted(result['ext'].keys()), ['md', 'py'])
+        self.assertEqual(result['ext']['md']['files'], 1)
+        self.assertNotIn('ccn', result['ext']['md'])
+        self.assertNotIn('ccn_per_fun', result['ext']['md'])
+        self.assertEqual(result['ext']['py']['loc']['sum'], 180)
+
+        self.assertListEqual(sorted(result['dir'].keys()), ['.', 'graal', 'tests'])
+        self.assertEqual(result['dir']['graal']['files'], 2)
+        self.assertEqual(result['dir']['graal']['comments']['sum'], 40)
+        self.assertEqual(result['dir']['graal']['tokens']['p50'], 650.0)
+        self.assertEqual(result['dir']['.']['loc']['sum'], 20)
+
+    def test_update(self):
+        """Test whether replacing and removing files updates the aggregates"""
+
+        summary = Summary(percentiles=[50])
+        for file_info in FILES:
+            summary.set(file_info)
+
+        summary.set(dict(FILES[1], loc=10))
+        summary.remove('README.md')
+        summary.remove('unknown.py')
+
+        expected = Summary(percentiles=[50])
+        for file_info in [dict(FILES[1], loc=10), FILES[2], FILES[3]]:
+            expected.set(file_info)
+
+        self.assertDictEqual(summary.summarize(), expected.summarize())
+        self.assertSetEqual(summary.paths, {'graal/graal.py', 'graal/cost.py', 'tests/test_cost.py'})
+        self.assertNotIn('.', summary.summarize()['dir'])
+
+        summary.reset()
+        self.assertDictEqual(summary.summarize(), {'total': {'files': 0}, 'ext': {}, 'dir': {}})
+
+    def test_grow(self):
+        """Test whether the table grows and reuses the rows of the files removed"""
+
+        summary = Summary()
+        nfiles = 3 * Summary.INITIAL_ROWS
+
+        for i in range(nfiles):
+            summary.set({'file_path': 'src/%s.c' % i, 'ext': 'c', 'loc': i})
+        for i in range(0, nfiles, 2):
+            summary.remove('src/%s.c' % i)
+        for i in range(nfiles, nfiles + 10):
+            summary.set({'file_path': 'src/%s.c' % i, 'ext': 'c', 'loc': i})
+
+        result = summary.summarize()
+        expected = sum(range(1, nfiles, 2)) + sum(range(nfiles, nfiles + 10))
+        self.assertEqual(result['total']['files'], nfiles // 2 + 10)
+        self.assertEqual(result['total']['loc']['sum'], expected)
+        self.assertEqual(result['dir']['src']['loc']['sum'], expected)
+
+    def test_numpy_missing(self):
+        """Test whether an exception is thrown when NumPy is not installed"""
+
+        with unittest.mock.patch('graal.summary.numpy', None):
+            with self.assertRaises(GraalError):
+                Summary()
+
+
+if __name__ == "__main__":
+    unittest.main()